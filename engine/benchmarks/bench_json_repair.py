@@ -0,0 +1,122 @@
+"""Recovery rate and speed of the model reply parser on malformed replies.
+
+Run from the engine folder:
+    python -m benchmarks.bench_json_repair
+
+Compares src.eido.utils.json_repair.parse_model_json against the heuristics it
+replaced (ollama's regex/brace counting, fence stripping and the eido
+startswith/endswith gate). Every reply the legacy path rejects costs one extra
+model round trip.
+"""
+import re
+import os
+import json
+import time
+import statistics
+
+from src.eido.utils.json_repair import parse_model_json
+
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "corpus", "malformed_replies.json")
+ROUNDS = 200
+
+
+def legacy_extract(content):
+    if "</think>" in content:
+        parts = content.split("</think>", 1)
+        if len(parts) > 1:
+            content = parts[1].strip()
+
+    matches = re.findall(r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}', content, re.DOTALL)
+    if matches:
+        json_candidate = max(matches, key=len)
+        try:
+            json.loads(json_candidate)
+            return json_candidate.strip()
+        except json.JSONDecodeError:
+            pass
+
+    json_started = False
+    json_lines = []
+    brace_count = 0
+    for line in content.split('\n'):
+        line = line.strip()
+        if not json_started and line.startswith('{'):
+            json_started = True
+            json_lines.append(line)
+            brace_count += line.count('{') - line.count('}')
+        elif json_started:
+            json_lines.append(line)
+            brace_count += line.count('{') - line.count('}')
+            if brace_count == 0:
+                break
+    if json_lines:
+        potential_json = '\n'.join(json_lines)
+        try:
+            json.loads(potential_json)
+            return potential_json
+        except json.JSONDecodeError:
+            pass
+    return content
+
+
+def legacy_parse(reply):
+    response = legacy_extract(reply)
+    if response.startswith('```json') and response.endswith('```'):
+        response = response[7:-3].strip()
+    if not (response.startswith('{') and response.endswith('}')):
+        return None
+    try:
+        parsed = json.loads(response)
+    except json.JSONDecodeError:
+        return None
+    return parsed if isinstance(parsed, dict) else None
+
+
+def evaluate(parser, corpus):
+    recovered = 0
+    correct = 0
+    for item in corpus:
+        parsed = parser(item["reply"])
+        expected = item["expected_response"]
+        if parsed is not None:
+            recovered += 1
+        if expected is None and parsed is None:
+            correct += 1
+        elif parsed is not None and parsed.get("response") == expected:
+            correct += 1
+    return recovered, correct
+
+
+def time_parser(parser, corpus):
+    samples = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        for item in corpus:
+            parser(item["reply"])
+        samples.append((time.perf_counter() - start) / len(corpus))
+    return statistics.median(samples) * 1e6, max(samples) * 1e6
+
+
+def main():
+    with open(CORPUS_PATH, "r", encoding="utf-8") as f:
+        corpus = json.load(f)
+
+    print(f"Corpus: {len(corpus)} replies ({sum(1 for c in corpus if c['expected_response'] is None)} unrecoverable)\n")
+    print(f"{'parser':<12}{'recovered':>11}{'correct':>10}{'median us':>12}{'max us':>10}")
+    for name, parser in (("legacy", legacy_parse), ("json_repair", parse_model_json)):
+        recovered, correct = evaluate(parser, corpus)
+        median_us, max_us = time_parser(parser, corpus)
+        print(f"{name:<12}{recovered:>11}{correct:>10}{median_us:>12.1f}{max_us:>10.1f}")
+
+    print("\nPer reply:")
+    for item in corpus:
+        legacy = legacy_parse(item["reply"])
+        repaired = parse_model_json(item["reply"])
+        legacy_ok = "ok" if legacy is not None and legacy.get("response") == item["expected_response"] else "--"
+        repaired_ok = "ok" if (repaired is None and item["expected_response"] is None) or (repaired is not None and repaired.get("response") == item["expected_response"]) else "--"
+        print(f"  {item['name']:<32} legacy {legacy_ok}   json_repair {repaired_ok}")
+
+
+if __name__ == "__main__":
+    main()
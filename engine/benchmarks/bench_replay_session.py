@@ -0,0 +1,84 @@
+"""Re-run a recorded session against this build and compare it with the recording.
+
+Record on the reference build by starting the engine with
+CASSETTE_RECORD=/path/session.jsonl and using it as usual. Then, from the
+engine folder of the build under test:
+    python -m benchmarks.bench_replay_session /path/session.jsonl [--email E] [--agent A] [--fast]
+
+Every recorded operator message is added to a new conversation of the user
+and answered by an eido run, as superChat does, with all provider calls
+served from the cassette: with the recorded timings, or at once with --fast
+so only engine time is left. Prints wall time and database statements per
+turn, then engine time and database statements of all calls next to the
+recorded ones. Runs on the engine's database; the conversation is deleted at
+the end. The response cache (RESPONSE_CACHE_AGENTS, task flags) is off
+while a cassette is replayed, so cached replies never stand in for
+recorded calls.
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+from src.disk.core.db import init_db
+from src.disk.core.db_metrics import count_difference, get_db_counter
+from src.disk.services.chats import crud as chat_crud
+from src.eido.models.provider_cassette import (
+    CASSETTE_REPLAY_ENV,
+    CASSETTE_TIMING_ENV,
+    get_replay_cassette,
+)
+
+
+async def replay(options):
+    os.environ[CASSETTE_REPLAY_ENV] = options.cassette
+    os.environ[CASSETTE_TIMING_ENV] = "fast" if options.fast else "original"
+
+    # Imported after the environment is set up, like a super thread would
+    from src.eido.eido import eido
+    from src.eido.payload.eidoMemory import eidoMemory
+    from src.eido.utils.eido_config import fetch_default_agent
+
+    await init_db()
+    cassette = get_replay_cassette()
+    email = options.email or next((entry.get("email") for entry in cassette.entries if entry.get("email")), None)
+    if not email:
+        print("The cassette has no recorded calls.")
+        return 1
+    agent = options.agent or await fetch_default_agent(email) or "default"
+    messages = cassette.operator_messages(email)
+    print(f"Replaying {len(messages)} operator messages ({len(cassette.entries)} recorded calls) as {email} with agent '{agent}'\n")
+
+    conversation_id = (await chat_crud.create_conversation(email))["id"]
+    try:
+        for turn, message in enumerate(messages, 1):
+            await chat_crud.add_message(conversation_id, message, "user", email)
+            before = get_db_counter().snapshot()
+            start = time.perf_counter()
+            await eido(agent, email, conversation_id).run()
+            await eidoMemory(email, conversation_id).refresh()
+            elapsed = time.perf_counter() - start
+            statements = count_difference(get_db_counter().snapshot(), before).get("TOTAL", 0)
+            print(f"\nturn {turn:<4}{elapsed:>8.2f}s{statements:>8} db statements")
+    finally:
+        await chat_crud.delete_conversation(conversation_id, email)
+
+    summary = cassette.summary()
+    print(f"\ncalls served      {summary['calls']} of {summary['recorded_calls']} recorded ({summary['matched']} with an identical request)")
+    print(f"engine time       {summary['engine_time']:.2f}s (recorded {summary['recorded_engine_time']:.2f}s)")
+    print(f"db statements     {summary['db_ops']} (recorded {summary['recorded_db_ops']})")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("cassette")
+    parser.add_argument("--email", help="user to replay as (default: the first recorded one)")
+    parser.add_argument("--agent", help="agent answering the operator (default: the user's DEFAULT_AGENT)")
+    parser.add_argument("--fast", action="store_true", help="serve replies at once instead of with the recorded timings")
+    return asyncio.run(replay(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+"""Cold and warm load time of a large LOCAL_PATH.
+
+Run from the engine folder:
+    python -m benchmarks.bench_workspace_scan [--files 50000] [--latency-ms 0.2] [--keep]
+
+Builds a synthetic workspace (default 50k files, ~1.5 KB each, plus a few
+binaries with text extensions) in a temporary folder and loads it with:
+  legacy           the os.walk + four-encoding loop local_workspace used to run
+  sequential       scan_workspace kept on the calling thread + the single-pass fileReader
+  parallel         scan_workspace on the list/read pools from the start + fileReader
+  auto             scan_workspace as the index runs it: sequential until its
+                   reads show I/O wait, then on the pools
+  index cold       workspaceIndex full scan on an empty index (no database)
+  index unchanged  the same index again, nothing changed (stat diff only, no opens)
+Each variant runs twice:
+  page cache     every file already in the OS page cache, so reads are pure
+                 CPU. Threads cannot beat one core here, so auto should stay
+                 sequential.
+  storage wait   each file open also waits --latency-ms (0.2 ms is roughly a
+                 cold SSD random read, a network share is several times that),
+                 the first start on a real disk the pools are for; auto should
+                 move to the pools after its first few hundred reads.
+With --drop-caches (Linux, root) the page cache is dropped before each
+variant of the first run instead of warmed.
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import builtins
+import tempfile
+import contextlib
+
+from src.eido.utils.file_reader import fileReader
+from src.eido.utils.workspace_index import filter_paths, workspaceIndex
+from src.eido.utils.workspace_scanner import scan_workspace
+
+
+FILES_PER_DIR = 100
+DIRS_PER_LEVEL = 25
+BINARY_EVERY = 500
+
+
+def build_tree(root, file_count):
+    line = "def handler_{i}(request):\n    return {{'status': {i}, 'detail': 'naïve café'}}\n"
+    written = 0
+    top = 0
+    while written < file_count:
+        for sub in range(DIRS_PER_LEVEL):
+            folder = os.path.join(root, f"pkg{top:03d}", f"mod{sub:03d}")
+            os.makedirs(folder, exist_ok=True)
+            for n in range(FILES_PER_DIR):
+                if written >= file_count:
+                    return
+                if written % BINARY_EVERY == 0:
+                    with open(os.path.join(folder, f"asset{n}.txt"), "wb") as f:
+                        f.write(b"\x89PNG\r\n\x1a\n\x00\x00" + bytes(range(256)) * 4)
+                else:
+                    with open(os.path.join(folder, f"file{n}.py"), "w", encoding="utf-8") as f:
+                        f.write("".join(line.format(i=i) for i in range(20)))
+                written += 1
+        top += 1
+
+
+def legacy_load(root):
+    contents = []
+    for folder, dirs, files in os.walk(root):
+        files = filter_paths(dirs, files)
+        for file in files:
+            file_path = os.path.join(folder, file)
+            content = None
+            for encoding in ['utf-8', 'windows-1252', 'iso-8859-1', 'cp1252']:
+                try:
+                    with open(file_path, 'r', encoding=encoding) as infile:
+                        content = infile.read()
+                        break
+                except UnicodeDecodeError:
+                    continue
+            if content is not None:
+                contents.append(content)
+    return len(contents)
+
+
+def scan_load(root, parallel):
+    reader = fileReader()
+    loaded = 0
+    results = scan_workspace(
+        root,
+        filter_paths,
+        lambda relative_path, stat: True,
+        lambda relative_path, stat: reader.read(os.path.join(root, relative_path), stat),
+        parallel,
+    )
+    for _, _, result in results:
+        if result.content is not None:
+            loaded += 1
+    return loaded
+
+
+@contextlib.contextmanager
+def storage_wait(root, latency_ms):
+    """Make every open() of a file under root block for latency_ms first."""
+    real_open = builtins.open
+
+    def slow_open(file, *args, **kwargs):
+        if isinstance(file, str) and file.startswith(root):
+            time.sleep(latency_ms / 1000)
+        return real_open(file, *args, **kwargs)
+
+    builtins.open = slow_open
+    try:
+        yield
+    finally:
+        builtins.open = real_open
+
+
+def drop_caches():
+    os.sync()
+    with open("/proc/sys/vm/drop_caches", "w") as f:
+        f.write("3\n")
+
+
+def timed(label, fn, what, cold=False):
+    if cold:
+        drop_caches()
+    start = time.perf_counter()
+    count = fn()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<17}{elapsed:>8.2f}s{count:>8} {what}")
+    return elapsed
+
+
+def run(root, cold, unchanged=True):
+    legacy = timed("legacy", lambda: legacy_load(root), "files with content", cold)
+    timed("sequential", lambda: scan_load(root, False), "files with content", cold)
+    timed("parallel", lambda: scan_load(root, True), "files with content", cold)
+    auto = timed("auto", lambda: scan_load(root, None), "files with content", cold)
+
+    index = workspaceIndex(root)
+    timed("index cold", lambda: len(index._scan()), "files indexed", cold)
+    if unchanged:
+        timed("index unchanged", lambda: len(index._scan()), "files changed")
+    print(f"  auto vs legacy: {legacy / auto:.1f}x\n")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=50000)
+    parser.add_argument("--latency-ms", type=float, default=0.2, help="wait added to each file open in the second run; 0 skips it")
+    parser.add_argument("--keep", action="store_true", help="leave the synthetic tree on disk")
+    parser.add_argument("--drop-caches", action="store_true", help="drop the page cache before each variant of the first run (Linux, root)")
+    options = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="thalis_bench_ws_")
+    try:
+        start = time.perf_counter()
+        build_tree(root, options.files)
+        print(f"Built {options.files} files in {root} ({time.perf_counter() - start:.1f}s), {os.cpu_count()} CPUs\n")
+
+        if options.drop_caches:
+            print("Cold page cache")
+        else:
+            # Warm the page cache so every variant measures the same thing
+            legacy_load(root)
+            print("Page cache")
+        run(root, options.drop_caches)
+
+        if options.latency_ms > 0:
+            print(f"Storage wait of {options.latency_ms} ms per file open")
+            with storage_wait(root, options.latency_ms):
+                # An unchanged scan opens no files, so it only runs above
+                run(root, False, unchanged=False)
+    finally:
+        if options.keep:
+            print(f"Tree kept at {root}")
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
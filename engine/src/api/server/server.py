@@ -22,6 +22,11 @@ from src.disk.services.eido.api import router as eido_router
 from src.disk.services.tasks.api import router as tasks_router
 from src.disk.services.aether.api import router as aether_router
 from src.disk.services.local.api import router as local_router
+from src.disk.services.metrics.api import router as metrics_router
+from src.disk.services.usage.api import router as usage_router
+from src.disk.services.usage.writer import get_usage_ledger
+from src.disk.services.eido.crud import get_models_for_provider
+from src.eido.models.ollama.ollama_residency import get_ollama_residency
 
 from src.disk.utils.websocket_manager import WebSocketManager
 
@@ -37,6 +42,7 @@ def get_server_instance() -> 'thalisServer':
 @asynccontextmanager
 async def lifespan(app: fastapi.FastAPI):
     await init_db()
+    get_ollama_residency().preload_soon(await get_models_for_provider("ollama"))
     
     if app.state.stop_event:
         if isinstance(app.state.stop_event, EventType):
@@ -44,7 +50,9 @@ async def lifespan(app: fastapi.FastAPI):
         elif callable(app.state.stop_event):
             app.state.stop_event()
     yield
-    # Shutdown: Clean up WebSockets and queues
+    # Shutdown: write the usage records still buffered
+    await get_usage_ledger().flush()
+    # Clean up WebSockets and queues
     if SERVER_INSTANCE:
         # WebSocket cleanup removed - no longer managing connections
         pass
@@ -106,6 +114,8 @@ class thalisServer:
         api_router.include_router(tasks_router, tags=["tasks"])
         api_router.include_router(aether_router, tags=["aether"])
         api_router.include_router(local_router, tags=["local"])
+        api_router.include_router(metrics_router, tags=["metrics"])
+        api_router.include_router(usage_router, tags=["usage"])
         
         # Unified config endpoint
         @api_router.get("/config")
@@ -1,8 +1,12 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy import event, inspect as sa_inspect
+from sqlalchemy.schema import CreateColumn
 import os
 
+from src.disk.core.db_metrics import get_db_counter
+
 Base = declarative_base()
 
 # Configure the database URI (SQLite file in project root by default)
@@ -13,6 +17,25 @@ DATABASE_URI = f"sqlite+aiosqlite:///{_db_path.replace(os.sep, '/')}"
 # Async engine & session factory
 engine = create_async_engine(DATABASE_URI, future=True, echo=False)
 AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+# Statement counts by verb, compared by the cassette replay runs
+event.listen(engine.sync_engine, "before_cursor_execute", get_db_counter().count)
+
+_columns_checked = False
+
+def _add_missing_columns(sync_conn):
+    # create_all never alters existing tables, so new nullable columns added to
+    # the models are appended here to keep databases from older versions working.
+    inspector = sa_inspect(sync_conn)
+    existing_tables = set(inspector.get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns or not column.nullable:
+                continue
+            column_ddl = CreateColumn(column).compile(dialect=sync_conn.dialect)
+            sync_conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column_ddl}")
 
 async def init_db():
     # Import models from all services so that they are registered with Base
@@ -23,6 +46,13 @@ async def init_db():
     from src.disk.services.eido import models as _eido_models  # noqa: F401
     from src.disk.services.tasks import models as _tasks_models  # noqa: F401
     from src.disk.services.aether import models as _aether_models  # noqa: F401
+    from src.disk.services.workspace import models as _workspace_models  # noqa: F401
+    from src.disk.services.response_cache import models as _response_cache_models  # noqa: F401
+    from src.disk.services.usage import models as _usage_models  # noqa: F401
     # Add future service model imports here
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all) 
\ No newline at end of file
+        await conn.run_sync(Base.metadata.create_all)
+        global _columns_checked
+        if not _columns_checked:
+            await conn.run_sync(_add_missing_columns)
+            _columns_checked = True 
\ No newline at end of file
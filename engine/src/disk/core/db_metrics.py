@@ -0,0 +1,43 @@
+import threading
+from collections import Counter
+from typing import Dict
+
+
+COUNTED_VERBS = ("SELECT", "INSERT", "UPDATE", "DELETE")
+
+
+class dbOperationCounter:
+    """Statements sent to the database since the process started, by verb.
+
+    Hooked to the engine's before_cursor_execute event, so every query from
+    every super thread is counted; anything that is not a SELECT, INSERT,
+    UPDATE or DELETE (PRAGMA, DDL, transactions) counts as OTHER.
+    """
+
+    def __init__(self):
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def count(self, conn, cursor, statement, parameters, context, executemany):
+        verb = statement.lstrip()[:6].upper()
+        if verb not in COUNTED_VERBS:
+            verb = "OTHER"
+        with self._lock:
+            self._counts[verb] += 1
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            counts = dict(self._counts)
+        counts["TOTAL"] = sum(counts.values())
+        return counts
+
+
+def count_difference(after: Dict[str, int], before: Dict[str, int]) -> Dict[str, int]:
+    return {key: value - before.get(key, 0) for key, value in after.items() if value - before.get(key, 0)}
+
+
+_COUNTER = dbOperationCounter()
+
+
+def get_db_counter() -> dbOperationCounter:
+    return _COUNTER
@@ -1,13 +1,15 @@
 
 import uuid
 from sqlalchemy.future import select
-from sqlalchemy import delete
+from sqlalchemy import and_, delete, or_
+from typing import Optional
 from datetime import datetime, timezone
 
 
 from src.disk.core.db import AsyncSessionLocal
 from src.disk.services.chats import models
 from src.disk.users.crud import get_or_create_user
+from src.eido.utils.token_estimator import estimate_message_tokens
 
 
 def _iso_utc(dt):
@@ -20,6 +22,23 @@ def _iso_utc(dt):
         dt = dt.astimezone(timezone.utc)
     return dt.isoformat()
 
+# Title prefix of the hidden conversations superTask runs tasks in
+TASK_CONVERSATION_PREFIX = "hidden_chat_task_"
+
+def task_conversation_title(task_id: str) -> str:
+    return f"{TASK_CONVERSATION_PREFIX}{task_id}"
+
+async def get_conversation_task_id(conversation_id: str) -> Optional[str]:
+    """The task a hidden task conversation runs, or None for other conversations."""
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(models.Conversation.title).where(models.Conversation.id == conversation_id)
+        )
+        title = result.scalar_one_or_none()
+        if title and title.startswith(TASK_CONVERSATION_PREFIX):
+            return title[len(TASK_CONVERSATION_PREFIX):]
+        return None
+
 # ---------- Conversation ----------
 async def create_conversation(email: str):
     async with AsyncSessionLocal() as session:
@@ -120,7 +139,13 @@ async def fork_conversation(conversation_id: str, email: str):
         if not original:
             raise ValueError("Original conversation not found")
         user = await get_or_create_user(email)
-        new_conv = models.Conversation(id=str(uuid.uuid4()), user_id=user.id, title=f"Fork of {original.title}")
+        new_conv = models.Conversation(
+            id=str(uuid.uuid4()),
+            user_id=user.id,
+            title=f"Fork of {original.title}",
+            summary=original.summary,
+            summary_until=original.summary_until
+        )
         session.add(new_conv)
 
         # Copy messages
@@ -133,7 +158,8 @@ async def fork_conversation(conversation_id: str, email: str):
                 id=str(uuid.uuid4()),
                 conversation_id=new_conv.id,
                 content=msg.content,
-                sender=msg.sender
+                sender=msg.sender,
+                token_count=msg.token_count
             ))
         await session.commit()
         return {
@@ -143,6 +169,40 @@ async def fork_conversation(conversation_id: str, email: str):
             'title': new_conv.title
         }
 
+async def get_conversation_summary(conversation_id: str, email: str):
+    async with AsyncSessionLocal() as session:
+        user = await get_or_create_user(email)
+        result = await session.execute(
+            select(models.Conversation).where(
+                models.Conversation.id == conversation_id,
+                models.Conversation.user_id == user.id
+            )
+        )
+        conv = result.scalar_one_or_none()
+        if conv and conv.summary:
+            return {
+                'summary': conv.summary,
+                'summary_until': _iso_utc(conv.summary_until)
+            }
+        return None
+
+async def update_conversation_summary(conversation_id: str, summary: str, summary_until: datetime, email: str):
+    async with AsyncSessionLocal() as session:
+        user = await get_or_create_user(email)
+        result = await session.execute(
+            select(models.Conversation).where(
+                models.Conversation.id == conversation_id,
+                models.Conversation.user_id == user.id
+            )
+        )
+        conv = result.scalar_one_or_none()
+        if conv:
+            conv.summary = summary
+            conv.summary_until = summary_until
+            await session.commit()
+            return True
+        return False
+
 # ---------- Message ----------
 async def add_message(conversation_id: str, content: str, role: str, email: str):
     if not content or not content.strip():
@@ -150,7 +210,14 @@ async def add_message(conversation_id: str, content: str, role: str, email: str)
     
     async with AsyncSessionLocal() as session:
         _ = await get_or_create_user(email)
-        message = models.Message(id=str(uuid.uuid4()), conversation_id=conversation_id, content=content.strip(), sender=role)
+        content = content.strip()
+        message = models.Message(
+            id=str(uuid.uuid4()),
+            conversation_id=conversation_id,
+            content=content,
+            sender=role,
+            token_count=estimate_message_tokens(content)
+        )
         session.add(message)
         await session.commit()
         return {
@@ -158,6 +225,7 @@ async def add_message(conversation_id: str, content: str, role: str, email: str)
             'conversation_id': message.conversation_id,
             'content': message.content,
             'role': message.sender,
+            'token_count': message.token_count,
             'created_at': _iso_utc(message.created_at)
         }
 
@@ -165,14 +233,67 @@ async def get_conversation_history(conversation_id: str, email: str):
     async with AsyncSessionLocal() as session:
         _ = await get_or_create_user(email)
         result = await session.execute(select(models.Message).where(models.Message.conversation_id == conversation_id).order_by(models.Message.created_at))
-        messages = result.scalars().all()
-        return [{
-            'id': m.id,
-            'conversation_id': m.conversation_id,
-            'content': m.content,
-            'role': m.sender,
-            'created_at': _iso_utc(m.created_at)
-        } for m in messages]
+        return await _context_messages(session, result.scalars().all())
+
+async def _context_messages(session, messages):
+    # Messages saved before token counts existed are counted once and stored
+    backfilled = False
+    for m in messages:
+        if m.token_count is None:
+            m.token_count = estimate_message_tokens(m.content)
+            backfilled = True
+    if backfilled:
+        await session.commit()
+
+    return [{
+        'id': m.id,
+        'conversation_id': m.conversation_id,
+        'content': m.content,
+        'role': m.sender,
+        'token_count': m.token_count,
+        'created_at': _iso_utc(m.created_at)
+    } for m in messages]
+
+async def get_pinned_messages(conversation_id: str, email: str):
+    """System messages and the first user message, oldest first."""
+    async with AsyncSessionLocal() as session:
+        _ = await get_or_create_user(email)
+        in_conversation = (models.Message.conversation_id == conversation_id, models.Message.content.isnot(None))
+        first_user_id = (
+            select(models.Message.id)
+            .where(*in_conversation, models.Message.sender == 'user')
+            .order_by(models.Message.created_at, models.Message.id)
+            .limit(1)
+            .scalar_subquery()
+        )
+        result = await session.execute(
+            select(models.Message)
+            .where(*in_conversation, or_(models.Message.sender == 'system', models.Message.id == first_user_id))
+            .order_by(models.Message.created_at, models.Message.id)
+        )
+        return await _context_messages(session, result.scalars().all())
+
+async def get_recent_messages(conversation_id: str, email: str, limit: int, before_id: Optional[str] = None, after: Optional[datetime] = None):
+    """Up to `limit` messages with content, the newest ones older than the
+    message before_id (when given) and newer than after, oldest first."""
+    async with AsyncSessionLocal() as session:
+        _ = await get_or_create_user(email)
+        query = select(models.Message).where(
+            models.Message.conversation_id == conversation_id,
+            models.Message.content.isnot(None),
+        )
+        if before_id is not None:
+            before = select(models.Message.created_at).where(models.Message.id == before_id).scalar_subquery()
+            query = query.where(or_(
+                models.Message.created_at < before,
+                and_(models.Message.created_at == before, models.Message.id < before_id),
+            ))
+        if after is not None:
+            query = query.where(models.Message.created_at > after)
+        result = await session.execute(
+            query.order_by(models.Message.created_at.desc(), models.Message.id.desc()).limit(limit)
+        )
+        return await _context_messages(session, list(reversed(result.scalars().all())))
 
 async def update_message(message_id: str, content: str, email: str):
     async with AsyncSessionLocal() as session:
@@ -185,12 +306,14 @@ async def update_message(message_id: str, content: str, email: str):
         message = result.scalar_one_or_none()
         if message:
             message.content = content
+            message.token_count = estimate_message_tokens(content)
             await session.commit()
             return {
                 'id': message.id,
                 'conversation_id': message.conversation_id,
                 'content': message.content,
                 'role': message.sender,
+                'token_count': message.token_count,
                 'created_at': _iso_utc(message.created_at)
             }
         return None
@@ -235,6 +358,8 @@ async def clear_conversation_messages(email, conversation_id):
         result = await session.execute(
             delete(models.Message).where(models.Message.conversation_id == conversation_id)
         )
+        conversation.summary = None
+        conversation.summary_until = None
         await session.commit()
         
         return True  # Successfully cleared messages
\ No newline at end of file
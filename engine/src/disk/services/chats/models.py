@@ -1,5 +1,5 @@
 from datetime import datetime, timezone
-from sqlalchemy import Column, String, DateTime, Enum, ForeignKey, Text
+from sqlalchemy import Column, String, DateTime, Enum, ForeignKey, Text, Integer
 from sqlalchemy.orm import relationship
 
 from src.disk.core.db import Base
@@ -11,6 +11,10 @@ class Conversation(Base):
     title = Column(String)
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
 
+    # Rolling summary of the turns older than summary_until (see eidoMemory)
+    summary = Column(Text, nullable=True)
+    summary_until = Column(DateTime(timezone=True), nullable=True)
+
     user = relationship('User', back_populates='conversations')
     messages = relationship('Message', back_populates='conversation')
 
@@ -20,5 +24,6 @@ class Message(Base):
     conversation_id = Column(String, ForeignKey('chats_conversations.id'))
     sender = Column(Enum('user', 'system', 'assistant', name='sender_types'))
     content = Column(Text)
+    token_count = Column(Integer, nullable=True)
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
     conversation = relationship('Conversation', back_populates='messages') 
\ No newline at end of file
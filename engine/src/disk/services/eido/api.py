@@ -7,11 +7,21 @@ from src.disk.services.eido.schemas import (
 )
 from src.disk.services.eido import crud
 from src.disk.utils.error_handlers import handle_service_error
+from src.eido.models.ollama.ollama_residency import get_ollama_residency
 
 
 router = APIRouter()
 
 
+async def _preload_selected_model(email: str, changed_keys):
+    # Switching to an Ollama model loads it now rather than on the first message
+    if not {'PROVIDER_NAME', 'MODEL_NAME'} & set(changed_keys):
+        return
+    settings = await crud.get_eido_settings_dict(email)
+    if str(settings.get('PROVIDER_NAME') or '').lower() == 'ollama':
+        get_ollama_residency().preload_soon([settings.get('MODEL_NAME')])
+
+
 @router.get("/eido")
 async def get_eido_settings(current_user: str = Depends(get_current_user)):
     """Get all eido settings for the current user"""
@@ -42,6 +52,7 @@ async def update_eido_settings(
         success = await crud.update_user_eido_settings(current_user, settings_request.settings)
         if not success:
             raise HTTPException(status_code=500, detail="Failed to update eido settings")
+        await _preload_selected_model(current_user, settings_request.settings.keys())
         return {"status": "success", "message": "Eido settings updated successfully"}
     except HTTPException:
         raise
@@ -60,6 +71,7 @@ async def create_eido_setting(
         )
         if not setting:
             raise HTTPException(status_code=500, detail="Failed to create eido setting")
+        await _preload_selected_model(current_user, [setting_request.key_name])
         return {"setting": setting}
     except HTTPException:
         raise
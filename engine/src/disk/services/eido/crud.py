@@ -1,4 +1,5 @@
 import uuid
+import threading
 from typing import Dict, List, Optional, Any, Set
 
 from sqlalchemy.exc import SQLAlchemyError
@@ -13,14 +14,37 @@ RESERVED_EIDO_KEYS: Set[str] = {
     # Session
     'OPERATOR_NAME', 'PURPOSE',
     # Provider
-    'PROVIDER_NAME', 'MODEL_NAME', 'MODEL_MAX_TOKENS', 'MODEL_TEMPERATURE',
+    'PROVIDER_NAME', 'MODEL_NAME', 'MODEL_MAX_TOKENS', 'MODEL_TEMPERATURE', 'MODEL_CONTEXT_SIZE',
     # Agents
     'DEFAULT_AGENT',
     # Modes
     'AGENTS_MODE', 'AWARENESS_MODE', 'TOOLS_MODE', 'LOCAL_MODE',
+    # Local context
+    'LOCAL_CONTEXT_TOKENS',
+    # Response cache
+    'RESPONSE_CACHE_AGENTS', 'RESPONSE_CACHE_TTL',
+    # Hedging
+    'HEDGE_PROVIDER', 'HEDGE_MODEL', 'HEDGE_PERCENTILE',
 }
 
 
+# Per-user counter bumped by every write below. Readers (eido_config and
+# the system prompt cache) key their caches on it instead of re-reading the table.
+_settings_versions: Dict[str, int] = {}
+_settings_versions_lock = threading.Lock()
+
+
+def get_eido_settings_version(email: str) -> int:
+    with _settings_versions_lock:
+        return _settings_versions.get(email, 0)
+
+
+def bump_eido_settings_version(email: str) -> int:
+    with _settings_versions_lock:
+        _settings_versions[email] = _settings_versions.get(email, 0) + 1
+        return _settings_versions[email]
+
+
 async def get_user_eido_settings(email: str) -> List[Dict[str, Any]]:
     """Get all eido settings for a user"""
     async with AsyncSessionLocal() as session:
@@ -124,6 +148,7 @@ async def update_user_eido_settings(email: str, settings_dict: Dict[str, Any]) -
                     ))
 
             await session.commit()
+            bump_eido_settings_version(email)
             return True
         except SQLAlchemyError as e:
             print(f"Error updating eido settings: {e}")
@@ -145,6 +170,7 @@ async def delete_user_eido_settings(email: str) -> bool:
                 await session.delete(setting)
 
             await session.commit()
+            bump_eido_settings_version(email)
             return True
         except SQLAlchemyError as e:
             print(f"Error deleting eido settings: {e}")
@@ -180,6 +206,7 @@ async def create_eido_setting(email: str, key_name: str, key_value: Any) -> Opti
                 session.add(setting)
 
             await session.commit()
+            bump_eido_settings_version(email)
             return {
                 'id': setting.id,
                 'key_name': setting.key_name,
@@ -210,6 +237,7 @@ async def delete_eido_setting(email: str, key_name: str) -> bool:
                 return True  # nothing to delete, treat as success
             await session.delete(setting)
             await session.commit()
+            bump_eido_settings_version(email)
             return True
         except SQLAlchemyError as e:
             print(f"Error deleting eido setting '{key_name}': {e}")
@@ -237,6 +265,7 @@ async def delete_agent_entry(email: str, agent_key: str) -> bool:
                     agents_dict.pop(agent_key, None)
                     agents_setting.key_value = agents_dict
                     await session.commit()
+                    bump_eido_settings_version(email)
             return True
         except SQLAlchemyError as e:
             print(f"Error deleting agent entry '{agent_key}': {e}")
@@ -244,3 +273,23 @@ async def delete_agent_entry(email: str, agent_key: str) -> bool:
             return False
 
 
+
+
+async def get_models_for_provider(provider_name: str) -> List[str]:
+    """MODEL_NAME of every user whose PROVIDER_NAME is provider_name."""
+    async with AsyncSessionLocal() as session:
+        try:
+            result = await session.execute(
+                select(models.EidoSetting.user_id, models.EidoSetting.key_name, models.EidoSetting.key_value)
+                .where(models.EidoSetting.key_name.in_(['PROVIDER_NAME', 'MODEL_NAME']))
+            )
+            by_user: Dict[str, Dict[str, Any]] = {}
+            for user_id, key_name, key_value in result.all():
+                by_user.setdefault(user_id, {})[key_name] = key_value
+            return sorted({
+                str(values['MODEL_NAME']) for values in by_user.values()
+                if str(values.get('PROVIDER_NAME') or '').lower() == provider_name and values.get('MODEL_NAME')
+            })
+        except SQLAlchemyError as e:
+            print(f"Error listing models for {provider_name}: {e}")
+            return []
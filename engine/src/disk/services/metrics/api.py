@@ -0,0 +1,35 @@
+from fastapi import APIRouter, Depends
+
+from src.disk.core.security import get_current_user
+from src.disk.core.db_metrics import get_db_counter
+from src.disk.services.response_cache import crud as response_cache_crud
+from src.disk.utils.error_handlers import handle_service_error
+from src.eido.models.provider_usage import get_usage_telemetry
+from src.eido.utils.metrics import collect_metrics
+
+
+router = APIRouter()
+
+
+@router.get("/metrics")
+async def get_engine_metrics(current_user: str = Depends(get_current_user)):
+    """Process-wide counters of the engine since it started."""
+    try:
+        metrics = collect_metrics()
+        if "response_cache" in metrics:
+            metrics["response_cache"]["stored"] = await response_cache_crud.get_response_cache_size()
+        metrics["db_statements"] = get_db_counter().snapshot()
+        return {"metrics": metrics}
+    except Exception as e:
+        handle_service_error(e)
+
+
+
+@router.get("/metrics/usage")
+async def get_provider_usage(current_user: str = Depends(get_current_user)):
+    """Latency, time to first token and token histograms of provider calls,
+    by provider/model and for the current user."""
+    try:
+        return {"usage": get_usage_telemetry().summary(email=current_user)}
+    except Exception as e:
+        handle_service_error(e)
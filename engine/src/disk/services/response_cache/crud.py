@@ -0,0 +1,133 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from sqlalchemy import delete, func, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.future import select
+
+from src.disk.core.db import AsyncSessionLocal
+from src.disk.services.chats import models as chat_models
+from src.disk.services.chats.crud import TASK_CONVERSATION_PREFIX
+from src.disk.services.response_cache import models
+from src.disk.services.tasks import models as task_models
+
+
+def _aware(dt: datetime) -> datetime:
+    # SQLite hands datetimes back without their timezone
+    return dt if dt.tzinfo is not None else dt.replace(tzinfo=timezone.utc)
+
+
+async def get_cached_response(key: str) -> Optional[str]:
+    """The cached reply for a key and marks it used, or None when it is
+    missing or expired (expired rows are removed)."""
+    async with AsyncSessionLocal() as session:
+        try:
+            entry = await session.get(models.ResponseCacheEntry, key)
+            if entry is None:
+                return None
+            now = datetime.now(timezone.utc)
+            if _aware(entry.expires_at) <= now:
+                await session.delete(entry)
+                await session.commit()
+                return None
+            await session.execute(
+                update(models.ResponseCacheEntry)
+                .where(models.ResponseCacheEntry.key == key)
+                .values(hits=models.ResponseCacheEntry.hits + 1, last_used_at=now)
+            )
+            response = entry.response
+            await session.commit()
+            return response
+        except SQLAlchemyError as e:
+            print(f"Error reading response cache: {e}")
+            await session.rollback()
+            return None
+
+
+async def store_cached_response(entry: Dict[str, Any], ttl_seconds: int, max_entries: int, max_bytes: int) -> int:
+    """Insert or replace an entry (key, email, agent, provider, model,
+    response), then remove expired entries and the least recently used ones
+    until the table is within max_entries and max_bytes. Returns the number
+    of entries removed."""
+    async with AsyncSessionLocal() as session:
+        try:
+            now = datetime.now(timezone.utc)
+            row = {
+                **entry,
+                'size': len(entry['response'].encode('utf-8')),
+                'hits': 0,
+                'created_at': now,
+                'expires_at': now + timedelta(seconds=ttl_seconds),
+                'last_used_at': now,
+            }
+            statement = insert(models.ResponseCacheEntry).values(row)
+            statement = statement.on_conflict_do_update(
+                index_elements=['key'],
+                set_={column: statement.excluded[column] for column in row if column != 'key'},
+            )
+            await session.execute(statement)
+
+            result = await session.execute(
+                delete(models.ResponseCacheEntry).where(models.ResponseCacheEntry.expires_at <= now)
+            )
+            removed = result.rowcount or 0
+
+            count, total_bytes = (await session.execute(
+                select(func.count(), func.coalesce(func.sum(models.ResponseCacheEntry.size), 0))
+            )).one()
+            if count > max_entries or total_bytes > max_bytes:
+                result = await session.execute(
+                    select(models.ResponseCacheEntry.key, models.ResponseCacheEntry.size)
+                    .order_by(models.ResponseCacheEntry.last_used_at)
+                )
+                evicted = []
+                for evict_key, size in result.all():
+                    if count <= max_entries and total_bytes <= max_bytes:
+                        break
+                    if evict_key == entry['key']:
+                        continue
+                    evicted.append(evict_key)
+                    count -= 1
+                    total_bytes -= size or 0
+                if evicted:
+                    await session.execute(
+                        delete(models.ResponseCacheEntry).where(models.ResponseCacheEntry.key.in_(evicted))
+                    )
+                removed += len(evicted)
+
+            await session.commit()
+            return removed
+        except SQLAlchemyError as e:
+            print(f"Error writing response cache: {e}")
+            await session.rollback()
+            return 0
+
+
+async def get_response_cache_size() -> Dict[str, int]:
+    async with AsyncSessionLocal() as session:
+        try:
+            count, total_bytes = (await session.execute(
+                select(func.count(), func.coalesce(func.sum(models.ResponseCacheEntry.size), 0))
+            )).one()
+            return {'entries': count, 'bytes': total_bytes}
+        except SQLAlchemyError as e:
+            print(f"Error reading response cache size: {e}")
+            return {'entries': 0, 'bytes': 0}
+
+
+
+async def get_task_cache_flag(conversation_id: str) -> Optional[bool]:
+    """The response_cache flag of the task a hidden task conversation
+    (superTask) runs, or None for other conversations and unset flags."""
+    async with AsyncSessionLocal() as session:
+        try:
+            result = await session.execute(
+                select(task_models.Task.response_cache)
+                .join(chat_models.Conversation, chat_models.Conversation.title == TASK_CONVERSATION_PREFIX + task_models.Task.id)
+                .where(chat_models.Conversation.id == conversation_id)
+            )
+            return result.scalar_one_or_none()
+        except SQLAlchemyError as e:
+            print(f"Error reading task cache flag: {e}")
+            return None
@@ -0,0 +1,19 @@
+from datetime import datetime, timezone
+from sqlalchemy import Column, String, DateTime, Text, Integer
+
+from src.disk.core.db import Base
+
+class ResponseCacheEntry(Base):
+    """One cached model reply (see eido/utils/response_cache.py)."""
+    __tablename__ = 'response_cache'
+    key = Column(String, primary_key=True)  # sha1 of the request, see response_cache.request_key
+    email = Column(String, nullable=False, index=True)
+    agent = Column(String, nullable=True)
+    provider = Column(String, nullable=False)
+    model = Column(String, nullable=True)
+    response = Column(Text, nullable=False)
+    size = Column(Integer, nullable=False)  # bytes of response, utf-8
+    hits = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    last_used_at = Column(DateTime(timezone=True), nullable=False, index=True)
@@ -17,6 +17,7 @@ def _serialize_task(task: task_models.Task) -> Dict[str, Any]:
         'schedule_summary': task.schedule_summary,
         'running_status': task.running_status,
         'responses': task.responses or [],
+        'response_cache': task.response_cache,
         'last_run': task.last_run.isoformat() if task.last_run else None,
         'created_at': task.created_at.isoformat() if task.created_at else None,
     }
@@ -43,6 +44,7 @@ async def create_task(email: str, data: Dict[str, Any]) -> Dict[str, Any]:
             schedule_summary=data.get('schedule_summary'),
             running_status=data.get('running_status', True),
             responses=data.get('responses', []),
+            response_cache=data.get('response_cache'),
             last_run=None
         )
         session.add(task)
@@ -88,6 +90,9 @@ async def update_task(email: str, task_id: str, data: Dict[str, Any]) -> Optiona
                 if key == 'description' and data[key].strip() == '':
                     raise ValueError("Task description cannot be empty")
                 setattr(task, key, data[key])
+        # None is a value here: follow RESPONSE_CACHE_AGENTS again
+        if 'response_cache' in data:
+            task.response_cache = data['response_cache']
 
         await session.commit()
         await session.refresh(task)
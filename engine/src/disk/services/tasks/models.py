@@ -18,6 +18,9 @@ class Task(Base):
     schedule_summary = Column(String(255), nullable=True)
     running_status = Column(Boolean, nullable=False, default=False)
     responses = Column(JSON, nullable=True, default=list)
+    # Serve repeated identical model requests of this task from the response
+    # cache; None follows the RESPONSE_CACHE_AGENTS setting
+    response_cache = Column(Boolean, nullable=True)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     last_run = Column(DateTime, nullable=True)
 
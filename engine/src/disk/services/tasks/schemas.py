@@ -9,6 +9,7 @@ class TaskBase(BaseModel):
     schedule_summary: Optional[str] = None
     running_status: bool = Field(True)
     responses: Optional[List[Dict[str, Any]]] = Field(default_factory=list)
+    response_cache: Optional[bool] = None
 
 
 
@@ -23,6 +24,7 @@ class TaskUpdate(BaseModel):
     schedule_summary: Optional[str] = None
     running_status: Optional[bool] = None
     responses: Optional[List[Dict[str, Any]]] = None
+    response_cache: Optional[bool] = None
 
 
 
@@ -0,0 +1,26 @@
+from datetime import datetime, timedelta, timezone
+
+from fastapi import APIRouter, Depends, Query
+
+from src.disk.core.security import get_current_user
+from src.disk.services.usage import crud
+from src.disk.utils.error_handlers import handle_service_error
+
+
+router = APIRouter()
+
+
+@router.get("/usage")
+async def get_usage_report(
+    period: str = Query("day", pattern="^(hour|day)$"),
+    days: int = Query(30, ge=1, le=366),
+    current_user: str = Depends(get_current_user),
+):
+    """Tokens, calls and model time of the current user per hour or day,
+    by agent, task, provider and model."""
+    try:
+        since = datetime.now(timezone.utc) - timedelta(days=days)
+        rows = await crud.get_usage_report(current_user, period=period, since=since)
+        return {"period": period, "usage": rows}
+    except Exception as e:
+        handle_service_error(e)
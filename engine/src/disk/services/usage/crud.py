@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.future import select
+
+from src.disk.core.db import AsyncSessionLocal
+from src.disk.services.usage import models
+
+
+ROLLUP_MODELS = {
+    'hour': models.UsageRollupHourly,
+    'day': models.UsageRollupDaily,
+}
+SUMMED_COLUMNS = ('calls', 'errors', 'input_tokens', 'output_tokens', 'cached_tokens', 'latency_total', 'ttft_total', 'ttft_count')
+
+
+def _bucket_start(moment: datetime, period: str) -> datetime:
+    if period == 'day':
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def _rollup_increments(records: List[Dict[str, Any]], period: str) -> List[Dict[str, Any]]:
+    rows: Dict[tuple, Dict[str, Any]] = {}
+    for record in records:
+        key = (
+            _bucket_start(record['created_at'], period),
+            record['email'],
+            record.get('agent') or '',
+            record.get('task_id') or '',
+            record['provider'],
+            record.get('model') or '',
+        )
+        row = rows.get(key)
+        if row is None:
+            row = rows[key] = dict(zip(models.ROLLUP_KEY, key), **{column: 0 for column in SUMMED_COLUMNS})
+        row['calls'] += 1
+        row['errors'] += 1 if record.get('error') else 0
+        row['input_tokens'] += record.get('input_tokens') or 0
+        row['output_tokens'] += record.get('output_tokens') or 0
+        row['cached_tokens'] += record.get('cached_tokens') or 0
+        row['latency_total'] += record.get('latency') or 0.0
+        if record.get('ttft') is not None:
+            row['ttft_total'] += record['ttft']
+            row['ttft_count'] += 1
+    return list(rows.values())
+
+
+async def add_usage_records(records: List[Dict[str, Any]]) -> bool:
+    """Append a batch of call records to the ledger and add them to the
+    hourly and daily rollups, in one transaction. task_id comes with each
+    record: it is resolved when the call is made, while the task's hidden
+    conversation still exists."""
+    if not records:
+        return True
+    async with AsyncSessionLocal() as session:
+        try:
+            await session.execute(insert(models.UsageRecord), records)
+
+            for period, rollup_model in ROLLUP_MODELS.items():
+                increments = _rollup_increments(records, period)
+                statement = insert(rollup_model)
+                statement = statement.on_conflict_do_update(
+                    index_elements=list(models.ROLLUP_KEY),
+                    set_={column: getattr(rollup_model, column) + statement.excluded[column] for column in SUMMED_COLUMNS},
+                )
+                await session.execute(statement, increments)
+
+            await session.commit()
+            return True
+        except SQLAlchemyError as e:
+            print(f"Error writing usage records: {e}")
+            await session.rollback()
+            return False
+
+
+def _serialize_rollup(row) -> Dict[str, Any]:
+    return {
+        'bucket_start': (row.bucket_start if row.bucket_start.tzinfo else row.bucket_start.replace(tzinfo=timezone.utc)).isoformat(),
+        'agent': row.agent or None,
+        'task_id': row.task_id or None,
+        'provider': row.provider,
+        'model': row.model or None,
+        'calls': row.calls,
+        'errors': row.errors,
+        'input_tokens': row.input_tokens,
+        'output_tokens': row.output_tokens,
+        'cached_tokens': row.cached_tokens,
+        'model_seconds': round(row.latency_total, 3),
+        'average_latency': round(row.latency_total / row.calls, 3) if row.calls else None,
+        'average_ttft': round(row.ttft_total / row.ttft_count, 3) if row.ttft_count else None,
+    }
+
+
+async def get_usage_report(email: str, period: str = 'day', since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """The user's rollup rows of a period ('hour' or 'day') from since on,
+    newest first; one row per bucket, agent, task, provider and model."""
+    rollup_model = ROLLUP_MODELS.get(period)
+    if rollup_model is None:
+        raise ValueError("period must be 'hour' or 'day'")
+    if since is None:
+        since = datetime.now(timezone.utc) - (timedelta(days=2) if period == 'hour' else timedelta(days=30))
+    async with AsyncSessionLocal() as session:
+        try:
+            result = await session.execute(
+                select(rollup_model)
+                .where(rollup_model.email == email, rollup_model.bucket_start >= _bucket_start(since, period))
+                .order_by(rollup_model.bucket_start.desc())
+            )
+            return [_serialize_rollup(row) for row in result.scalars().all()]
+        except SQLAlchemyError as e:
+            print(f"Error reading usage report: {e}")
+            return []
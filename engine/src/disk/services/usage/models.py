@@ -0,0 +1,58 @@
+from datetime import datetime, timezone
+from sqlalchemy import Column, String, DateTime, Integer, Float, UniqueConstraint
+
+from src.disk.core.db import Base
+
+
+class UsageRecord(Base):
+    """One provider request, as recorded by provider_usage (see usage/writer.py)."""
+    __tablename__ = 'usage_ledger'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), index=True)
+    email = Column(String, nullable=False, index=True)
+    agent = Column(String, nullable=True)
+    conversation_id = Column(String, nullable=True)
+    task_id = Column(String, nullable=True)
+    provider = Column(String, nullable=False)
+    model = Column(String, nullable=True)
+    input_tokens = Column(Integer, nullable=False, default=0)
+    output_tokens = Column(Integer, nullable=False, default=0)
+    cached_tokens = Column(Integer, nullable=False, default=0)
+    latency = Column(Float, nullable=False, default=0.0)
+    ttft = Column(Float, nullable=True)
+    retries = Column(Integer, nullable=False, default=0)
+    error = Column(String, nullable=True)
+
+
+class _UsageRollupColumns:
+    # Totals of the ledger rows of one bucket; agent and task_id are '' when
+    # unset so the unique key (NULLs never collide in SQLite) still matches
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    bucket_start = Column(DateTime(timezone=True), nullable=False)
+    email = Column(String, nullable=False)
+    agent = Column(String, nullable=False, default='')
+    task_id = Column(String, nullable=False, default='')
+    provider = Column(String, nullable=False)
+    model = Column(String, nullable=False, default='')
+    calls = Column(Integer, nullable=False, default=0)
+    errors = Column(Integer, nullable=False, default=0)
+    input_tokens = Column(Integer, nullable=False, default=0)
+    output_tokens = Column(Integer, nullable=False, default=0)
+    cached_tokens = Column(Integer, nullable=False, default=0)
+    latency_total = Column(Float, nullable=False, default=0.0)
+    ttft_total = Column(Float, nullable=False, default=0.0)
+    ttft_count = Column(Integer, nullable=False, default=0)
+
+
+ROLLUP_KEY = ('bucket_start', 'email', 'agent', 'task_id', 'provider', 'model')
+
+
+class UsageRollupHourly(_UsageRollupColumns, Base):
+    __tablename__ = 'usage_rollups_hourly'
+    __table_args__ = (UniqueConstraint(*ROLLUP_KEY, name='uq_usage_rollups_hourly'),)
+
+
+class UsageRollupDaily(_UsageRollupColumns, Base):
+    __tablename__ = 'usage_rollups_daily'
+    __table_args__ = (UniqueConstraint(*ROLLUP_KEY, name='uq_usage_rollups_daily'),)
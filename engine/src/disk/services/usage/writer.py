@@ -0,0 +1,79 @@
+import asyncio
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from src.disk.services.usage import crud as usage_crud
+
+
+FLUSH_INTERVAL_SECONDS = 5.0
+MAX_BATCH_RECORDS = 200
+# Records kept while the database refuses writes; older ones are dropped
+MAX_PENDING_RECORDS = 10000
+
+LEDGER_FIELDS = (
+    'email', 'agent', 'conversation_id', 'task_id', 'provider', 'model',
+    'input_tokens', 'output_tokens', 'cached_tokens', 'latency', 'ttft', 'retries', 'error',
+)
+
+
+class usageLedgerWriter:
+    """Writes provider call records to the usage ledger in batches.
+
+    add() only appends to a buffer, so callers on any thread never wait on
+    the database; a "UsageLedger" thread with its own event loop flushes
+    the buffer every FLUSH_INTERVAL_SECONDS, or sooner once it holds
+    MAX_BATCH_RECORDS, updating the hourly and daily rollups in the same
+    transaction.
+    """
+
+    def __init__(self):
+        self._pending: List[Dict[str, Any]] = []
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def add(self, call: Dict[str, Any]):
+        record = {field: call.get(field) for field in LEDGER_FIELDS}
+        record['email'] = record['email'] or ''
+        record['created_at'] = datetime.now(timezone.utc)
+        with self._lock:
+            self._pending.append(record)
+            if len(self._pending) > MAX_PENDING_RECORDS:
+                del self._pending[:len(self._pending) - MAX_PENDING_RECORDS]
+            full = len(self._pending) >= MAX_BATCH_RECORDS
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="UsageLedger", daemon=True)
+                self._thread.start()
+        if full:
+            self._wake.set()
+
+    def _run(self):
+        asyncio.run(self._flush_forever())
+
+    async def _flush_forever(self):
+        while True:
+            await asyncio.get_running_loop().run_in_executor(None, self._wake.wait, FLUSH_INTERVAL_SECONDS)
+            self._wake.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Write everything buffered so far (also called at shutdown)."""
+        while True:
+            with self._lock:
+                batch = self._pending[:MAX_BATCH_RECORDS]
+                del self._pending[:MAX_BATCH_RECORDS]
+            if not batch:
+                return
+            if not await usage_crud.add_usage_records(batch):
+                # Keep them for the next flush
+                with self._lock:
+                    self._pending[:0] = batch
+                return
+
+
+_USAGE_LEDGER = usageLedgerWriter()
+
+
+def get_usage_ledger() -> usageLedgerWriter:
+    return _USAGE_LEDGER
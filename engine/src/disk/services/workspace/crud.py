@@ -0,0 +1,84 @@
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+from sqlalchemy import delete
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.future import select
+
+from src.disk.core.db import AsyncSessionLocal
+from src.disk.services.workspace import models
+
+
+# Rows per INSERT statement, below SQLite's bound-parameter limit.
+UPSERT_BATCH_SIZE = 500
+
+
+async def get_workspace_files(root: str) -> List[Dict[str, Any]]:
+    """All indexed files of a workspace root."""
+    async with AsyncSessionLocal() as session:
+        try:
+            result = await session.execute(
+                select(models.WorkspaceFile).where(models.WorkspaceFile.root == root)
+            )
+            return [
+                {
+                    'path': f.path,
+                    'size': f.size,
+                    'mtime_ns': f.mtime_ns,
+                    'sha1': f.sha1,
+                    'status': f.status,
+                    'encoding': f.encoding,
+                    'content': f.content,
+                }
+                for f in result.scalars().all()
+            ]
+        except SQLAlchemyError as e:
+            print(f"Error getting workspace files for {root}: {e}")
+            return []
+
+
+async def apply_workspace_changes(root: str, upserts: List[Dict[str, Any]], deleted_paths: List[str]) -> bool:
+    """Upsert changed files (dicts shaped like get_workspace_files rows) and
+    delete removed ones, in one transaction."""
+    if not upserts and not deleted_paths:
+        return True
+
+    async with AsyncSessionLocal() as session:
+        try:
+            now = datetime.now(timezone.utc)
+            for start in range(0, len(upserts), UPSERT_BATCH_SIZE):
+                rows = [
+                    {'id': str(uuid.uuid4()), 'root': root, 'updated_at': now, **row}
+                    for row in upserts[start:start + UPSERT_BATCH_SIZE]
+                ]
+                statement = insert(models.WorkspaceFile).values(rows)
+                statement = statement.on_conflict_do_update(
+                    index_elements=['root', 'path'],
+                    set_={
+                        'size': statement.excluded.size,
+                        'mtime_ns': statement.excluded.mtime_ns,
+                        'sha1': statement.excluded.sha1,
+                        'status': statement.excluded.status,
+                        'encoding': statement.excluded.encoding,
+                        'content': statement.excluded.content,
+                        'updated_at': statement.excluded.updated_at,
+                    },
+                )
+                await session.execute(statement)
+
+            for start in range(0, len(deleted_paths), UPSERT_BATCH_SIZE):
+                await session.execute(
+                    delete(models.WorkspaceFile).where(
+                        models.WorkspaceFile.root == root,
+                        models.WorkspaceFile.path.in_(deleted_paths[start:start + UPSERT_BATCH_SIZE]),
+                    )
+                )
+
+            await session.commit()
+            return True
+        except SQLAlchemyError as e:
+            print(f"Error updating workspace files for {root}: {e}")
+            await session.rollback()
+            return False
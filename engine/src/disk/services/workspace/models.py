@@ -0,0 +1,20 @@
+from datetime import datetime, timezone
+from sqlalchemy import Column, String, DateTime, Text, Integer, BigInteger, UniqueConstraint
+
+from src.disk.core.db import Base
+
+class WorkspaceFile(Base):
+    """One indexed file of a local workspace (see eido/utils/workspace_index.py)."""
+    __tablename__ = 'workspace_files'
+    id = Column(String, primary_key=True)
+    root = Column(String, nullable=False, index=True)
+    path = Column(String, nullable=False)  # relative to root
+    size = Column(Integer)
+    mtime_ns = Column(BigInteger)
+    sha1 = Column(String)
+    status = Column(String, nullable=True)  # text, binary, too_large, undecodable or over_total_cap
+    encoding = Column(String, nullable=True)  # None when the file could not be decoded
+    content = Column(Text, nullable=True)
+    updated_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+
+    __table_args__ = (UniqueConstraint('root', 'path', name='uq_workspace_files_root_path'),)
@@ -123,6 +123,8 @@ async def delete_user(email: str):
             )
             
             await session.commit()
+            from src.disk.services.eido.crud import bump_eido_settings_version
+            bump_eido_settings_version(email)
             return True
             
         except Exception as e:
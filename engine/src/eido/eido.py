@@ -1,16 +1,15 @@
-import json
-import asyncio
 import inspect
 from typing import Optional
 
 from src.eido.payload.eidoSystem import eidoSystem
 from src.eido.payload.eidoConversation import eidoConversation
 
-from src.eido.utils.eido_config import fetch_provider_name
-from src.eido.models.xai.xai_main import xai_main_class
-from src.eido.models.openai.openai_main import openai_main_class
-from src.eido.models.ollama.ollama_main import ollama_main_class
-from src.eido.models.anthropic.anthropic_main import anthropic_main_class
+from src.eido.utils.tools_executor import execute_tool
+from src.eido.utils.json_repair import parse_model_json
+from src.eido.utils.response_stream import responseStream
+from src.eido.utils.response_cache import get_response_cache
+from src.eido.models.provider_errors import ProviderError
+from src.eido.models.provider_gateway import request_model_response
 
 
 from src.disk.services.chats import crud as chat_crud
@@ -26,6 +25,7 @@ class eido:
 
         self.last_assistant_message_id: Optional[str] = None
         self.last_assistant_content: Optional[str] = None
+        self.stream: Optional[responseStream] = None
 
 ########################################################
 
@@ -70,6 +70,10 @@ class eido:
                 "assistant_message_id": saved_message.get("id"),
                 "conversation_id": self.conversation_id
             }
+            # The message completing a streamed reply replaces it on the clients
+            stream_id = self.stream.take() if self.stream is not None else None
+            if stream_id:
+                message_data["stream_id"] = stream_id
             
             # Send to all clients connected for this user's email
             await server.ws_manager.send_to_user(self.email, message_data)
@@ -93,19 +97,13 @@ class eido:
         else:
             func = self.function_map[function_name]
             try:
-                try:
-                    func_signature = inspect.signature(func)
-                    if "email" in func_signature.parameters and ("email" not in kwargs or kwargs.get("email") is None):
-                        kwargs["email"] = self.email
-                except Exception:
-                    pass
-
-                if asyncio.iscoroutinefunction(func):
-                    result = await func(*args, **kwargs)
-                else:
-                    result = func(*args, **kwargs)
-            except Exception as e:
-                result = {"Success": False, "Error": str(e)}
+                func_signature = inspect.signature(func)
+                if "email" in func_signature.parameters and ("email" not in kwargs or kwargs.get("email") is None):
+                    kwargs["email"] = self.email
+            except Exception:
+                pass
+
+            result = await execute_tool(func, function_name, args, kwargs)
 
         function_message_notifiaction = f"Tool response: '''{str(result)}'''"
         #print(f"\n\n[TOOL]: {function_message_notifiaction}")
@@ -178,12 +176,12 @@ class eido:
             next_step_error = "ERROR: No next_step found in the LLM response"
             print(f"\n\n[ERROR]: {next_step_error}")
   
-    async def process_llm_response_gate_2(self, cleaned_response):
-        parsed_response = json.loads(cleaned_response)
+    async def process_llm_response_gate_2(self, parsed_response):
         text_response = parsed_response.get("response", "")
         if text_response and text_response.strip():
             agent_response = f"[{self.agent_name}]: {text_response}"
             await self.append_chat_history("assistant", agent_response)
+        await self._end_stream()
         
         agents = parsed_response.get("agents", [])
         functions_list = parsed_response.get("functions_list", [])
@@ -208,44 +206,45 @@ class eido:
             await self.next_step_determinator(parsed_response)
 
     async def process_llm_response(self, response):
-        if not (response.startswith('{') and response.endswith('}')):
+        parsed_response = parse_model_json(response)
+
+        if parsed_response is None:
+            await self._end_stream()
             json_error_handling_failed = f"ERROR: Last response is not a valid JSON object. You must follow the response format given to you."
             await self._handle_internal_messages_pre_processing(json_error_handling_failed)
             print(json_error_handling_failed + " - Retrying")
-            response = await self.run()
-            
-            await self.process_llm_response(response)
+            await self.run()
             
         else:
-            await self.process_llm_response_gate_2(response)
+            await self.process_llm_response_gate_2(parsed_response)
 
 #############################################
 
     async def get_model_response(self, system_prompt, chat_messages): 
-        provider_name = await fetch_provider_name(self.email)
         if not self.conversation_id:
             raise ValueError("conversation_id is required for eido operations")
 
-        provider_map = {
-            "openai": openai_main_class,
-            "ollama": ollama_main_class,
-            "xai": xai_main_class,
-            "anthropic": anthropic_main_class
-        }
-
-        if provider_name not in provider_map:
-            response = "Provider not found"
-            print(f"\n\n[ERROR]: get_model_response: {response}")
-            return response
-
-        provider_class = provider_map[provider_name]
-
-        response = await provider_class(system_prompt, chat_messages).text_response(self.email)
-
-        if response.startswith('```json') and response.endswith('```'):
-            response = response[7:-3].strip()
-            
+        cache = get_response_cache()
+        cache_key = None
+        if await cache.enabled(self.email, self.agent_name, self.conversation_id):
+            cache_key = await cache.request_key(self.email, system_prompt, chat_messages)
+            cached = await cache.get(cache_key, self.agent_name)
+            if cached is not None:
+                self.stream = None
+                return cached
+
+        self.stream = responseStream(self.email, self.conversation_id, self.agent_name)
+        response = await request_model_response(self.email, system_prompt, chat_messages, stream=self.stream,
+                                                agent=self.agent_name, conversation_id=self.conversation_id)
+        # Replies that need a retry are not worth replaying
+        if cache_key is not None and parse_model_json(response) is not None:
+            await cache.put(cache_key, self.email, self.agent_name, response)
         return response
+
+    async def _end_stream(self):
+        """Close a streamed reply that did not become a stored message."""
+        if self.stream is not None:
+            await self.stream.discard()
     
 #############################################
 
@@ -254,32 +253,19 @@ class eido:
         system_prompt = await self.system.set_modelSystem(self.agent_name)
         self.function_map = getattr(self.system, 'function_map', {})
 
-        chat_messages = await self.conversation.chat_history()
+        chat_messages = await self.conversation.chat_history(system_prompt)
 
-        response = await self.get_model_response(system_prompt, chat_messages)
+        try:
+            response = await self.get_model_response(system_prompt, chat_messages)
+        except ProviderError as e:
+            await self._end_stream()
+            print(f"\n\n[ERROR]: {e}\n\n Aborting.")
+            return
 
         #print(f"\n\n-------\n\n### System prompt:\n\n{system_prompt}\n\n-------\n\n")
         #print(f"\n\n-------\n\n### Chat messages:\n\n{chat_messages}\n\n-------\n\n")
         #print(f"\n\n-------\n\n### Model response:\n\n{response}\n\n-------\n\n")
 
-        max_retries = 5
-        retry_delay = 3
-        for attempt in range(max_retries):
-            if response != "FAIL":
-                break
-
-            print(f"\n\n[ERROR]: {response}\n\n Retrying... (attempt {attempt + 1} of {max_retries})")
-            for i in range(retry_delay, 0, -1):
-                print(f'Retrying in {i} seconds...')
-                await asyncio.sleep(1)
-
-            response = await self.get_model_response(system_prompt, chat_messages)
-        
-        if response == "FAIL":
-            print("\n\n[ERROR]: Maximum retries reached. Aborting.")
-            return
-
-        else:
-            await self.process_llm_response(response)
+        await self.process_llm_response(response)
 
         await self._handle_internal_messages_post_processing()
\ No newline at end of file
@@ -1,18 +1,30 @@
-import anthropic
-
+import asyncio
 from src.eido.utils.apis_config import fetch_api_key_for_provider
+from src.eido.models.provider_usage import report_prompt_cache
+from src.eido.models.provider_clients import call_provider, stream_provider
+from src.eido.models.provider_limits import acquire_provider_budget
+from src.eido.models.provider_errors import (
+    ProviderAuthError,
+    ProviderEmptyResponseError,
+    classify_provider_error,
+)
 from src.eido.utils.eido_config import (
     fetch_model_name,
     fetch_model_max_tokens,
     fetch_model_temperature,
 )
 
+# Anthropic accepts at most four cache_control breakpoints per request.
+MAX_CACHE_BREAKPOINTS = 4
+CACHE_CONTROL = {"type": "ephemeral"}
+
 class anthropic_main_class:
     def __init__(self, system, chat_messages):
         self.system = system
         self.messages = chat_messages
+        self.usage = None  # token usage of the last call, see provider_usage
 
-    async def text_response(self, email):
+    async def text_response(self, email, on_text=None):
         llm_api_key = await fetch_api_key_for_provider("anthropic", email=email)
         
         model = await fetch_model_name(email=email)
@@ -20,45 +32,82 @@ class anthropic_main_class:
         temperature = await fetch_model_temperature(email=email)
 
         if not llm_api_key:
-            print(f"[ANTHROPIC_ERROR] No API key provided")
-            return "FAIL"
+            raise ProviderAuthError("anthropic", "No API key provided")
 
-        client = anthropic.Anthropic(api_key=llm_api_key)
         message_list = []
         all_messages = []
+        message_breakpoints = []
         for message in self.messages:
             role = message["role"]
             content = message["content"]
             if content is None:  # Skip messages with null content
                 continue
             all_messages.append(content)
+            if message.get("cache_breakpoint"):
+                message_breakpoints.append(len(message_list))
             message_list.append({"role": role, "content": content})
+
+        # One breakpoint after each system segment (most static first), then
+        # the latest stable message, newest first if over the limit
+        segments = getattr(self.system, "segments", None) or ((str(self.system),) if self.system else ())
+        system_blocks = [{"type": "text", "text": text} for text in segments]
+        breakpoints_left = MAX_CACHE_BREAKPOINTS
+        for index in reversed(message_breakpoints):
+            if breakpoints_left <= 1:
+                break
+            message_list[index]["content"] = [{"type": "text", "text": message_list[index]["content"], "cache_control": CACHE_CONTROL}]
+            breakpoints_left -= 1
+        for block in system_blocks[:breakpoints_left]:
+            block["cache_control"] = CACHE_CONTROL
         
         #print(f"\n\n### System: {self.system}")
         #print(f"\n\n### Messages: {message_list}")
-        
+
+        budget = await acquire_provider_budget("anthropic", llm_api_key, email, self.system, self.messages, max_tokens)
         try:
             create_args = {
                 "model": str(model),
                 "messages": message_list,
-                "system": self.system,
             }
+            if system_blocks:
+                create_args["system"] = system_blocks
             if max_tokens:
                 create_args["max_tokens"] = int(max_tokens)
             if temperature:
                 create_args["temperature"] = float(temperature)
-            response = client.messages.create(**create_args)
+            if on_text is None:
+                response = await call_provider("anthropic", llm_api_key, lambda client: client.messages.create(**create_args))
+            else:
+                async def events(client):
+                    async with client.messages.stream(**create_args) as stream:
+                        async for text in stream.text_stream:
+                            yield text
+                        yield await stream.get_final_message()
+                response = await stream_provider("anthropic", llm_api_key, events, on_text)
+        except asyncio.CancelledError:
+            # Not an Exception: settled here or the key and the limiter never see the call
+            self.usage = budget.cancel()
+            raise
         except Exception as e:
             print(f"[ANTHROPIC_ERROR] {type(e).__name__}: {e}")
-            return "FAIL"
+            error = classify_provider_error("anthropic", e)
+            budget.settle(error=error)
+            raise error from e
+
+        usage = getattr(response, 'usage', None)
+        if usage is not None:
+            cache_read = getattr(usage, 'cache_read_input_tokens', 0) or 0
+            cache_write = getattr(usage, 'cache_creation_input_tokens', 0) or 0
+            input_tokens = (getattr(usage, 'input_tokens', 0) or 0) + cache_read + cache_write
+            self.usage = report_prompt_cache("anthropic", model, input_tokens, cache_read, cache_write, output_tokens=getattr(usage, 'output_tokens', 0))
+            budget.settle(input_tokens + self.usage["output_tokens"])
+        else:
+            budget.settle()
 
         content = getattr(response, 'content', None)
         if content and len(content) > 0 and hasattr(content[0], 'text'):
             text_content = content[0].text
             if text_content and text_content.strip():
                 return text_content.strip()
-            else:
-                print(str(response))
-                return "FAIL"
         print(str(response))
-        return "FAIL"
\ No newline at end of file
+        raise ProviderEmptyResponseError("anthropic", "Empty response content")
\ No newline at end of file
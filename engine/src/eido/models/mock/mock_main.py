@@ -0,0 +1,269 @@
+import os
+import json
+import random
+import asyncio
+import hashlib
+import threading
+from typing import Any, Dict, Optional
+
+from src.eido.models.provider_limits import acquire_provider_budget
+from src.eido.models.provider_errors import (
+    ProviderAuthError,
+    ProviderEmptyResponseError,
+    ProviderRateLimitError,
+    ProviderUnavailableError,
+)
+from src.eido.utils.eido_config import fetch_model_max_tokens, fetch_model_name
+from src.eido.utils.token_estimator import estimate_tokens
+
+
+# Path of a JSON file with the mock's behaviour; without one the defaults
+# below answer instantly with short await_operator replies.
+MOCK_CONFIG_ENV = "MOCK_PROVIDER_CONFIG"
+INTERNAL_PREFIX = "[**INTERNAL SYSTEM MESSAGE**]"
+
+DEFAULT_MOCK_CONFIG: Dict[str, Any] = {
+    "seed": 0,
+    # Seconds; a number or a distribution, see sample_distribution
+    "latency": 0,
+    "time_to_first_token": 0,
+    # Share of calls that fail, and the weights of the failure kinds
+    "failure_rate": 0.0,
+    "failures": {"rate_limit": 1, "unavailable": 1, "timeout": 1, "empty": 0, "auth": 0},
+    "retry_after": 1.0,
+    # Scripted replies, served in order per user and cycled; dicts are sent
+    # as JSON, strings as they are (to test malformed replies)
+    "script": [],
+    # Generated replies
+    "response_words": {"distribution": "uniform", "min": 5, "max": 40},
+    "functions": [],  # [{"function": name, "args": [...], "kwargs": {...}}]
+    "agents": [],
+    "tool_rate": 0.0,
+    "agent_rate": 0.0,
+    "continue_rate": 0.0,
+    # Steps after the operator's message before a reply always awaits the operator
+    "max_chain": 3,
+    "stream_chunk_chars": 16,
+}
+
+_WORDS = (
+    "engine request context signal module thread latency token cache index "
+    "queue agent tool reply buffer socket record stream result state value"
+).split()
+
+
+def sample_distribution(spec, rng: random.Random) -> float:
+    """A non-negative sample (seconds, or a count) from a number or a spec:
+    {"distribution": "fixed", "value"}, "uniform" (min, max), "normal" (mean,
+    stdev), "lognormal" (median, sigma) or "exponential" (mean)."""
+    if spec is None:
+        return 0.0
+    if isinstance(spec, (int, float)):
+        return max(0.0, float(spec))
+
+    distribution = spec.get("distribution", "fixed")
+    if distribution == "uniform":
+        value = rng.uniform(spec.get("min", 0.0), spec.get("max", 0.0))
+    elif distribution == "normal":
+        value = rng.gauss(spec.get("mean", 0.0), spec.get("stdev", 0.0))
+    elif distribution == "lognormal":
+        value = spec.get("median", 0.0) * rng.lognormvariate(0.0, spec.get("sigma", 0.0))
+    elif distribution == "exponential":
+        mean = spec.get("mean", 0.0)
+        value = rng.expovariate(1.0 / mean) if mean > 0 else 0.0
+    else:
+        value = spec.get("value", 0.0)
+    return max(0.0, float(value))
+
+
+class mockConfig:
+    """The MOCK_PROVIDER_CONFIG file, re-read when it changes.
+
+    A "profiles" object in the file maps model names to overrides, so the
+    MODEL_NAME setting picks a profile.
+    """
+
+    def __init__(self):
+        self._path: Optional[str] = None
+        self._mtime_ns: Optional[int] = None
+        self._config: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _file(self) -> Dict[str, Any]:
+        path = os.environ.get(MOCK_CONFIG_ENV)
+        if not path:
+            return {}
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError as e:
+            print(f"\n\n[MOCK]: Cannot read {path}: {e}. Using defaults.")
+            return {}
+        with self._lock:
+            if path != self._path or mtime_ns != self._mtime_ns:
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        self._config = json.load(f)
+                except (OSError, ValueError) as e:
+                    print(f"\n\n[MOCK]: Invalid config {path}: {e}. Using defaults.")
+                    self._config = {}
+                self._path, self._mtime_ns = path, mtime_ns
+            return self._config
+
+    def get(self, model: Optional[str] = None) -> Dict[str, Any]:
+        config = dict(DEFAULT_MOCK_CONFIG)
+        loaded = self._file()
+        config.update({k: v for k, v in loaded.items() if k != "profiles"})
+        profile = (loaded.get("profiles") or {}).get(model or "")
+        if profile:
+            config.update(profile)
+        return config
+
+
+_MOCK_CONFIG = mockConfig()
+
+# Shared, seeded generator for timings and failures: the same sequence of
+# calls sees the same delays and errors. Reply content is seeded per request.
+_timing_rng: Optional[random.Random] = None
+_timing_seed = None
+_script_positions: Dict[str, int] = {}
+_state_lock = threading.Lock()
+
+
+def _next_timing_rng(seed) -> random.Random:
+    global _timing_rng, _timing_seed
+    with _state_lock:
+        if _timing_rng is None or seed != _timing_seed:
+            _timing_rng, _timing_seed = random.Random(seed), seed
+        return _timing_rng
+
+
+def _next_script_position(email: str) -> int:
+    with _state_lock:
+        position = _script_positions.get(email, 0)
+        _script_positions[email] = position + 1
+        return position
+
+
+def _steps_since_operator(messages) -> int:
+    """Replies already given since the operator's latest message."""
+    steps = 0
+    for message in reversed(messages):
+        content = str(message.get("content") or "").lstrip()
+        if content.startswith(INTERNAL_PREFIX):
+            continue
+        if message.get("role") == "user":
+            break
+        steps += 1
+    return steps
+
+
+class mock_main_class:
+    """Offline provider: eido-format replies with configurable timings and
+    failures, for load tests that leave model latency out (or model it).
+
+    Select it with PROVIDER_NAME "mock". Replies come from the config's
+    "script" or are generated: response text, and by the configured rates a
+    functions_list, agents or a continue, with chains capped at max_chain.
+    Generated content is a function of the seed and the request, so the same
+    conversation gets the same replies on every run.
+    """
+
+    def __init__(self, system, chat_messages):
+        self.system = system
+        self.messages = chat_messages
+        self.usage = None  # token usage of the last call, see provider_usage
+
+    def _fingerprint(self, seed) -> str:
+        digest = hashlib.sha1(str(seed).encode("utf-8"))
+        digest.update(str(self.system).encode("utf-8"))
+        for message in self.messages:
+            digest.update(f"{message.get('role')}\x00{message.get('content')}\x00".encode("utf-8"))
+        return digest.hexdigest()
+
+    def _generate(self, config: Dict[str, Any], rng: random.Random) -> Dict[str, Any]:
+        word_count = max(1, int(sample_distribution(config["response_words"], rng)))
+        reply = {
+            "response": " ".join(rng.choice(_WORDS) for _ in range(word_count)).capitalize() + ".",
+            "agents": [],
+            "functions_list": [],
+            "next_step": "await_operator",
+        }
+        if _steps_since_operator(self.messages) >= int(config["max_chain"]):
+            return reply
+
+        roll = rng.random()
+        if config["functions"] and roll < config["tool_rate"]:
+            reply["functions_list"] = [dict(rng.choice(config["functions"]))]
+            reply["next_step"] = "continue"
+        elif config["agents"] and roll < config["tool_rate"] + config["agent_rate"]:
+            reply["agents"] = [rng.choice(config["agents"])]
+            reply["next_step"] = "continue"
+        elif rng.random() < config["continue_rate"]:
+            reply["next_step"] = "continue"
+        return reply
+
+    def _failure(self, config: Dict[str, Any], rng: random.Random):
+        weights = {kind: weight for kind, weight in (config["failures"] or {}).items() if weight > 0}
+        if not weights:
+            return None
+        kind = rng.choices(list(weights), weights=list(weights.values()))[0]
+        if kind == "rate_limit":
+            return ProviderRateLimitError("mock", "Simulated rate limit", status_code=429, retry_after=config["retry_after"])
+        if kind == "timeout":
+            return ProviderUnavailableError("mock", "Simulated timeout")
+        if kind == "empty":
+            return ProviderEmptyResponseError("mock", "Simulated empty response")
+        if kind == "auth":
+            return ProviderAuthError("mock", "Simulated invalid API key", status_code=401)
+        return ProviderUnavailableError("mock", "Simulated outage", status_code=503)
+
+    async def text_response(self, email, on_text=None):
+        model = await fetch_model_name(email=email)
+        config = _MOCK_CONFIG.get(model)
+
+        timing = _next_timing_rng(config["seed"])
+        with _state_lock:
+            fails = timing.random() < float(config["failure_rate"])
+            failure = self._failure(config, timing) if fails else None
+            first_token = sample_distribution(config["time_to_first_token"], timing)
+            # Total time of the call; never shorter than the first token
+            latency = max(first_token, sample_distribution(config["latency"], timing))
+
+        # MOCK_RPM and MOCK_TPM exercise the limiter offline
+        budget = await acquire_provider_budget("mock", "", email, self.system, self.messages, await fetch_model_max_tokens(email=email))
+        try:
+            if failure is not None:
+                # Rate limits are refused up front, other failures after the first-token wait
+                if not isinstance(failure, ProviderRateLimitError):
+                    await asyncio.sleep(first_token)
+                budget.settle(error=failure)
+                raise failure
+
+            if config["script"]:
+                scripted = config["script"][_next_script_position(email) % len(config["script"])]
+                text = scripted if isinstance(scripted, str) else json.dumps(scripted)
+            else:
+                rng = random.Random(self._fingerprint(config["seed"]))
+                text = json.dumps(self._generate(config, rng))
+
+            await asyncio.sleep(first_token)
+            if on_text is None:
+                await asyncio.sleep(latency - first_token)
+            else:
+                size = max(1, int(config["stream_chunk_chars"]))
+                chunks = [text[i:i + size] for i in range(0, len(text), size)] or [""]
+                pause = (latency - first_token) / max(1, len(chunks) - 1)
+                for position, chunk in enumerate(chunks):
+                    if position:
+                        await asyncio.sleep(pause)
+                    await on_text(chunk)
+        except asyncio.CancelledError:
+            self.usage = budget.cancel()
+            raise
+
+        if not text.strip():
+            raise ProviderEmptyResponseError("mock", "Empty response content")
+        prompt_tokens = estimate_tokens(str(self.system)) + sum(estimate_tokens(str(m.get("content") or "")) for m in self.messages)
+        self.usage = {"input_tokens": prompt_tokens, "output_tokens": estimate_tokens(text), "cached_tokens": 0}
+        budget.settle(prompt_tokens + self.usage["output_tokens"])
+        return text
@@ -1,63 +1,21 @@
 import ollama
-import json
-import re
+from src.eido.models.provider_clients import call_provider, stream_provider
+from src.eido.models.ollama.ollama_residency import KEEP_ALIVE, get_ollama_residency
+from src.eido.models.provider_errors import (
+    ProviderConfigError,
+    ProviderEmptyResponseError,
+    ProviderUnavailableError,
+    classify_provider_error,
+)
 from src.eido.utils.eido_config import (fetch_model_name,fetch_model_max_tokens,fetch_model_temperature,)
 
 class ollama_main_class:
     def __init__(self, system, chat_messages):
         self.system = system
         self.messages = chat_messages
+        self.usage = None  # token usage of the last call, see provider_usage
 
-    def _extract_json_from_response(self, content):
-        """Extract JSON content from response, handling thinking text and other prefixes"""
-        if not content:
-            return content
-        
-        if "</think>" in content:
-            parts = content.split("</think>", 1)
-            if len(parts) > 1:
-                content = parts[1].strip()
-        
-        json_pattern = r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}'
-        matches = re.findall(json_pattern, content, re.DOTALL)
-        
-        if matches:
-            json_candidate = max(matches, key=len)
-            
-            try:
-                json.loads(json_candidate)
-                return json_candidate.strip()
-            except json.JSONDecodeError:
-                pass
-        
-        lines = content.split('\n')
-        json_started = False
-        json_lines = []
-        brace_count = 0
-        
-        for line in lines:
-            line = line.strip()
-            if not json_started and line.startswith('{'):
-                json_started = True
-                json_lines.append(line)
-                brace_count += line.count('{') - line.count('}')
-            elif json_started:
-                json_lines.append(line)
-                brace_count += line.count('{') - line.count('}')
-                if brace_count == 0:
-                    break
-        
-        if json_lines:
-            potential_json = '\n'.join(json_lines)
-            try:
-                json.loads(potential_json)
-                return potential_json
-            except json.JSONDecodeError:
-                pass
-        
-        return content
-
-    async def text_response(self, email):
+    async def text_response(self, email, on_text=None):
         
         try:
             model = await fetch_model_name(email)
@@ -66,12 +24,9 @@ class ollama_main_class:
 
         except Exception as cfg_err:
             print(f"[OLLAMA_CONFIG_ERROR] Failed to resolve config: {type(cfg_err).__name__}: {cfg_err}")
-            return "FAIL"
+            raise ProviderConfigError("ollama", f"Failed to resolve config: {cfg_err}") from cfg_err
         
         try:
-            #print(f"[DEBUG] Initializing Ollama client...")
-            client = ollama.Client()
-            
             message_list = []
             for message in self.messages:
                 role = message.get("role")
@@ -92,11 +47,33 @@ class ollama_main_class:
             
             
             try:
-                response = client.chat(
-                    model=str(model),
-                    messages=message_list,
-                    options=options
-                )
+                if on_text is None:
+                    response = await call_provider("ollama", "", lambda client: client.chat(
+                        model=str(model),
+                        messages=message_list,
+                        options=options,
+                        keep_alive=KEEP_ALIVE
+                    ))
+                else:
+                    async def events(client):
+                        parts, last = [], None
+                        async for part in await client.chat(model=str(model), messages=message_list, options=options, stream=True, keep_alive=KEEP_ALIVE):
+                            last = part
+                            text = part['message']['content'] if part.get('message') else None
+                            if text:
+                                parts.append(text)
+                                yield text
+                        # The last part carries the timings and counts of the whole call
+                        final = {key: last.get(key) for key in ('load_duration', 'prompt_eval_count', 'eval_count')} if last is not None else {}
+                        yield {'message': {'role': 'assistant', 'content': "".join(parts)}, **final}
+                    response = await stream_provider("ollama", "", events, on_text)
+                get_ollama_residency().record_call(str(model), response)
+                if response:
+                    self.usage = {
+                        "input_tokens": response.get('prompt_eval_count') or 0,
+                        "output_tokens": response.get('eval_count') or 0,
+                        "cached_tokens": 0,
+                    }
                 #print(f"ollama_main_class response: {response}")
             except Exception as chat_error:
                 print(f"[ERROR] Chat request failed: {type(chat_error).__name__}: {chat_error}")
@@ -105,34 +82,36 @@ class ollama_main_class:
             if response and 'message' in response and 'content' in response['message']:
                 content = response['message']['content']
                 if content and content.strip():
-                    cleaned_content = self._extract_json_from_response(content)
                     #print(f"[SUCCESS] Response received from model {model}")
-                    return cleaned_content
+                    return content.strip()
                 else:
                     print(f"[EMPTY] Received empty response from ollama")
-                    return "FAIL"
+                    raise ProviderEmptyResponseError("ollama", "Empty response content")
             else:
                 print(f"[INVALID] Invalid response structure from ollama")
-                return "FAIL"
-                
+                raise ProviderEmptyResponseError("ollama", "Invalid response structure")
+
+        except ProviderEmptyResponseError:
+            raise
+
         except ollama.ResponseError as e:
             error_msg = f"[OLLAMA_ERROR] Response error: {e.error if hasattr(e, 'error') else str(e)}"
             if hasattr(e, 'status_code') and e.status_code == 404:
                 error_msg += f" - Model '{model}' not found. Please pull the model first with: ollama pull {model}"
             print(f"\n\n#### {error_msg}")
-            return "FAIL"
+            raise classify_provider_error("ollama", e) from e
             
         except ConnectionError as e:
             error_msg = f"[CONNECTION_ERROR] Cannot connect to Ollama server: {str(e)} - Please ensure Ollama is running"
             print(f"\n\n#### {error_msg}")
-            return "FAIL"
+            raise ProviderUnavailableError("ollama", str(e)) from e
             
         except ValueError as e:
             error_msg = f"[VALUE_ERROR] Invalid configuration values: {str(e)}"
             print(f"\n\n#### {error_msg}")
-            return "FAIL"
+            raise ProviderConfigError("ollama", str(e)) from e
             
         except Exception as e:
             error_msg = f"[UNEXPECTED_ERROR] Unexpected error in ollama_main text_response: {str(e)}"
             print(f"\n\n#### {error_msg}")
-            return "FAIL" 
\ No newline at end of file
+            raise classify_provider_error("ollama", e) from e 
\ No newline at end of file
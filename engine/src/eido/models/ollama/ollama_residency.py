@@ -0,0 +1,159 @@
+import time
+import asyncio
+import threading
+import concurrent.futures
+from typing import Any, Dict, Iterable, Optional
+
+from src.eido.models.provider_clients import call_provider, run_on_provider_loop
+from src.eido.utils.metrics import register_metrics
+
+
+# How long Ollama keeps a model in memory after a request or a ping
+KEEP_ALIVE = "10m"
+# Models used within this window are pinged so they stay loaded
+ACTIVE_WINDOW_SECONDS = 30 * 60
+PING_INTERVAL_SECONDS = 4 * 60
+# A request whose load_duration passes this loaded the model from disk
+COLD_LOAD_SECONDS = 1.0
+
+
+class ollamaResidency:
+    """Keeps the Ollama models in use loaded.
+
+    Models are preloaded at engine start and when a user switches to one,
+    and every request asks Ollama to keep its model for KEEP_ALIVE. While a
+    model was used within ACTIVE_WINDOW_SECONDS a background task on the
+    provider loop pings it before that runs out, so the next request does
+    not pay the load from disk. Loaded models come from Ollama's ps.
+    """
+
+    def __init__(self):
+        self._models: Dict[str, Dict[str, Any]] = {}
+        self._loaded: Dict[str, Optional[str]] = {}  # model -> expires_at
+        self._keeper: Optional[concurrent.futures.Future] = None
+        self._lock = threading.Lock()
+
+    def _model(self, model: str) -> Dict[str, Any]:
+        # Called with the lock held
+        if model not in self._models:
+            self._models[model] = {
+                "last_used": None,
+                "loads": 0,
+                "load_seconds_total": 0.0,
+                "load_seconds_max": 0.0,
+                "load_seconds_last": None,
+                "preloads": 0,
+                "pings": 0,
+            }
+        return self._models[model]
+
+    def _record_load(self, model: str, seconds: float):
+        with self._lock:
+            entry = self._model(model)
+            entry["loads"] += 1
+            entry["load_seconds_total"] += seconds
+            entry["load_seconds_max"] = max(entry["load_seconds_max"], seconds)
+            entry["load_seconds_last"] = round(seconds, 3)
+            self._loaded.setdefault(model, None)
+
+    def record_call(self, model: str, response):
+        """Note a chat request's model as used, and its load time when it had to load."""
+        load_seconds = ((response.get("load_duration") if response else None) or 0) / 1e9
+        if load_seconds >= COLD_LOAD_SECONDS:
+            print(f"\n\n[OLLAMA]: '{model}' was not loaded, loading took {load_seconds:.1f} seconds")
+            self._record_load(model, load_seconds)
+        with self._lock:
+            self._model(model)["last_used"] = time.monotonic()
+            self._loaded.setdefault(model, None)
+        self.start()
+
+    ########################################################
+
+    async def _load(self, model: str, reason: str):
+        # An empty prompt loads the model without generating anything
+        response = await call_provider("ollama", "", lambda client: client.generate(model=model, prompt="", keep_alive=KEEP_ALIVE))
+        load_seconds = (response.get("load_duration") or 0) / 1e9
+        with self._lock:
+            self._model(model)[reason] += 1
+        if load_seconds >= COLD_LOAD_SECONDS:
+            self._record_load(model, load_seconds)
+            print(f"\n\n[OLLAMA]: Loaded '{model}' in {load_seconds:.1f} seconds")
+
+    async def preload(self, models: Iterable[str]):
+        for model in models:
+            try:
+                await self._load(model, "preloads")
+            except Exception as e:
+                print(f"\n\n[OLLAMA]: Could not preload '{model}': {type(e).__name__}: {e}")
+        await self.refresh()
+
+    def preload_soon(self, models: Iterable[str]):
+        """Preload models in the background, from any thread."""
+        models = [str(model) for model in models if model]
+        if models:
+            run_on_provider_loop(self.preload(models))
+            self.start()
+
+    async def refresh(self):
+        try:
+            running = await call_provider("ollama", "", lambda client: client.ps())
+        except Exception:
+            return  # Ollama not running
+        loaded = {}
+        for process in running.models or []:
+            expires_at = getattr(process, "expires_at", None)
+            loaded[process.model] = expires_at.isoformat() if expires_at else None
+        with self._lock:
+            self._loaded = loaded
+
+    async def _keep_resident(self):
+        while True:
+            await asyncio.sleep(PING_INTERVAL_SECONDS)
+            now = time.monotonic()
+            with self._lock:
+                active = [
+                    model for model, entry in self._models.items()
+                    if entry["last_used"] is not None and now - entry["last_used"] < ACTIVE_WINDOW_SECONDS
+                ]
+            for model in active:
+                try:
+                    await self._load(model, "pings")
+                except Exception as e:
+                    print(f"\n\n[OLLAMA]: Keep-alive ping of '{model}' failed: {type(e).__name__}: {e}")
+            await self.refresh()
+
+    def start(self):
+        with self._lock:
+            if self._keeper is not None and not self._keeper.done():
+                return
+            self._keeper = run_on_provider_loop(self._keep_resident())
+
+    ########################################################
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            models = {}
+            for model, entry in self._models.items():
+                models[model] = {
+                    "loaded": model in self._loaded,
+                    "expires_at": self._loaded.get(model),
+                    "loads": entry["loads"],
+                    "load_seconds_average": round(entry["load_seconds_total"] / entry["loads"], 3) if entry["loads"] else None,
+                    "load_seconds_max": round(entry["load_seconds_max"], 3),
+                    "load_seconds_last": entry["load_seconds_last"],
+                    "preloads": entry["preloads"],
+                    "pings": entry["pings"],
+                    "idle_seconds": round(now - entry["last_used"], 1) if entry["last_used"] is not None else None,
+                }
+            for model, expires_at in self._loaded.items():
+                models.setdefault(model, {"loaded": True, "expires_at": expires_at})
+            return {"keep_alive": KEEP_ALIVE, "models": models}
+
+
+_RESIDENCY = ollamaResidency()
+register_metrics("ollama_residency", _RESIDENCY.stats)
+
+
+def get_ollama_residency() -> ollamaResidency:
+    return _RESIDENCY
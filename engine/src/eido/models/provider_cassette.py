@@ -0,0 +1,309 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from src.disk.core.db_metrics import count_difference, get_db_counter
+from src.eido.models import provider_errors
+from src.eido.models.provider_errors import ProviderError, ProviderRequestError
+from src.eido.utils.eido_config import fetch_model_name
+
+
+# JSON lines file every provider call is appended to while set.
+CASSETTE_RECORD_ENV = "CASSETTE_RECORD"
+# Cassette to serve every provider call from instead of the configured provider.
+CASSETTE_REPLAY_ENV = "CASSETTE_REPLAY"
+# "original" (default) keeps the recorded timings, "fast" answers at once.
+CASSETTE_TIMING_ENV = "CASSETTE_REPLAY_TIMING"
+# "true" fails calls whose request was not recorded instead of serving the next recorded one.
+CASSETTE_STRICT_ENV = "CASSETTE_REPLAY_STRICT"
+
+INTERNAL_PREFIX = "[**INTERNAL SYSTEM MESSAGE**]"
+
+
+def request_fingerprint(system, messages) -> str:
+    """Hash of what the model is asked: system prompt, then role and content
+    of every message (provider hints such as cache breakpoints left out)."""
+    digest = hashlib.sha1(str(system or "").encode("utf-8"))
+    for message in messages:
+        digest.update(f"\x00{message.get('role')}\x00{message.get('content')}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def operator_message(messages) -> Optional[str]:
+    """The latest message the operator wrote, which the call answers."""
+    for message in reversed(messages):
+        content = str(message.get("content") or "")
+        if message.get("role") == "user" and not content.lstrip().startswith(INTERNAL_PREFIX):
+            return content
+    return None
+
+
+class _callClock:
+    """Time the engine spent between a user's calls and the database
+    statements issued meanwhile (process-wide), for both recording and replay.
+    The first call has neither."""
+
+    def __init__(self):
+        self._last_end: Dict[str, float] = {}
+        self._last_ops: Optional[Dict[str, int]] = None
+        self._lock = threading.Lock()
+
+    def start(self, email: str):
+        now = time.monotonic()
+        ops = get_db_counter().snapshot()
+        with self._lock:
+            last_end = self._last_end.get(email)
+            gap = round(now - last_end, 4) if last_end is not None else None
+            return gap, count_difference(ops, self._last_ops) if self._last_ops is not None else {}
+
+    def end(self, email: str):
+        with self._lock:
+            self._last_end[email] = time.monotonic()
+            self._last_ops = get_db_counter().snapshot()
+
+
+########################################################
+
+class cassetteRecorder:
+    """Appends one JSON line per provider call (including failed attempts)
+    to a cassette: request fingerprint, the operator message it answers,
+    timings, streamed chunks with their offsets, the reply or the error, and
+    the engine gap and database statements since the user's previous call.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._sequence = 0
+        self._clock = _callClock()
+        self._lock = threading.Lock()
+
+    def _write(self, entry: Dict[str, Any]):
+        with self._lock:
+            entry["seq"] = self._sequence
+            self._sequence += 1
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    async def record(self, provider_name: str, provider, email, on_text=None):
+        fingerprint = request_fingerprint(provider.system, provider.messages)
+        gap, db_ops = self._clock.start(email)
+        start = time.monotonic()
+        chunks: List[List[Any]] = []
+
+        async def tap(text):
+            chunks.append([round(time.monotonic() - start, 4), text])
+            await on_text(text)
+
+        entry = {
+            "email": email,
+            "provider": provider_name,
+            "model": await fetch_model_name(email=email),
+            "fingerprint": fingerprint,
+            "operator_message": operator_message(provider.messages),
+            # eido runs stream; background calls such as summaries do not
+            "streamed": on_text is not None,
+            "engine_gap": gap,
+            "db_ops": db_ops,
+        }
+        try:
+            response = await provider.text_response(email, on_text=tap if on_text else None)
+        except ProviderError as e:
+            entry.update(latency=round(time.monotonic() - start, 4), response=None, chunks=chunks, error={
+                "type": type(e).__name__,
+                "message": e.message,
+                "status_code": e.status_code,
+                "retry_after": e.retry_after,
+            })
+            self._write(entry)
+            self._clock.end(email)
+            raise
+
+        entry.update(latency=round(time.monotonic() - start, 4), response=response, chunks=chunks, error=None,
+                     usage=getattr(provider, "usage", None))
+        self._write(entry)
+        self._clock.end(email)
+        return response
+
+    def wrap(self, provider_name: str, provider_class):
+        recorder = self
+
+        class recordingProvider:
+            def __init__(self, system, chat_messages):
+                self.inner = provider_class(system, chat_messages)
+
+            @property
+            def usage(self):
+                return getattr(self.inner, "usage", None)
+
+            async def text_response(self, email, on_text=None):
+                return await recorder.record(provider_name, self.inner, email, on_text)
+
+        return recordingProvider
+
+
+########################################################
+
+class cassettePlayer:
+    """Serves the calls of a recorded cassette back.
+
+    A call gets the first unserved entry of its user with the same request
+    fingerprint; when the new build asks something else (a changed prompt,
+    say) it gets the user's next unserved entry in recorded order, unless
+    strict. Every call logs its engine gap and database statements next to
+    the recorded ones.
+    """
+
+    def __init__(self, path: str, timing: str = "original", strict: bool = False):
+        self.path = path
+        self.timing = timing
+        self.strict = strict
+        self.entries: List[Dict[str, Any]] = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    self.entries.append(json.loads(line))
+        self.entries.sort(key=lambda entry: entry.get("seq", 0))
+
+        self._pending: Dict[str, Deque[int]] = {}
+        for position, entry in enumerate(self.entries):
+            self._pending.setdefault(entry.get("email") or "", deque()).append(position)
+        self._served: List[Dict[str, Any]] = []
+        self._clock = _callClock()
+        self._lock = threading.Lock()
+
+    def operator_messages(self, email: Optional[str] = None) -> List[str]:
+        """The operator messages of a user's recorded session, in order."""
+        messages = []
+        for entry in self.entries:
+            if email is not None and entry.get("email") != email:
+                continue
+            if not entry.get("streamed", True):
+                continue
+            message = entry.get("operator_message")
+            if message is not None and (not messages or messages[-1] != message):
+                messages.append(message)
+        return messages
+
+    def _take(self, email: str, fingerprint: str):
+        with self._lock:
+            # A user that was not recorded replays the whole cassette in order
+            pending = self._pending.get(email)
+            if pending is None:
+                pending = self._pending.setdefault("", deque(range(len(self.entries))))
+            for position in pending:
+                if self.entries[position]["fingerprint"] == fingerprint:
+                    pending.remove(position)
+                    return self.entries[position], True
+            if self.strict or not pending:
+                return None, False
+            return self.entries[pending.popleft()], False
+
+    async def play(self, email, system, messages, on_text=None):
+        """The recorded reply and its usage (None in older cassettes)."""
+        fingerprint = request_fingerprint(system, messages)
+        gap, db_ops = self._clock.start(email)
+        entry, matched = self._take(email, fingerprint)
+        if entry is None:
+            self._clock.end(email)
+            raise ProviderRequestError("replay", f"No recorded response left for request {fingerprint[:12]}")
+
+        try:
+            return await self._serve(entry, on_text), entry.get("usage")
+        finally:
+            self._clock.end(email)
+            self._report(entry, matched, gap, db_ops)
+
+    async def _serve(self, entry: Dict[str, Any], on_text):
+        original = self.timing != "fast"
+        latency = entry.get("latency") or 0.0
+        start = time.monotonic()
+
+        if on_text is not None and entry.get("chunks"):
+            for offset, text in entry["chunks"]:
+                if original:
+                    await asyncio.sleep(max(0.0, offset - (time.monotonic() - start)))
+                await on_text(text)
+        if original:
+            await asyncio.sleep(max(0.0, latency - (time.monotonic() - start)))
+
+        error = entry.get("error")
+        if error:
+            error_class = getattr(provider_errors, error.get("type", ""), ProviderError)
+            if not (isinstance(error_class, type) and issubclass(error_class, ProviderError)):
+                error_class = ProviderError
+            raise error_class(entry.get("provider", "replay"), error.get("message", ""), error.get("status_code"), error.get("retry_after"))
+
+        response = entry.get("response") or ""
+        if on_text is not None and not entry.get("chunks"):
+            await on_text(response)
+        return response
+
+    def _report(self, entry, matched: bool, gap, db_ops: Dict[str, int]):
+        with self._lock:
+            self._served.append({
+                "seq": entry.get("seq"),
+                "matched": matched,
+                "engine_gap": gap,
+                "recorded_engine_gap": entry.get("engine_gap"),
+                "db_ops": db_ops.get("TOTAL", 0),
+                "recorded_db_ops": (entry.get("db_ops") or {}).get("TOTAL", 0),
+            })
+            served = len(self._served)
+        how = "request matched" if matched else "request changed, served in recorded order"
+        gaps = f"engine gap {gap:.3f}s (recorded {entry['engine_gap']:.3f}s), " if gap is not None and entry.get("engine_gap") is not None else ""
+        print(f"\n\n[REPLAY]: Call {served}/{len(self.entries)} (#{entry.get('seq')}), {how}; "
+              f"{gaps}{db_ops.get('TOTAL', 0)} db statements (recorded {(entry.get('db_ops') or {}).get('TOTAL', 0)})")
+
+    def summary(self) -> Dict[str, Any]:
+        """Totals of the calls served so far against the same calls as recorded."""
+        with self._lock:
+            served = list(self._served)
+
+        def total(key):
+            return round(sum(call[key] or 0 for call in served), 4)
+
+        return {
+            "calls": len(served),
+            "recorded_calls": len(self.entries),
+            "matched": sum(1 for call in served if call["matched"]),
+            "engine_time": total("engine_gap"),
+            "recorded_engine_time": total("recorded_engine_gap"),
+            "db_ops": total("db_ops"),
+            "recorded_db_ops": total("recorded_db_ops"),
+        }
+
+
+########################################################
+
+_recorders: Dict[str, cassetteRecorder] = {}
+_players: Dict[str, cassettePlayer] = {}
+_cassettes_lock = threading.Lock()
+
+
+def get_recording_cassette() -> Optional[cassetteRecorder]:
+    path = os.environ.get(CASSETTE_RECORD_ENV)
+    if not path:
+        return None
+    with _cassettes_lock:
+        if path not in _recorders:
+            _recorders[path] = cassetteRecorder(path)
+        return _recorders[path]
+
+
+def get_replay_cassette() -> Optional[cassettePlayer]:
+    path = os.environ.get(CASSETTE_REPLAY_ENV)
+    if not path:
+        return None
+    with _cassettes_lock:
+        if path not in _players:
+            _players[path] = cassettePlayer(
+                path,
+                timing=os.environ.get(CASSETTE_TIMING_ENV, "original").lower(),
+                strict=os.environ.get(CASSETTE_STRICT_ENV, "").lower() == "true",
+            )
+        return _players[path]
@@ -0,0 +1,131 @@
+import asyncio
+import threading
+import concurrent.futures
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple
+
+import ollama
+import openai
+import anthropic
+
+
+# The SDKs' own retries are off: call_with_retry (provider_retry.py) already
+# retries with backoff and feeds the circuit breaker.
+SDK_MAX_RETRIES = 0
+
+
+class providerLoop:
+    """One event loop thread that owns every provider client.
+
+    Supers run in their own threads with their own loops, and an async SDK
+    client is bound to the loop it first connects on. Running every provider
+    call here lets one pooled keep-alive client per (provider, api key,
+    base_url) serve all supers and runs.
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._clients: Dict[Tuple[str, str, Optional[str]], Any] = {}
+        self._lock = threading.Lock()
+
+    def loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                ready = threading.Event()
+
+                def run():
+                    self._loop = asyncio.new_event_loop()
+                    asyncio.set_event_loop(self._loop)
+                    ready.set()
+                    self._loop.run_forever()
+
+                threading.Thread(target=run, name="ProviderLoop", daemon=True).start()
+                ready.wait()
+            return self._loop
+
+    ########################################################
+
+    def _create_client(self, provider: str, api_key: str, base_url: Optional[str]):
+        if provider == "anthropic":
+            return anthropic.AsyncAnthropic(api_key=api_key, max_retries=SDK_MAX_RETRIES)
+        if provider == "ollama":
+            return ollama.AsyncClient(host=base_url) if base_url else ollama.AsyncClient()
+        # openai and the OpenAI-compatible endpoints (xai)
+        return openai.AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=SDK_MAX_RETRIES)
+
+    def client(self, provider: str, api_key: str = "", base_url: Optional[str] = None):
+        # Only called on the provider loop, so clients are created and used there
+        key = (provider, api_key or "", base_url)
+        if key not in self._clients:
+            self._clients[key] = self._create_client(provider, api_key, base_url)
+        return self._clients[key]
+
+    async def call(self, provider: str, api_key: str, request: Callable[[Any], Awaitable[Any]], base_url: Optional[str] = None):
+        """Await request(client) on the provider loop from any thread or loop.
+
+        Cancelling the caller cancels the request.
+        """
+        async def run():
+            return await request(self.client(provider, api_key, base_url))
+
+        future = asyncio.run_coroutine_threadsafe(run(), self.loop())
+        return await asyncio.wrap_future(future)
+
+    async def stream(self, provider: str, api_key: str, request: Callable[[Any], AsyncIterator[Any]], base_url: Optional[str] = None):
+        """Iterate request(client), run on the provider loop, from the caller's loop."""
+        caller = asyncio.get_running_loop()
+        items = asyncio.Queue()
+
+        def hand_over(item, error=None):
+            try:
+                caller.call_soon_threadsafe(items.put_nowait, (item, error))
+            except RuntimeError:
+                pass  # the caller's loop is gone
+
+        async def run():
+            try:
+                async for item in request(self.client(provider, api_key, base_url)):
+                    hand_over(item)
+            except Exception as e:
+                hand_over(None, e)
+                return
+            hand_over(_END_OF_STREAM)
+
+        future = asyncio.run_coroutine_threadsafe(run(), self.loop())
+        try:
+            while True:
+                item, error = await items.get()
+                if error is not None:
+                    raise error
+                if item is _END_OF_STREAM:
+                    return
+                yield item
+        finally:
+            future.cancel()
+
+
+_END_OF_STREAM = object()
+_PROVIDER_LOOP = providerLoop()
+
+
+def run_on_provider_loop(coroutine) -> concurrent.futures.Future:
+    """Start background work on the provider loop without waiting for it."""
+    return asyncio.run_coroutine_threadsafe(coroutine, _PROVIDER_LOOP.loop())
+
+
+async def call_provider(provider: str, api_key: str, request: Callable[[Any], Awaitable[Any]], base_url: Optional[str] = None):
+    return await _PROVIDER_LOOP.call(provider, api_key, request, base_url)
+
+
+async def stream_provider(provider: str, api_key: str, request: Callable[[Any], AsyncIterator[Any]], on_text: Callable[[str], Awaitable[None]], base_url: Optional[str] = None):
+    """Run a streaming request on the provider loop.
+
+    request(client) yields text deltas (str), which are awaited through
+    on_text as they arrive, and last the complete response, which is returned.
+    """
+    response = None
+    async for item in _PROVIDER_LOOP.stream(provider, api_key, request, base_url):
+        if isinstance(item, str):
+            await on_text(item)
+        else:
+            response = item
+    return response
@@ -0,0 +1,109 @@
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+
+class ProviderError(Exception):
+    """Base class for failures coming from a model provider.
+
+    `retryable` tells the retry loop whether another attempt can help and
+    `trips_breaker` whether the failure means the provider itself is unhealthy.
+    `failover` is set on an auth or rate limit error when another healthy key
+    of the user's API key pool can take the next attempt at once.
+    """
+    retryable = True
+    trips_breaker = False
+    failover = False
+
+    def __init__(self, provider: str, message: str, status_code: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.provider = provider
+        self.message = message
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+    def __str__(self):
+        status = f" (status {self.status_code})" if self.status_code else ""
+        return f"[{self.provider}] {type(self).__name__}{status}: {self.message}"
+
+
+class ProviderAuthError(ProviderError):
+    retryable = False
+
+
+class ProviderRequestError(ProviderError):
+    retryable = False
+
+
+class ProviderConfigError(ProviderError):
+    retryable = False
+
+
+class ProviderRateLimitError(ProviderError):
+    pass
+
+
+class ProviderUnavailableError(ProviderError):
+    trips_breaker = True
+
+
+class ProviderEmptyResponseError(ProviderError):
+    pass
+
+
+class ProviderCircuitOpenError(ProviderError):
+    retryable = False
+
+
+########################################################
+
+def _parse_retry_after(headers) -> Optional[float]:
+    if not headers:
+        return None
+    try:
+        retry_after_ms = headers.get("retry-after-ms")
+        if retry_after_ms:
+            return max(0.0, float(retry_after_ms) / 1000)
+
+        retry_after = headers.get("retry-after")
+        if not retry_after:
+            return None
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            retry_at = parsedate_to_datetime(retry_after)
+            return max(0.0, retry_at.timestamp() - time.time())
+    except Exception:
+        return None
+
+
+def classify_provider_error(provider: str, exc: Exception) -> ProviderError:
+    """Map an SDK/transport exception to a typed ProviderError.
+
+    Works on attributes shared by the anthropic, openai and ollama SDKs
+    (`status_code`, `response.headers`) so no SDK has to be imported here.
+    """
+    if isinstance(exc, ProviderError):
+        return exc
+
+    message = f"{type(exc).__name__}: {getattr(exc, 'error', None) or exc}"
+    status_code = getattr(exc, "status_code", None)
+    if not isinstance(status_code, int):
+        status_code = None
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    retry_after = _parse_retry_after(headers)
+
+    if status_code in (401, 403):
+        return ProviderAuthError(provider, message, status_code)
+    if status_code == 429:
+        return ProviderRateLimitError(provider, message, status_code, retry_after)
+    if status_code is not None and (status_code >= 500 or status_code == 408):
+        return ProviderUnavailableError(provider, message, status_code, retry_after)
+    if status_code is not None and 400 <= status_code < 500:
+        return ProviderRequestError(provider, message, status_code)
+
+    exc_name = type(exc).__name__.lower()
+    if isinstance(exc, (ConnectionError, TimeoutError)) or "connect" in exc_name or "timeout" in exc_name:
+        return ProviderUnavailableError(provider, message)
+
+    return ProviderError(provider, message, status_code)
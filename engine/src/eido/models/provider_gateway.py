@@ -0,0 +1,215 @@
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from src.eido.utils.eido_config import (
+    fetch_hedge_model,
+    fetch_hedge_percentile,
+    fetch_hedge_provider,
+    fetch_model_name,
+    fetch_provider_name,
+)
+from src.eido.models.xai.xai_main import xai_main_class
+from src.eido.models.openai.openai_main import openai_main_class
+from src.eido.models.ollama.ollama_main import ollama_main_class
+from src.eido.models.anthropic.anthropic_main import anthropic_main_class
+from src.eido.models.mock.mock_main import mock_main_class
+from src.eido.models.replay.replay_main import replay_main_class
+from src.eido.models.provider_cassette import get_recording_cassette, get_replay_cassette, request_fingerprint
+from src.eido.models.request_coalescer import get_request_coalescer
+from src.eido.models.provider_hedging import hedge_delay, run_hedged
+from src.eido.models.provider_errors import ProviderConfigError, ProviderError
+from src.eido.models.provider_retry import call_with_retry
+from src.eido.models.provider_usage import get_usage_telemetry
+from src.disk.services.chats import crud as chat_crud
+from src.disk.services.usage.writer import get_usage_ledger
+
+
+# Provider name (the PROVIDER_NAME setting) -> adapter class. An adapter is
+# built with (system, chat_messages) and answers
+# `await text_response(email, on_text=None)` with the reply text, streaming
+# deltas to on_text when given one, and raises ProviderError subclasses.
+PROVIDER_MAP = {
+    "openai": openai_main_class,
+    "ollama": ollama_main_class,
+    "xai": xai_main_class,
+    "anthropic": anthropic_main_class,
+    "mock": mock_main_class,
+    "replay": replay_main_class,
+}
+
+
+def register_provider(name, provider_class):
+    """Add or replace a provider; eido runs pick it up on their next call."""
+    PROVIDER_MAP[name] = provider_class
+
+
+def get_provider_class(name):
+    if name not in PROVIDER_MAP:
+        raise ProviderConfigError(str(name), "Provider not found")
+    return PROVIDER_MAP[name]
+
+
+class providerCall:
+    """One model request to a provider: its attempts behind call_with_retry,
+    streaming to the responseStream if any, and one usage record for the
+    whole request (see provider_usage.usageTelemetry). A cancelled request
+    is recorded too, with how long it had run and the prompt tokens its
+    provider settled it with."""
+
+    def __init__(self, email, provider_name, provider_class, system_prompt, chat_messages, stream=None, agent=None, conversation_id=None, task_id=None):
+        self.email = email
+        self.agent = agent
+        self.conversation_id = conversation_id
+        self.task_id = task_id
+        self.provider_name = provider_name
+        self.provider_class = provider_class
+        self.system_prompt = system_prompt
+        self.chat_messages = chat_messages
+        self.stream = stream
+
+        self.started = None
+        self.first_token = None
+        self.first_token_seen = asyncio.Event()
+        self.attempts = 0
+        self.provider = None
+        self.model = None
+
+    async def _on_text(self, text):
+        if self.first_token is None:
+            self.first_token = time.monotonic()
+            self.first_token_seen.set()
+        await self.stream.feed(text)
+
+    async def _attempt(self):
+        self.attempts += 1
+        self.first_token = None
+        self.provider = self.provider_class(self.system_prompt, self.chat_messages)
+        if self.stream is None:
+            return await self.provider.text_response(self.email)
+        await self.stream.restart()
+        return await self.provider.text_response(self.email, on_text=self._on_text)
+
+    async def run(self):
+        self.model = await fetch_model_name(email=self.email)
+        self.started = time.monotonic()
+        try:
+            response = await call_with_retry(self.provider_name, self._attempt)
+        except ProviderError as e:
+            self._record(e)
+            raise
+        except asyncio.CancelledError:
+            # Leaving these out would keep the slowest calls out of the
+            # percentiles hedge_delay is taken from, and their billed
+            # prompts out of the ledger
+            self._record(None, cancelled=True)
+            raise
+        self._record(None)
+        return response
+
+    def _ttft(self):
+        return self.first_token - self.started if self.first_token is not None else None
+
+    def _record(self, error, cancelled=False):
+        usage = getattr(self.provider, "usage", None) or {}
+        get_usage_telemetry().record({
+            "email": self.email,
+            "agent": self.agent,
+            "conversation_id": self.conversation_id,
+            "task_id": self.task_id,
+            "provider": self.provider_name,
+            "model": self.model,
+            "ttft": self._ttft(),
+            "latency": time.monotonic() - self.started,
+            "input_tokens": usage.get("input_tokens") or 0,
+            "output_tokens": usage.get("output_tokens") or 0,
+            "cached_tokens": usage.get("cached_tokens") or 0,
+            "retries": max(0, self.attempts - 1),
+            "error": "Cancelled" if cancelled else type(error).__name__ if error is not None else None,
+            "cancelled": cancelled,
+        })
+
+
+# Every call record also goes to the persistent usage ledger
+get_usage_telemetry().add_listener(get_usage_ledger().add)
+
+
+# conversation id -> task id, None for conversations that run no task.
+# Resolved on a conversation's first call and kept: superTask deletes its
+# hidden conversation while the task's last calls may still be running.
+_TASK_IDS: "OrderedDict[str, Optional[str]]" = OrderedDict()
+_TASK_IDS_LOCK = threading.Lock()
+MAX_KNOWN_CONVERSATIONS = 1024
+
+
+async def conversation_task_id(conversation_id) -> Optional[str]:
+    if not conversation_id:
+        return None
+    with _TASK_IDS_LOCK:
+        if conversation_id in _TASK_IDS:
+            return _TASK_IDS[conversation_id]
+    try:
+        task_id = await chat_crud.get_conversation_task_id(conversation_id)
+    except Exception as e:
+        print(f"\n\n[ERROR]: Could not look up the task of conversation {conversation_id}: {e}")
+        return None
+    with _TASK_IDS_LOCK:
+        _TASK_IDS[conversation_id] = task_id
+        while len(_TASK_IDS) > MAX_KNOWN_CONVERSATIONS:
+            _TASK_IDS.popitem(last=False)
+    return task_id
+
+
+async def request_model_response(email, system_prompt, chat_messages, stream=None, agent=None, conversation_id=None):
+    """Single entry point to the user's configured provider, used by eido runs
+    and by background work such as conversation summaries.
+
+    With a responseStream the reply is streamed and fed to it as it arrives;
+    each retry starts the stream over. With CASSETTE_REPLAY set every call is
+    served from that cassette; with CASSETTE_RECORD set every call, failed
+    attempts included, is recorded to it.
+
+    Identical requests of a user made while one is in flight share its
+    reply (see request_coalescer.py); only the first one streams.
+
+    agent and conversation_id (and the task it runs, if any) attribute the
+    call in the usage ledger.
+
+    With HEDGE_PROVIDER set, a request the provider is slow to start
+    answering is also sent to that provider (with HEDGE_MODEL) and the
+    first reply wins (see provider_hedging.py).
+    """
+    if get_replay_cassette() is not None:
+        provider_name = "replay"
+    else:
+        provider_name = await fetch_provider_name(email)
+
+    recorder = get_recording_cassette() if provider_name != "replay" else None
+    task_id = await conversation_task_id(conversation_id)
+
+    def build_call(name, call_stream=None):
+        provider_class = get_provider_class(name)
+        if recorder is not None:
+            provider_class = recorder.wrap(name, provider_class)
+        return providerCall(email, name, provider_class, system_prompt, chat_messages, call_stream, agent, conversation_id, task_id)
+
+    call = build_call(provider_name, stream)
+    run = call.run
+
+    fallback_name = await fetch_hedge_provider(email) if provider_name != "replay" else ""
+    model = await fetch_model_name(email=email)
+    fallback_model = await fetch_hedge_model(email) or model
+    if fallback_name and (fallback_name, fallback_model) != (provider_name, model):
+        try:
+            # The fallback does not stream: the primary may already be streaming
+            fallback = build_call(fallback_name)
+        except ProviderConfigError as e:
+            print(f"\n\n[HEDGE]: Not hedging, {e}")
+        else:
+            delay = hedge_delay(provider_name, model, await fetch_hedge_percentile(email), streamed=stream is not None)
+            run = lambda: run_hedged(call, fallback, fallback_model, delay, f"{provider_name}/{model}")
+
+    key = (email, provider_name, request_fingerprint(system_prompt, chat_messages))
+    return await get_request_coalescer().run(key, run)
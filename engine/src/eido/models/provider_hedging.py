@@ -0,0 +1,124 @@
+import asyncio
+import contextvars
+import threading
+from collections import Counter
+from typing import Any, Dict
+
+from src.eido.models.provider_errors import ProviderError
+from src.eido.models.provider_usage import get_usage_telemetry
+from src.eido.utils.eido_config import model_override
+from src.eido.utils.metrics import register_metrics
+
+
+# The percentile is only trusted with this many recent samples of the primary;
+# until then the fallback is asked after DEFAULT_HEDGE_DELAY_SECONDS.
+MIN_SAMPLES = 20
+DEFAULT_HEDGE_DELAY_SECONDS = 10.0
+MIN_HEDGE_DELAY_SECONDS = 0.5
+
+
+class hedgeStats:
+    """Hedging outcomes by primary provider/model. primary_wins and
+    hedge_wins only count hedged requests."""
+
+    def __init__(self):
+        self._counts: Dict[str, Counter] = {}
+        self._lock = threading.Lock()
+
+    def count(self, primary: str, event: str):
+        with self._lock:
+            self._counts.setdefault(primary, Counter())[event] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {}
+            for primary, counts in self._counts.items():
+                hedged = counts["hedged"]
+                stats[primary] = {
+                    "requests": counts["requests"],
+                    "hedged": hedged,
+                    "hedge_rate": round(hedged / counts["requests"], 4) if counts["requests"] else 0.0,
+                    "unhedged": counts["unhedged"],
+                    "primary_wins": counts["primary_wins"],
+                    "hedge_wins": counts["hedge_wins"],
+                    "hedge_win_rate": round(counts["hedge_wins"] / hedged, 4) if hedged else 0.0,
+                    "both_failed": counts["both_failed"],
+                }
+            return stats
+
+
+_HEDGE_STATS = hedgeStats()
+register_metrics("hedging", _HEDGE_STATS.stats)
+
+
+def hedge_delay(provider: str, model: str, percentile: float, streamed: bool) -> float:
+    """Seconds to give the primary before asking the fallback: the percentile
+    of its recent time to first token (total latency when not streaming),
+    cancelled calls counting with the time they had run."""
+    delay, samples = get_usage_telemetry().latency_percentile(provider, model, percentile / 100.0, first_token=streamed)
+    if delay is None or samples < MIN_SAMPLES:
+        return DEFAULT_HEDGE_DELAY_SECONDS
+    return max(MIN_HEDGE_DELAY_SECONDS, delay)
+
+
+async def _cancel(task: asyncio.Task):
+    task.cancel()
+    try:
+        await task
+    except BaseException:
+        pass
+
+
+async def run_hedged(primary, secondary, fallback_model: str, delay: float, label: str):
+    """Run primary (a providerCall); if it has not streamed its first token
+    (or answered, when not streaming) within delay seconds, run secondary
+    too, with fallback_model. The first non-empty reply wins and the other
+    request is cancelled; when both fail the primary's error is raised.
+    """
+    _HEDGE_STATS.count(label, "requests")
+    primary_task = asyncio.create_task(primary.run())
+    first_token = asyncio.create_task(primary.first_token_seen.wait())
+    try:
+        await asyncio.wait({primary_task, first_token}, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        first_token.cancel()
+
+    if primary_task.done() or primary.first_token is not None:
+        # Answered (or failed) in time: no race, so not a win either
+        _HEDGE_STATS.count(label, "unhedged")
+        return await primary_task
+
+    _HEDGE_STATS.count(label, "hedged")
+    print(f"\n\n[HEDGE]: {label} gave no first token in {delay:.1f} seconds, asking {secondary.provider_name}/{fallback_model} as well")
+    context = contextvars.copy_context()
+    context.run(model_override.set, fallback_model)
+    secondary_task = asyncio.create_task(secondary.run(), context=context)
+
+    pending = {primary_task, secondary_task}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.cancelled() or task.exception() is not None or not task.result():
+                    continue
+                for loser in pending:
+                    await _cancel(loser)
+                if task is primary_task:
+                    _HEDGE_STATS.count(label, "primary_wins")
+                else:
+                    _HEDGE_STATS.count(label, "hedge_wins")
+                    if primary.stream is not None:
+                        # Drop what the primary streamed before it lost
+                        await primary.stream.restart()
+                return task.result()
+    finally:
+        for task in pending:
+            await _cancel(task)
+
+    _HEDGE_STATS.count(label, "both_failed")
+    error = primary_task.exception() if not primary_task.cancelled() else None
+    if error is None:
+        error = secondary_task.exception()
+    if error is None:
+        raise ProviderError(primary.provider_name, "Empty response from both the provider and its fallback")
+    raise error
@@ -0,0 +1,378 @@
+import time
+import asyncio
+import hashlib
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.eido.models.provider_errors import ProviderAuthError, ProviderError, ProviderRateLimitError
+from src.eido.utils.apis_config import fetch_rate_limits_for_provider
+from src.eido.utils.metrics import register_metrics
+from src.eido.utils.token_estimator import estimate_message_tokens, estimate_tokens
+
+
+# Reply tokens reserved up front when MODEL_MAX_TOKENS is not set
+DEFAULT_REPLY_TOKENS = 1024
+# Pause of a key's callers after a 429 without Retry-After, and the longest one
+RATE_LIMIT_PAUSE_SECONDS = 5.0
+RATE_LIMIT_PAUSE_MAX_SECONDS = 60.0
+# How long a key of a pool is passed over after a 429, and after a 401/403
+KEY_RATE_LIMIT_COOLDOWN_SECONDS = 30.0
+KEY_AUTH_COOLDOWN_SECONDS = 600.0
+
+
+class tokenBucket:
+    """Refills per_minute units evenly over a minute and holds at most one
+    minute's worth.
+
+    Takes may drive the level below zero; the debt is how long the taker
+    waits. Later takers queue behind it, so callers are served in order of
+    arrival whatever thread or loop they run on.
+    """
+
+    def __init__(self, per_minute: int):
+        self.per_minute = per_minute
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.per_minute, self.level + (now - self.updated) * self.per_minute / 60.0)
+        self.updated = now
+
+    def resize(self, per_minute: int, now: float):
+        self._refill(now)
+        self.per_minute = per_minute
+        self.level = min(self.level, per_minute)
+
+    def take(self, amount: float, now: float) -> float:
+        """Debit amount; returns the seconds until the debit is covered."""
+        self._refill(now)
+        # A request larger than a minute's budget would never be covered
+        self.level -= min(amount, self.per_minute)
+        return max(0.0, -self.level * 60.0 / self.per_minute)
+
+    def give(self, amount: float, now: float):
+        self._refill(now)
+        self.level = min(self.per_minute, self.level + amount)
+
+
+class providerRateLimiter:
+    """Requests and tokens per minute budget of one provider API key, shared
+    by every super thread of the process.
+
+    Calls reserve their estimated tokens up front and settle the difference
+    once the provider reports actual usage. A 429 pauses every caller of the
+    key for its Retry-After instead of letting them retry in lockstep.
+    """
+
+    def __init__(self, provider: str, label: str):
+        self.provider = provider
+        self.label = label
+        self.requests: Optional[tokenBucket] = None
+        self.tokens: Optional[tokenBucket] = None
+        self.paused_until = 0.0
+
+        self._counts = Counter()
+        self._waited_seconds = 0.0
+        self._longest_wait = 0.0
+        self._lock = threading.Lock()
+
+    def configure(self, requests_per_minute: int, tokens_per_minute: int):
+        with self._lock:
+            now = time.monotonic()
+            for name, limit in (("requests", requests_per_minute), ("tokens", tokens_per_minute)):
+                bucket = getattr(self, name)
+                if not limit:
+                    setattr(self, name, None)
+                elif bucket is None:
+                    setattr(self, name, tokenBucket(limit))
+                elif bucket.per_minute != limit:
+                    bucket.resize(limit, now)
+
+    def reserve(self, tokens: int) -> float:
+        """Debit one request and its tokens; returns the seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self.paused_until - now)
+            if self.requests is not None:
+                wait = max(wait, self.requests.take(1, now))
+            if self.tokens is not None:
+                wait = max(wait, self.tokens.take(tokens, now))
+            self._counts["calls"] += 1
+            self._counts["estimated_tokens"] += tokens
+            if wait > 0:
+                self._counts["waited"] += 1
+                self._waited_seconds += wait
+                self._longest_wait = max(self._longest_wait, wait)
+            return wait
+
+    def remaining(self) -> Optional[float]:
+        """Share of the tighter per minute budget left now, None without limits."""
+        with self._lock:
+            now = time.monotonic()
+            shares = []
+            for bucket in (self.requests, self.tokens):
+                if bucket is not None:
+                    bucket._refill(now)
+                    shares.append(bucket.level / bucket.per_minute)
+            return min(shares) if shares else None
+
+    def pause_remaining(self) -> float:
+        with self._lock:
+            return max(0.0, self.paused_until - time.monotonic())
+
+    def cancel(self, tokens: int):
+        """Give back the reservation of a caller that stopped waiting."""
+        with self._lock:
+            now = time.monotonic()
+            if self.requests is not None:
+                self.requests.give(1, now)
+            if self.tokens is not None:
+                self.tokens.give(tokens, now)
+            self._counts["estimated_tokens"] -= tokens
+
+    def reconcile(self, estimated: int, actual: int):
+        with self._lock:
+            self._counts["actual_tokens"] += actual
+            if self.tokens is None or actual == estimated:
+                return
+            now = time.monotonic()
+            if actual < estimated:
+                self.tokens.give(estimated - actual, now)
+            else:
+                self.tokens.take(actual - estimated, now)
+
+    def pause(self, seconds: float):
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + min(seconds, RATE_LIMIT_PAUSE_MAX_SECONDS))
+            # Callers resume at the request rate rather than all at once
+            if self.requests is not None:
+                self.requests.level = min(self.requests.level, 0.0)
+            self._counts["rate_limited"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = self._counts["calls"]
+            return {
+                "requests_per_minute": self.requests.per_minute if self.requests else None,
+                "tokens_per_minute": self.tokens.per_minute if self.tokens else None,
+                "calls": calls,
+                "waited": self._counts["waited"],
+                "average_wait": round(self._waited_seconds / calls, 3) if calls else 0.0,
+                "longest_wait": round(self._longest_wait, 3),
+                "estimated_tokens": self._counts["estimated_tokens"],
+                "actual_tokens": self._counts["actual_tokens"],
+                "rate_limited": self._counts["rate_limited"],
+            }
+
+
+def key_label(provider: str, api_key: str) -> str:
+    # Keys never leave the process; metrics name them by a short hash
+    return f"{provider}:{hashlib.sha1(api_key.encode('utf-8')).hexdigest()[:8]}" if api_key else provider
+
+
+_LIMITERS: Dict[Tuple[str, str], providerRateLimiter] = {}
+_LIMITERS_LOCK = threading.Lock()
+
+
+def get_rate_limiter(provider: str, api_key: str = "") -> providerRateLimiter:
+    with _LIMITERS_LOCK:
+        limiter = _LIMITERS.get((provider, api_key))
+        if limiter is None:
+            limiter = providerRateLimiter(provider, key_label(provider, api_key))
+            _LIMITERS[(provider, api_key)] = limiter
+        return limiter
+
+
+def rate_limit_stats() -> Dict[str, Any]:
+    with _LIMITERS_LOCK:
+        limiters = list(_LIMITERS.values())
+    return {limiter.label: limiter.stats() for limiter in limiters}
+
+
+register_metrics("rate_limits", rate_limit_stats)
+
+
+########################################################
+
+class apiKeyPool:
+    """Health and usage of every provider API key seen, and the choice
+    between the keys of a user's pool.
+
+    A pool is the list of keys in a user's {PROVIDER}_API_KEY setting. Each
+    call gets the healthy key with the largest share of its per minute
+    budget left (see providerRateLimiter.remaining), or, without limits, the
+    one chosen least recently, so calls spread over all keys. A key is
+    passed over for KEY_RATE_LIMIT_COOLDOWN_SECONDS (or the Retry-After)
+    after a 429 and for KEY_AUTH_COOLDOWN_SECONDS after a 401/403; when
+    every key is cooling down the one that is back first is used. While
+    another key of the pool is healthy, the failed call moves to it at once
+    (see report).
+    """
+
+    def __init__(self):
+        self._keys: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        # (provider, key) -> the pool the key was last chosen from
+        self._pools: Dict[Tuple[str, str], Tuple[str, ...]] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, provider: str, api_key: str) -> Dict[str, Any]:
+        # Called with the lock held
+        entry = self._keys.get((provider, api_key))
+        if entry is None:
+            entry = self._keys[(provider, api_key)] = {
+                "cooldown_until": 0.0,
+                "last_chosen": 0.0,
+                "calls": 0,
+                "tokens": 0,
+                "rate_limited": 0,
+                "auth_failed": 0,
+                "errors": 0,
+            }
+        return entry
+
+    def choose(self, provider: str, api_keys: List[str]) -> str:
+        if len(api_keys) == 1:
+            return api_keys[0]
+        quotas = {}
+        with _LIMITERS_LOCK:
+            for api_key in api_keys:
+                limiter = _LIMITERS.get((provider, api_key))
+                quotas[api_key] = limiter.remaining() if limiter is not None else None
+        with self._lock:
+            now = time.monotonic()
+            entries = {api_key: self._key(provider, api_key) for api_key in api_keys}
+            pool = tuple(api_keys)
+            for api_key in api_keys:
+                self._pools[(provider, api_key)] = pool
+            healthy = [api_key for api_key in api_keys if entries[api_key]["cooldown_until"] <= now]
+            if healthy:
+                chosen = max(healthy, key=lambda api_key: (
+                    quotas[api_key] if quotas[api_key] is not None else 1.0,
+                    -entries[api_key]["last_chosen"],
+                ))
+            else:
+                chosen = min(api_keys, key=lambda api_key: entries[api_key]["cooldown_until"])
+            entries[chosen]["last_chosen"] = now
+            return chosen
+
+    def report(self, provider: str, api_key: str, tokens: int = 0, error: Optional[ProviderError] = None) -> bool:
+        """Record a call's outcome. True when the error put the key in
+        cooldown and another key of its pool is healthy, so the call can be
+        retried on that key right away."""
+        with self._lock:
+            entry = self._key(provider, api_key)
+            entry["calls"] += 1
+            entry["tokens"] += tokens or 0
+            if isinstance(error, ProviderRateLimitError):
+                entry["rate_limited"] += 1
+                cooldown = min(error.retry_after or KEY_RATE_LIMIT_COOLDOWN_SECONDS, RATE_LIMIT_PAUSE_MAX_SECONDS)
+            elif isinstance(error, ProviderAuthError) or (error is not None and error.status_code in (401, 403)):
+                entry["auth_failed"] += 1
+                cooldown = KEY_AUTH_COOLDOWN_SECONDS
+            else:
+                if error is not None:
+                    entry["errors"] += 1
+                return False
+            now = time.monotonic()
+            entry["cooldown_until"] = max(entry["cooldown_until"], now + cooldown)
+            failover = any(
+                self._key(provider, other)["cooldown_until"] <= now
+                for other in self._pools.get((provider, api_key), ()) if other != api_key
+            )
+        print(f"\n\n[LIMIT]: {key_label(provider, api_key)} cooling down for {cooldown:.0f} seconds after {type(error).__name__}"
+              + (", moving to another key" if failover else ""))
+        return failover
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            return {
+                key_label(provider, api_key): {
+                    "calls": entry["calls"],
+                    "tokens": entry["tokens"],
+                    "rate_limited": entry["rate_limited"],
+                    "auth_failed": entry["auth_failed"],
+                    "errors": entry["errors"],
+                    "cooling_down_for": round(max(0.0, entry["cooldown_until"] - now), 1),
+                }
+                for (provider, api_key), entry in self._keys.items()
+            }
+
+
+_KEY_POOL = apiKeyPool()
+register_metrics("api_keys", _KEY_POOL.stats)
+
+
+def choose_api_key(provider: str, api_keys: List[str]) -> str:
+    return _KEY_POOL.choose(provider, api_keys)
+
+
+########################################################
+
+class providerBudget:
+    """A call's reservation; settle it once with the tokens the provider
+    reported, or with the error the call failed with."""
+
+    def __init__(self, provider: str, api_key: str, limiter: Optional[providerRateLimiter] = None, estimated: int = 0, prompt_tokens: int = 0):
+        self.provider = provider
+        self.api_key = api_key
+        self.limiter = limiter
+        self.estimated = estimated
+        self.prompt_tokens = prompt_tokens
+        self._settled = False
+
+    def settle(self, tokens: Optional[int] = None, error: Optional[ProviderError] = None):
+        if self._settled:
+            return
+        self._settled = True
+        if self.api_key and _KEY_POOL.report(self.provider, self.api_key, tokens=tokens or 0, error=error):
+            error.failover = True
+        if self.limiter is None:
+            return
+        if isinstance(error, ProviderRateLimitError):
+            self.limiter.pause(error.retry_after or RATE_LIMIT_PAUSE_SECONDS)
+            tokens = 0
+        elif error is not None:
+            tokens = self.prompt_tokens
+        self.limiter.reconcile(self.estimated, self.estimated if tokens is None else tokens)
+
+    def cancel(self) -> dict:
+        """Settle a call cancelled after it was sent (a hedged request that
+        lost, a caller that went away). The provider still bills the prompt,
+        so the estimated prompt tokens count; returns them as the call's usage."""
+        self.settle(self.prompt_tokens)
+        return {"input_tokens": self.prompt_tokens, "output_tokens": 0, "cached_tokens": 0}
+
+
+async def acquire_provider_budget(provider: str, api_key: str, email, system, messages, max_tokens=None) -> providerBudget:
+    """Wait for the key's requests and tokens per minute budget (the user's
+    {PROVIDER}_RPM and {PROVIDER}_TPM settings) to cover a call. Without
+    either setting calls go through at once."""
+    # Kept without limits too: a cancelled call is settled with it
+    prompt_tokens = estimate_tokens(str(system or "")) + sum(estimate_message_tokens(m.get("content")) for m in messages)
+    requests_per_minute, tokens_per_minute = await fetch_rate_limits_for_provider(provider, email=email)
+    if not requests_per_minute and not tokens_per_minute:
+        return providerBudget(provider, api_key or "", prompt_tokens=prompt_tokens)
+
+    limiter = get_rate_limiter(provider, api_key or "")
+    limiter.configure(requests_per_minute, tokens_per_minute)
+
+    try:
+        reply_tokens = int(max_tokens) if max_tokens else DEFAULT_REPLY_TOKENS
+    except (TypeError, ValueError):
+        reply_tokens = DEFAULT_REPLY_TOKENS
+    estimated = prompt_tokens + reply_tokens
+
+    wait = limiter.reserve(estimated)
+    if wait >= 1.0:
+        print(f"\n\n[LIMIT]: {limiter.label} over its per minute budget, waiting {wait:.1f} seconds")
+    try:
+        while wait > 0:
+            await asyncio.sleep(wait)
+            # A 429 seen meanwhile holds everyone back
+            wait = limiter.pause_remaining()
+    except asyncio.CancelledError:
+        limiter.cancel(estimated)
+        raise
+    return providerBudget(provider, api_key or "", limiter, estimated, prompt_tokens)
@@ -0,0 +1,137 @@
+import time
+import random
+import asyncio
+import threading
+from typing import Awaitable, Callable, Dict, Optional
+
+from src.eido.models.provider_errors import ProviderError, ProviderCircuitOpenError
+
+
+MAX_RETRIES = 4
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 20.0
+RETRY_AFTER_MAX_SECONDS = 60.0
+
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_COOLDOWN_SECONDS = 30.0
+
+
+class circuitBreaker:
+    """Per-provider breaker shared by every super thread of the process.
+
+    closed -> open after BREAKER_FAILURE_THRESHOLD consecutive unhealthy failures,
+    open -> half_open once the cooldown elapsed (a single probe call is let through),
+    half_open -> closed on success or back to open on failure.
+    """
+
+    def __init__(self, provider: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD, cooldown: float = BREAKER_COOLDOWN_SECONDS):
+        self.provider = provider
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == "closed":
+                return
+
+            remaining = self.cooldown - (time.monotonic() - self.opened_at)
+            if self.state == "open" and remaining <= 0:
+                self.state = "half_open"
+                self._probe_in_flight = False
+
+            if self.state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+
+            raise ProviderCircuitOpenError(
+                self.provider,
+                f"Provider is failing, circuit open for another {max(0.0, remaining):.0f} seconds",
+                retry_after=max(0.0, remaining),
+            )
+
+    def release_probe(self):
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self, error: ProviderError):
+        with self._lock:
+            self._probe_in_flight = False
+            if not error.trips_breaker:
+                if self.state == "half_open":
+                    self.state = "closed"
+                    self.consecutive_failures = 0
+                return
+
+            self.consecutive_failures += 1
+            if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+                if self.state != "open":
+                    print(f"\n\n[PROVIDER]: Circuit opened for '{self.provider}' after {self.consecutive_failures} failures")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+
+_BREAKERS: Dict[str, circuitBreaker] = {}
+_BREAKERS_LOCK = threading.Lock()
+
+
+def get_circuit_breaker(provider: str) -> circuitBreaker:
+    with _BREAKERS_LOCK:
+        breaker = _BREAKERS.get(provider)
+        if breaker is None:
+            breaker = circuitBreaker(provider)
+            _BREAKERS[provider] = breaker
+        return breaker
+
+
+########################################################
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """Exponential backoff with equal jitter; a server Retry-After is a lower bound."""
+    ceiling = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt))
+    delay = ceiling / 2 + random.uniform(0, ceiling / 2)
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, RETRY_AFTER_MAX_SECONDS))
+    return delay
+
+
+async def call_with_retry(provider: str, call: Callable[[], Awaitable], max_retries: int = MAX_RETRIES):
+    """Run `call` behind the provider's circuit breaker, retrying retryable
+    ProviderErrors, and errors another API key can take over (`failover`) at once.
+
+    Raises the last ProviderError once retries are exhausted or the error is final.
+    """
+    breaker = get_circuit_breaker(provider)
+
+    attempt = 0
+    while True:
+        breaker.before_call()
+        try:
+            result = await call()
+        except ProviderError as e:
+            breaker.record_failure(e)
+            if not (e.retryable or e.failover) or attempt >= max_retries or breaker.state == "open":
+                raise
+            # On another key of the pool there is no limit or bad key to wait out
+            delay = 0.0 if e.failover else backoff_delay(attempt, e.retry_after)
+            attempt += 1
+            print(f"\n\n[ERROR]: {e}\n\n Retrying in {delay:.1f} seconds... (attempt {attempt} of {max_retries})")
+            await asyncio.sleep(delay)
+            continue
+        except BaseException:
+            breaker.release_probe()
+            raise
+
+        breaker.record_success()
+        return result
@@ -0,0 +1,174 @@
+import bisect
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from src.eido.utils.metrics import register_metrics
+
+
+def report_prompt_cache(provider, model, input_tokens, cached_tokens, cache_write_tokens=0, output_tokens=0):
+    """Log how much of a call's prompt the provider served from its prompt cache.
+
+    input_tokens is the whole prompt, cached and uncached. Returns the call's
+    token usage, which adapters keep as their `usage`.
+    """
+    input_tokens = input_tokens or 0
+    cached_tokens = cached_tokens or 0
+    share = f" ({cached_tokens * 100 // input_tokens}%)" if input_tokens else ""
+    written = f", {cache_write_tokens} written to cache" if cache_write_tokens else ""
+    print(f"\n\n[CACHE]: {provider}/{model} {cached_tokens} of {input_tokens} input tokens read from cache{share}{written}")
+    return {
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens or 0,
+        "cached_tokens": cached_tokens,
+        "cache_write_tokens": cache_write_tokens or 0,
+    }
+
+
+########################################################
+
+# Upper bounds (seconds) of the latency histogram buckets; the last is open
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0, 64.0, 128.0)
+# Recent samples kept per histogram for percentiles
+RECENT_SAMPLES = 256
+
+
+class latencyHistogram:
+    """Bucketed counts of a duration since start, plus the most recent
+    samples for percentiles."""
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+        self.recent: Deque[float] = deque(maxlen=RECENT_SAMPLES)
+
+    def add(self, seconds: float):
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.maximum = max(self.maximum, seconds)
+        self.recent.append(seconds)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        if not self.recent:
+            return None
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def summary(self) -> Dict[str, Any]:
+        def rounded(value):
+            return round(value, 3) if value is not None else None
+
+        labels = [f"le_{bound:g}" for bound in LATENCY_BUCKETS] + ["inf"]
+        return {
+            "count": self.count,
+            "average": rounded(self.total / self.count) if self.count else None,
+            "p50": rounded(self.percentile(0.5)),
+            "p95": rounded(self.percentile(0.95)),
+            "max": rounded(self.maximum),
+            "buckets": dict(zip(labels, self.buckets)),
+        }
+
+
+class usageGroup:
+    """Calls of one provider/model or one user: latency and time to first
+    token histograms, token totals, retries and errors by class.
+
+    Cancelled calls (a hedged request that lost, a caller that went away)
+    are also counted apart; the time they ran adds to the first token
+    histogram as a lower bound when no token came, so the percentiles are not
+    taken from the calls that finished only.
+    """
+
+    def __init__(self):
+        self.latency = latencyHistogram()
+        self.first_token = latencyHistogram()
+        self.calls = 0
+        self.cancelled = 0
+        self.retries = 0
+        self.errors: Dict[str, int] = {}
+        self.tokens = {"input_tokens": 0, "output_tokens": 0, "cached_tokens": 0}
+
+    def add(self, call: Dict[str, Any]):
+        self.calls += 1
+        self.retries += call["retries"]
+        self.latency.add(call["latency"])
+        if call["ttft"] is not None:
+            self.first_token.add(call["ttft"])
+        elif call.get("cancelled"):
+            self.first_token.add(call["latency"])
+        if call.get("cancelled"):
+            self.cancelled += 1
+        if call["error"]:
+            self.errors[call["error"]] = self.errors.get(call["error"], 0) + 1
+        for key in self.tokens:
+            self.tokens[key] += call.get(key) or 0
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "cancelled": self.cancelled,
+            "retries": self.retries,
+            "errors": dict(self.errors),
+            **self.tokens,
+            "latency": self.latency.summary(),
+            "ttft": self.first_token.summary(),
+        }
+
+
+class usageTelemetry:
+    """In-memory aggregate of every provider call of the process, by
+    provider/model and by user, fed by the gateway with one record per call:
+    provider, model, email, ttft and latency (seconds, retries included),
+    input/output/cached tokens, retries and the final error class
+    ("Cancelled", with cancelled set, for a call cancelled while it ran)."""
+
+    def __init__(self):
+        self.models: Dict[str, usageGroup] = {}
+        self.users: Dict[str, usageGroup] = {}
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, listener: Callable[[Dict[str, Any]], None]):
+        """Also hand every call record to listener (called on the caller's thread)."""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def record(self, call: Dict[str, Any]):
+        with self._lock:
+            self.models.setdefault(f"{call['provider']}/{call['model']}", usageGroup()).add(call)
+            self.users.setdefault(call["email"] or "", usageGroup()).add(call)
+            listeners = list(self._listeners)
+        for listener in listeners:
+            try:
+                listener(call)
+            except Exception as e:
+                print(f"\n\n[ERROR]: Usage listener failed: {e}")
+
+    def latency_percentile(self, provider: str, model: str, fraction: float, first_token: bool = True) -> Tuple[Optional[float], int]:
+        """A percentile of the recent time to first token (or total latency)
+        of a provider/model, and the number of samples it is taken from."""
+        with self._lock:
+            group = self.models.get(f"{provider}/{model}")
+            if group is None:
+                return None, 0
+            histogram = group.first_token if first_token else group.latency
+            return histogram.percentile(fraction), len(histogram.recent)
+
+    def summary(self, email: Optional[str] = None) -> Dict[str, Any]:
+        """Every provider/model; users only the given one, when given."""
+        with self._lock:
+            summary = {"models": {name: group.summary() for name, group in self.models.items()}}
+            if email is not None:
+                summary["user"] = self.users[email].summary() if email in self.users else None
+            return summary
+
+
+_TELEMETRY = usageTelemetry()
+register_metrics("provider_usage", _TELEMETRY.summary)
+
+
+def get_usage_telemetry() -> usageTelemetry:
+    return _TELEMETRY
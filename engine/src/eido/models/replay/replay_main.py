@@ -0,0 +1,19 @@
+from src.eido.models.provider_cassette import CASSETTE_REPLAY_ENV, get_replay_cassette
+from src.eido.models.provider_errors import ProviderConfigError
+
+
+class replay_main_class:
+    """Serves the replies of the cassette named by CASSETTE_REPLAY (see
+    provider_cassette.cassettePlayer), with the recorded timings or at once."""
+
+    def __init__(self, system, chat_messages):
+        self.system = system
+        self.messages = chat_messages
+        self.usage = None  # token usage of the last call, see provider_usage
+
+    async def text_response(self, email, on_text=None):
+        cassette = get_replay_cassette()
+        if cassette is None:
+            raise ProviderConfigError("replay", f"{CASSETTE_REPLAY_ENV} is not set")
+        response, self.usage = await cassette.play(email, self.system, self.messages, on_text)
+        return response
@@ -0,0 +1,89 @@
+import asyncio
+import threading
+import concurrent.futures
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from src.eido.utils.metrics import register_metrics
+
+
+# Result handed to the callers waiting on a leader that was cancelled; they
+# make the request themselves instead.
+_LEADER_CANCELLED = object()
+
+
+class requestCoalescer:
+    """Singleflight for model requests.
+
+    The first caller of a key (the leader) makes the request; callers of the
+    same key arriving while it is in flight wait for its outcome, reply or
+    ProviderError, instead of making their own. Supers run on their own
+    event loops, so the outcome is shared through a concurrent future.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Tuple, concurrent.futures.Future] = {}
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    async def run(self, key: Tuple, request: Callable[[], Awaitable[Any]]):
+        while True:
+            with self._lock:
+                shared = self._in_flight.get(key)
+                if shared is None:
+                    shared = self._in_flight[key] = concurrent.futures.Future()
+                    leader = True
+                    self._counts["requests"] += 1
+                else:
+                    leader = False
+                    self._counts["coalesced"] += 1
+
+            if leader:
+                return await self._lead(key, shared, request)
+
+            result = await asyncio.wrap_future(shared)
+            if result is not _LEADER_CANCELLED:
+                return result
+            with self._lock:
+                self._counts["coalesced"] -= 1
+
+    async def _lead(self, key: Tuple, shared: concurrent.futures.Future, request):
+        try:
+            result = await request()
+        except asyncio.CancelledError:
+            self._finish(key, shared, result=_LEADER_CANCELLED)
+            raise
+        except BaseException as e:
+            self._finish(key, shared, error=e)
+            raise
+        self._finish(key, shared, result=result)
+        return result
+
+    def _finish(self, key: Tuple, shared: concurrent.futures.Future, result=None, error=None):
+        with self._lock:
+            if self._in_flight.get(key) is shared:
+                del self._in_flight[key]
+        if error is not None:
+            shared.set_exception(error)
+        else:
+            shared.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            requests, coalesced = self._counts["requests"], self._counts["coalesced"]
+            in_flight = len(self._in_flight)
+        total = requests + coalesced
+        return {
+            "requests": requests,
+            "coalesced": coalesced,
+            "coalesced_rate": round(coalesced / total, 4) if total else 0.0,
+            "in_flight": in_flight,
+        }
+
+
+_COALESCER = requestCoalescer()
+register_metrics("request_coalescing", _COALESCER.stats)
+
+
+def get_request_coalescer() -> requestCoalescer:
+    return _COALESCER
@@ -1,24 +1,38 @@
-import openai
+import asyncio
+import hashlib
 from src.eido.utils.apis_config import fetch_api_key_for_provider
+from src.eido.models.provider_usage import report_prompt_cache
+from src.eido.models.provider_clients import call_provider, stream_provider
+from src.eido.models.provider_limits import acquire_provider_budget
+from src.eido.models.provider_errors import (
+    ProviderAuthError,
+    ProviderEmptyResponseError,
+    classify_provider_error,
+)
 from src.eido.utils.eido_config import (
     fetch_model_name,
     fetch_model_max_tokens,
     fetch_model_temperature,
 )
 
+XAI_BASE_URL = "https://api.x.ai/v1"
+
 class xai_main_class:
     def __init__(self, system, chat_messages):
         self.system = system
         self.messages = chat_messages
+        self.usage = None  # token usage of the last call, see provider_usage
 
-    async def text_response(self, email):
+    async def text_response(self, email, on_text=None):
         llm_api_key = await fetch_api_key_for_provider("xai", email=email)
         
         model = await fetch_model_name(email=email)
         max_tokens = await fetch_model_max_tokens(email=email)
         temperature = await fetch_model_temperature(email=email)
 
-        client = openai.OpenAI(api_key=llm_api_key, base_url="https://api.x.ai/v1")
+        if not llm_api_key:
+            raise ProviderAuthError("xai", "No API key provided")
+
         message_list = []
         all_messages = []
         for message in self.messages:
@@ -33,7 +47,8 @@ class xai_main_class:
         
         #print(f"\n\n### System: {self.system}")
         #print(f"\n\n### Messages: {message_list}")
-        
+
+        budget = await acquire_provider_budget("xai", llm_api_key, email, self.system, self.messages, max_tokens)
         try:
             create_args = {
                 "model": str(model),
@@ -43,16 +58,46 @@ class xai_main_class:
                 create_args["max_tokens"] = int(max_tokens)
             if temperature:
                 create_args["temperature"] = float(temperature)
-            response = client.chat.completions.create(**create_args)
+            segments = getattr(self.system, "segments", None)
+            if segments:
+                # Calls sharing the static prefix are routed to the same prompt cache
+                create_args["extra_headers"] = {"x-grok-conv-id": hashlib.sha1(segments[0].encode("utf-8")).hexdigest()[:32]}
+            if on_text is None:
+                response = await call_provider("xai", llm_api_key, lambda client: client.chat.completions.create(**create_args), base_url=XAI_BASE_URL)
+                usage = getattr(response, 'usage', None)
+                content = getattr(getattr(response.choices[0], 'message', {}), 'content', None) if response.choices else None
+            else:
+                async def events(client):
+                    parts, usage = [], None
+                    chunks = await client.chat.completions.create(**create_args, stream=True, stream_options={"include_usage": True})
+                    async for chunk in chunks:
+                        # With include_usage the last chunk has usage and no choices
+                        usage = getattr(chunk, 'usage', None) or usage
+                        text = chunk.choices[0].delta.content if chunk.choices else None
+                        if text:
+                            parts.append(text)
+                            yield text
+                    yield ("".join(parts), usage)
+                response = None
+                content, usage = await stream_provider("xai", llm_api_key, events, on_text, base_url=XAI_BASE_URL)
+        except asyncio.CancelledError:
+            # Not an Exception: settled here or the key and the limiter never see the call
+            self.usage = budget.cancel()
+            raise
         except Exception as e:
             print(f"[XAI_ERROR] {type(e).__name__}: {e}")
-            return "FAIL"
+            error = classify_provider_error("xai", e)
+            budget.settle(error=error)
+            raise error from e
+
+        if usage is not None:
+            cached_tokens = getattr(getattr(usage, 'prompt_tokens_details', None), 'cached_tokens', 0) or 0
+            self.usage = report_prompt_cache("xai", model, getattr(usage, 'prompt_tokens', 0), cached_tokens, output_tokens=getattr(usage, 'completion_tokens', 0))
+            budget.settle(getattr(usage, 'total_tokens', None))
+        else:
+            budget.settle()
 
-        content = getattr(getattr(response.choices[0], 'message', {}), 'content', None)
-        if content is not None:
-            if content == "":
-                print(str(response))
-                return "FAIL"
+        if content:
             return content
-        print(str(response))
-        return "FAIL"
+        print(str(response) if response is not None else "(empty stream)")
+        raise ProviderEmptyResponseError("xai", "Empty response content")
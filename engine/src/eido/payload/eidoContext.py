@@ -0,0 +1,87 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from src.disk.services.chats import crud as chat_crud
+from src.eido.utils.token_estimator import estimate_message_tokens, estimate_tokens
+from src.eido.utils.eido_config import fetch_model_context_size, fetch_model_max_tokens
+
+
+# Headroom for provider-side formatting and estimator error.
+CONTEXT_SAFETY_MARGIN = 0.1
+MIN_HISTORY_BUDGET = 512
+# Messages read per query while walking the history back from the newest.
+HISTORY_PAGE_MESSAGES = 64
+
+
+class eidoContext():
+    def __init__(self, email):
+        self.email = email
+        # Whether the last assemble left older messages out
+        self.truncated = False
+
+    ########################################################
+
+    async def history_budget(self, system_prompt: Optional[str] = "", reserved_tokens: int = 0) -> int:
+        """Tokens left for chat history once the system prompt, the reply
+        (MODEL_MAX_TOKENS) and other pinned context are accounted for."""
+        context_size = await fetch_model_context_size(email=self.email)
+        max_tokens = await fetch_model_max_tokens(email=self.email)
+        try:
+            reply_tokens = int(max_tokens) if max_tokens else 0
+        except (TypeError, ValueError):
+            reply_tokens = 0
+
+        usable = int(context_size * (1 - CONTEXT_SAFETY_MARGIN))
+        budget = usable - reply_tokens - estimate_tokens(system_prompt) - reserved_tokens
+        return max(budget, MIN_HISTORY_BUDGET)
+
+    @staticmethod
+    def message_tokens(message: Dict[str, Any]) -> int:
+        token_count = message.get("token_count")
+        if token_count is None:
+            token_count = estimate_message_tokens(message.get("content"))
+            message["token_count"] = token_count
+        return token_count
+
+    async def assemble(self, conversation_id: str, budget: int, recent: List[Dict[str, Any]], after: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Keep pinned messages plus the newest contiguous turns that fit in budget.
+
+        System messages and the opening user request (the task or the chat's
+        first instruction) are pinned: they stay in context however long the
+        chat gets, and are read by their own query. The rest is walked from
+        the newest message backwards, starting with `recent` (the newest page
+        of get_recent_messages) and reading older pages only while budget is
+        left, so both the reads and the token work are proportional to the
+        kept messages. Messages up to `after` (folded into the summary) are
+        never read.
+        """
+        self.truncated = False
+        pinned = await chat_crud.get_pinned_messages(conversation_id, self.email)
+        pinned_ids = {m["id"] for m in pinned}
+        remaining = budget - sum(self.message_tokens(m) for m in pinned)
+
+        kept = []
+        page = recent
+        while page:
+            for message in reversed(page):
+                if message["id"] in pinned_ids:
+                    continue
+                tokens = self.message_tokens(message)
+                if tokens > remaining and kept:
+                    self.truncated = True
+                    return self._in_order(pinned, kept)
+                # The newest message is always kept, even when it alone is over budget
+                kept.append(message)
+                remaining -= tokens
+            if len(page) < HISTORY_PAGE_MESSAGES:
+                break
+            page = await chat_crud.get_recent_messages(
+                conversation_id, self.email, HISTORY_PAGE_MESSAGES, before_id=page[0]["id"], after=after
+            )
+
+        return self._in_order(pinned, kept)
+
+    @staticmethod
+    def _in_order(pinned: List[Dict[str, Any]], kept: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # Both lists come from the same ordering (created_at, id); kept is newest first
+        return sorted(pinned + kept, key=lambda m: (m.get("created_at") or "", m["id"]))
@@ -1,8 +1,36 @@
 import os
-from src.eido.utils.eido_config import fetch_local_mode, fetch_local_path
+from src.eido.utils.eido_config import fetch_awareness_mode, fetch_local_context_tokens, fetch_local_mode, fetch_local_path
+from src.eido.utils.awareness_snapshot import get_awareness_snapshot
+from src.eido.utils.workspace_index import EXCLUDED_ITEMS, EXCLUDED_STARTS_WITH, get_workspace_index
+from src.eido.utils.workspace_retrieval import get_workspace_retriever
+from src.eido.utils.token_estimator import estimate_message_tokens
+from src.eido.payload.eidoContext import HISTORY_PAGE_MESSAGES, eidoContext
+from src.eido.payload.eidoMemory import eidoMemory
 
 from src.disk.services.chats import crud as chat_crud
 
+INTERNAL_PREFIX = "[**INTERNAL SYSTEM MESSAGE**]"
+# Newest messages scanned for tool calls when searching the local files.
+RETRIEVAL_RECENT_MESSAGES = 6
+# Files listed by name when the local is too large to send in full.
+MAX_TREE_ENTRIES = 2000
+
+
+def retrieval_query(messages):
+    """Latest user request plus the tool calls made since, as a search query."""
+    query_parts = []
+    for m in reversed(messages or []):
+        content = str(m.get("content") or "")
+        if m.get("role") == "user" and not content.startswith(INTERNAL_PREFIX):
+            query_parts.append(content)
+            break
+    for m in (messages or [])[-RETRIEVAL_RECENT_MESSAGES:]:
+        content = str(m.get("content") or "")
+        if content.startswith(f"{INTERNAL_PREFIX} Executing function:"):
+            query_parts.append(content[len(INTERNAL_PREFIX):])
+    return "\n".join(query_parts)
+
+
 class eidoConversation():
     def __init__(self, email, conversation_id):
         self.email = email
@@ -10,33 +38,7 @@ class eidoConversation():
 
     ########################################################
 
-    def filter_paths(self, dirs, files, excluded_items, excluded_starts_with, allowed_extensions):
-        if excluded_starts_with is None:
-            excluded_starts_with = []
-        dirs[:] = [
-            d for d in dirs
-            if not any(d.startswith(prefix) for prefix in excluded_starts_with)
-            and d not in excluded_items
-        ]
-
-        # Filter files based on criteria
-        filtered_files = []
-        for f in files:
-            # Skip files that start with any prefix in excluded_starts_with or are in excluded items
-            if any(f.startswith(prefix) for prefix in excluded_starts_with) or f in excluded_items:
-                continue
-
-            # If allowed_extensions is a function (for backward compatibility)
-            if callable(allowed_extensions):
-                if allowed_extensions(f):
-                    filtered_files.append(f)
-            # If allowed_extensions is a set of extensions
-            elif allowed_extensions is None or os.path.splitext(f)[1].lower() in allowed_extensions:
-                filtered_files.append(f)
-
-        return filtered_files
-
-    async def local_workspace(self):  
+    async def local_workspace(self, messages=None):
         local_mode = await fetch_local_mode(email=self.email)
 
         if local_mode == "false":
@@ -68,77 +70,58 @@ class eidoConversation():
                 print(f"### Local: {error_msg}")
                 return error_msg
             
-            excluded_items = {"target", "node_modules", "venv"}
-            excluded_starts_with = {".", "#"}
-            allowed_extensions = {
-                # Basic text files
-                '.txt', '.text', '.log',
-                
-                # Programming languages
-                '.py', '.js', '.ts', '.jsx', '.tsx', '.java', '.cpp', '.c', '.cc', '.cxx', '.h', '.hpp', '.hxx',
-                '.cs', '.php', '.rb', '.go', '.rs', '.swift', '.kt', '.scala', '.pl', '.r', '.m', '.mm', '.f', '.f90',
-                '.pas', '.dpr', '.vb', '.vbs', '.asm', '.s', '.lua', '.dart', '.elm', '.ex', '.exs', '.clj', '.cljs',
-                '.hs', '.ml', '.mli', '.fs', '.fsx', '.jl', '.nim', '.cr', '.zig', '.v', '.vv',
-                
-                # Web technologies
-                '.html', '.htm', '.xhtml', '.css', '.scss', '.sass', '.less', '.svg', '.vue', '.svelte',
-                
-                # Configuration files
-                '.json', '.yaml', '.yml', '.toml', '.ini', '.cfg', '.conf', '.config', '.properties', '.env',
-                '.gitignore', '.gitattributes', '.editorconfig', '.dockerignore',
-                
-                # Shell scripts
-                '.sh', '.bash', '.zsh', '.fish', '.bat', '.cmd', '.ps1', '.psm1',
-                
-                # Documentation
-                '.md', '.markdown', '.mdown', '.mkd', '.rst', '.tex', '.latex', '.adoc', '.asciidoc', '.wiki',
-                '.org', '.textile',
-                
-                # Data formats
-                '.csv', '.tsv', '.xml', '.sql', '.graphql', '.gql',
-                
-                # Build and project files
-                '.makefile', '.dockerfile', '.containerfile', '.gradle', '.sbt', '.pom', '.proj', '.csproj',
-                '.vcxproj', '.xcodeproj', '.pbxproj',
-                
-                # Others
-                '.patch', '.diff', '.LICENSE', '.CHANGELOG', '.CONTRIBUTING', '.README', '.TODO',
-                '.gitmodules', '.htaccess', '.robots'
-            }
-            
-            
-            local_contents = []
-            
+            excluded_items = EXCLUDED_ITEMS
+            excluded_starts_with = EXCLUDED_STARTS_WITH
+
+            # Only files whose stat changed since the last step are read again
+            workspace_index = get_workspace_index(local_path)
             try:
-                for root, dirs, files in os.walk(local_path):
-                    files = self.filter_paths(dirs, files, excluded_items, excluded_starts_with, allowed_extensions)
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        try:
-                            # Try multiple encodings to handle different file types
-                            encodings_to_try = ['utf-8', 'windows-1252', 'iso-8859-1', 'cp1252']
-                            content = None
-                            
-                            for encoding in encodings_to_try:
-                                try:
-                                    with open(file_path, 'r', encoding=encoding) as infile:
-                                        content = infile.read()
-                                        break  # Successfully read with this encoding
-                                except UnicodeDecodeError:
-                                    continue  # Try next encoding
-                            
-                            if content is not None:
-                                local_contents.append(f'\n//File path: {file_path}.' + "\n//File content:\n" + content + "\n//End of file content.\n---")
-                            else:
-                                print(f"### Local: Could not decode {file_path} with any supported encoding. File skipped.")
-                                
-                        except (FileNotFoundError, PermissionError) as e:
-                            print(f"### Local: Error reading {file_path}: {e}. File skipped.")
+                await workspace_index.refresh()
             except (PermissionError, OSError) as e:
                 error_msg = f"ERROR: Failed to walk local_path '{local_path}': {e}"
                 print(f"### Local: {error_msg}")
                 return error_msg
 
+            # Small locals are sent whole; larger ones as a file list plus the
+            # chunks most relevant to this step
+            budget = await fetch_local_context_tokens(email=self.email)
+            retriever = get_workspace_retriever(workspace_index)
+            files = workspace_index.files()
+
+            if retriever.fits(budget):
+                local_contents = [
+                    f'\n//File path: {os.path.join(local_path, relative_path)}.' + "\n//File content:\n" + entry.content + "\n//End of file content.\n---"
+                    for relative_path, entry in files
+                    if entry.content is not None
+                ]
+                local_contents_prompt = f"""### This is the local of this session, it contains all the files in your local: 
+//Beginning of local//        
+'''
+{local_contents} 
+'''
+//End of local//"""
+            else:
+                tree = "\n".join(relative_path for relative_path, _ in files[:MAX_TREE_ENTRIES])
+                if len(files) > MAX_TREE_ENTRIES:
+                    tree += f"\n... and {len(files) - MAX_TREE_ENTRIES} more files."
+                chunks = retriever.search(retrieval_query(messages), budget)
+                excerpts = "".join(
+                    f'\n//File path: {os.path.join(local_path, chunk.path)} (lines {chunk.start_line}-{chunk.end_line}).' + "\n//File content:\n" + chunk.text + "\n//End of file content.\n---"
+                    for chunk in chunks
+                )
+                local_contents_prompt = f"""### The local of this session is too large to show in full, these are all its files (relative to the local path):
+//Beginning of local files//
+'''
+{tree}
+'''
+//End of local files//
+
+### These are the parts of the local files most relevant to the current request; use your tools to read anything else:
+//Beginning of local excerpts//
+'''{excerpts}
+'''
+//End of local excerpts//"""
+
             
             local_path_prompt = f"### This is the directory path of YOUR local environment '{local_path}'; YOU MUST use this path for your local events and actions."
             excluded_items_prompt = "### Excluded items:\n'''\n" + str(excluded_items) + "\n'''."
@@ -157,12 +140,7 @@ class eidoConversation():
 
 {allowed_extensions_prompt}
 
-### This is the local of this session, it contains all the files in your local: 
-//Beginning of local//        
-'''
-{local_contents} 
-'''
-//End of local//    
+{local_contents_prompt}
             """
             
             return local_prompt
@@ -174,40 +152,81 @@ class eidoConversation():
 
     ########################################################
 
-    async def chat_history(self):
-        messages = await chat_crud.get_conversation_history(self.conversation_id, self.email)
-        chat_history = []
-        for m in messages:
-            role = m.get("role")
-            content = m.get("content")
-            if content is None:
-                continue
-            chat_history.append({"role": role, "content": content})
+    async def awareness_excerpts(self, messages):
+        """Source files relevant to the latest user request (AWARENESS_MODE "relevant")."""
+        awareness_mode = await fetch_awareness_mode(email=self.email)
+        if awareness_mode != "relevant":
+            return ""
+
+        query = next(
+            (m.get("content") for m in reversed(messages)
+             if m.get("role") == "user" and not str(m.get("content")).startswith(INTERNAL_PREFIX)),
+            "",
+        )
+        excerpts = get_awareness_snapshot().relevant(str(query)) if query else ""
+        if not excerpts:
+            return ""
+
+        return f"""
+[**INTERNAL SYSTEM MESSAGE**] Automatic pulling of your own source code relevant to the latest request:
+
+//Beginning of codebase excerpts//
+'''{excerpts}
+'''
+//End of codebase excerpts//
+            """
 
+    ########################################################
 
-        local_prompt = await self.local_workspace()
+    async def chat_history(self, system_prompt=""):
+        # Turns already folded into the rolling summary are replaced by it
+        summary_message, summary_until = await eidoMemory(self.email, self.conversation_id).summary()
+        # Only the newest page is read here; eidoContext reads older ones while they fit
+        messages = await chat_crud.get_recent_messages(self.conversation_id, self.email, HISTORY_PAGE_MESSAGES, after=summary_until)
+
+        awareness_prompt = await self.awareness_excerpts(messages)
+        local_prompt = await self.local_workspace(messages)
+        reserved_tokens = estimate_message_tokens(local_prompt) if local_prompt else 0
+        if awareness_prompt:
+            reserved_tokens += estimate_message_tokens(awareness_prompt)
+        if summary_message:
+            reserved_tokens += summary_message["token_count"]
+
+        context = eidoContext(self.email)
+        budget = await context.history_budget(system_prompt, reserved_tokens=reserved_tokens)
+        kept_messages = await context.assemble(self.conversation_id, budget, messages, after=summary_until)
+        if context.truncated:
+            print(f"\n\n[CONTEXT]: Sending {len(kept_messages)} messages, older ones left out ({budget} token budget)")
+
+        if summary_message:
+            kept_messages = [summary_message] + kept_messages
+
+        chat_history = [{"role": m.get("role"), "content": m.get("content")} for m in kept_messages]
+
+        # Everything up to the message before the latest one is identical on the
+        # next step; providers with explicit prompt caching cache up to here
+        if len(chat_history) >= 2:
+            chat_history[-2]["cache_breakpoint"] = True
         
-        # If local_prompt is not empty, insert it as second-to-last message
-        if local_prompt != "":
-            # Handle case where chat_history might be None or empty
-            if chat_history is None:
-                chat_history = []
-            
-            # Create local message object
-            local_message = {
+        # Pulled context (source excerpts, then the local workspace) goes right
+        # before the latest message
+        for pulled_prompt in (awareness_prompt, local_prompt):
+            if pulled_prompt == "":
+                continue
+
+            pulled_message = {
                 "role": "assistant",
-                "content": local_prompt
+                "content": pulled_prompt
             }
             
-            # If there are at least 2 messages, insert local_prompt as second-to-last
+            # If there are at least 2 messages, insert it as second-to-last
             if len(chat_history) >= 2:
-                # Insert local_message before the last message
-                chat_history.insert(-1, local_message)
+                chat_history.insert(-1, pulled_message)
             elif len(chat_history) == 1:
-                # If only one message, insert local_message before it
-                chat_history.insert(0, local_message)
+                # If only one message, insert it before that message
+                chat_history.insert(0, pulled_message)
             else:
-                # If empty, just add the local_message
-                chat_history.append(local_message)
+                # If empty, just add it
+                chat_history.append(pulled_message)
         
         return chat_history
@@ -0,0 +1,123 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.disk.services.chats import crud as chat_crud
+from src.eido.models.provider_errors import ProviderError
+from src.eido.models.provider_gateway import request_model_response
+from src.eido.utils.token_estimator import estimate_message_tokens, estimate_tokens
+
+
+INTERNAL_PREFIX = "[**INTERNAL SYSTEM MESSAGE**]"
+
+# Newest messages that are always sent verbatim and never folded.
+RECENT_WINDOW_MESSAGES = 12
+# Older unsummarised messages needed before a fold is worth a model call.
+FOLD_BATCH_MESSAGES = 8
+# Upper bound of transcript sent to the summariser in one fold.
+FOLD_MAX_TOKENS = 12000
+SUMMARY_MAX_WORDS = 400
+
+SUMMARY_SYSTEM_PROMPT = f"""
+You maintain the running memory of a conversation between an operator and AI agents.
+You receive the current summary (possibly empty) and the next part of the transcript.
+Return an updated summary in plain text, no JSON and no preamble, at most {SUMMARY_MAX_WORDS} words.
+Keep facts, decisions, names, paths, open tasks and the operator's preferences; drop small talk.
+"""
+
+
+def _parse_iso(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+class eidoMemory():
+    def __init__(self, email, conversation_id):
+        self.email = email
+        self.conversation_id = conversation_id
+
+    ########################################################
+
+    @staticmethod
+    def _foldable(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [
+            m for m in messages
+            if m.get("content") and not str(m.get("content")).startswith(INTERNAL_PREFIX)
+        ]
+
+    async def summary(self) -> Tuple[Optional[Dict[str, Any]], Optional[datetime]]:
+        """The summary as a message, and the time up to which it covers the
+        conversation; (None, None) before the first fold.
+
+        Messages up to that time are replaced by the summary, except system
+        messages and the opening user request, the pins of eidoContext.
+        """
+        summary = await chat_crud.get_conversation_summary(self.conversation_id, self.email)
+        summary_until = _parse_iso(summary.get("summary_until")) if summary else None
+        if not summary or summary_until is None:
+            return None, None
+
+        content = f"{INTERNAL_PREFIX} Summary of the earlier part of this conversation:\n'''\n{summary['summary']}\n'''"
+        summary_message = {
+            "role": "assistant",
+            "content": content,
+            "token_count": estimate_message_tokens(content),
+        }
+        return summary_message, summary_until
+
+    ########################################################
+
+    async def refresh(self):
+        """Fold messages that left the recent window into the stored summary.
+
+        Runs after a turn completes; does nothing until FOLD_BATCH_MESSAGES
+        unsummarised messages have accumulated, so most turns cost no model call.
+        """
+        if not self.conversation_id:
+            return
+
+        try:
+            history = self._foldable(await chat_crud.get_conversation_history(self.conversation_id, self.email))
+            if len(history) <= RECENT_WINDOW_MESSAGES:
+                return
+
+            summary = await chat_crud.get_conversation_summary(self.conversation_id, self.email)
+            previous_summary = summary.get("summary", "") if summary else ""
+            summary_until = _parse_iso(summary.get("summary_until")) if summary else None
+
+            older = history[:-RECENT_WINDOW_MESSAGES]
+            if summary_until is not None:
+                older = [m for m in older if (_parse_iso(m.get("created_at")) or summary_until) > summary_until]
+            if len(older) < FOLD_BATCH_MESSAGES:
+                return
+
+            to_fold = []
+            transcript_tokens = 0
+            for m in older:
+                transcript_tokens += m.get("token_count") or estimate_message_tokens(m.get("content"))
+                if to_fold and transcript_tokens > FOLD_MAX_TOKENS:
+                    break
+                to_fold.append(m)
+
+            transcript = "\n\n".join(f"{m.get('role')}: {m.get('content')}" for m in to_fold)
+            prompt = f"Current summary:\n'''\n{previous_summary}\n'''\n\nNext part of the transcript:\n'''\n{transcript}\n'''"
+
+            new_summary = await request_model_response(self.email, SUMMARY_SYSTEM_PROMPT, [{"role": "user", "content": prompt}], conversation_id=self.conversation_id)
+            new_summary = str(new_summary).strip()
+            if not new_summary:
+                return
+
+            folded_until = _parse_iso(to_fold[-1].get("created_at"))
+            if folded_until is None:
+                return
+
+            await chat_crud.update_conversation_summary(self.conversation_id, new_summary, folded_until, self.email)
+            print(f"\n\n[MEMORY]: Folded {len(to_fold)} messages into the summary ({estimate_tokens(new_summary)} tokens)")
+
+        except ProviderError as e:
+            print(f"\n\n[MEMORY]: Summary update skipped: {e}")
+        except Exception as e:
+            print(f"\n\n[ERROR]: Error updating conversation summary: {e}")
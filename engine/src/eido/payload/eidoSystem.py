@@ -1,7 +1,9 @@
-import os
-import inspect
-import importlib
+import threading
+from collections import OrderedDict
+from src.eido.utils.tool_registry import get_tool_registry
+from src.eido.utils.awareness_snapshot import get_awareness_snapshot
 from src.eido.utils.eido_config import (
+    eido_settings_version,
     fetch_operator_name,
     fetch_eido_purpose,
     fetch_agents_mode,
@@ -11,6 +13,32 @@ from src.eido.utils.eido_config import (
     fetch_agents_dict,
 )
 
+
+# Built system prompts keyed by (email, agent, settings version, tools version,
+# awareness snapshot version). Any write to the user's eido settings, tool file
+# change or source change yields a new key, so entries never need explicit
+# invalidation; old ones age out of the LRU.
+PROMPT_CACHE_MAX_ENTRIES = 64
+
+
+class systemPrompt(str):
+    """A system prompt that also remembers the segments it was joined from.
+
+    Behaves as the plain prompt string; adapters with explicit prompt caching
+    (Anthropic) read `segments` to place a cache breakpoint after each one.
+    """
+
+    def __new__(cls, segments):
+        texts = ["\n\n".join(part.strip() for part in segment if part and part.strip()) for segment in segments]
+        texts = tuple(text for text in texts if text)
+        prompt = super().__new__(cls, "\n\n".join(texts))
+        prompt.segments = texts
+        return prompt
+
+
+_prompt_cache = OrderedDict()
+_prompt_cache_lock = threading.Lock()
+
 class eidoSystem():
     def __init__(self, email):
         self.email = email
@@ -38,7 +66,7 @@ class eidoSystem():
     "agents": [], // This is the section where you fill the names of the agents that you need to summon, name them here if they are needed for the next turn OR leave empty if you are fit for the job / no agents are needed / avaiable agents are not qualified.
     "functions_list": [
     {{
-        "function": "names_of_the_functions_to_call", // Listed earlier as tools.
+        "function": "names_of_the_functions_to_call", // Listed in the tools section.
         "args": ["arg1", "arg2", "arg3"] // List of positional arguments.
         "kwargs": {{"name_of_keyword_argument": "value", "another_keyword_argument": "value"}} // if function requires named arguments use this field.
     }}],
@@ -56,37 +84,7 @@ class eidoSystem():
         tools_mode = await fetch_tools_mode(email=self.email)
 
         if tools_mode == "true":
-
-            self.function_map = {}
-            function_descriptions = []
-            
-            tools_dir = 'src/eido/tools'
-            
-            for filename in os.listdir(tools_dir):
-                if filename.endswith('.py') and not filename.startswith('__'):
-                    module_name = f"src.eido.tools.{filename[:-3]}"
-                    module_path = os.path.join(tools_dir, filename)
-                    
-                    try:
-                        spec = importlib.util.spec_from_file_location(module_name, module_path)
-                        module = importlib.util.module_from_spec(spec)
-                        spec.loader.exec_module(module)
-                        
-                        for func_name in dir(module):
-                            if not func_name.startswith("__"):
-                                func_obj = getattr(module, func_name)
-                                if callable(func_obj):
-                                    self.function_map[func_name] = func_obj
-                                    sig = inspect.signature(func_obj)
-                                    function_descriptions.append(f"def {func_name}{sig}:")
-                                    if func_obj.__doc__:
-                                        function_descriptions.append(f"    \"{func_obj.__doc__}\"")
-                    except Exception as e:
-                        error = f"load_tools: Error loading tool {filename}: {e}"
-                        print(error)
-
-            function_descriptions_str = "\n".join(function_descriptions)
-            tools_prompt = f"""### These are the tools (aka functions) available to YOU to use whenever needed:\n//Beginning of functions//\n'''\n{function_descriptions_str}\n'''\n//End of functions//"""
+            self.function_map, tools_prompt = get_tool_registry().get()
         
         elif tools_mode == "false":
             tools_prompt = "### No tools are avaiable in this session."
@@ -102,27 +100,14 @@ class eidoSystem():
             awareness_prompt = "### You don't have awareness to your own source code at the moment."
 
         elif awareness_mode == "true":
-            src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../..'))
-            openThalis_sourcecode = ""
-            
-            for root, dirs, files in os.walk(src_dir):
-                # Exclude directories that start with '.' or are '__pycache__'
-                dirs[:] = [d for d in dirs if not d.startswith('.') and d != '__pycache__']
-                # Exclude files that start with '.'
-                files = [f for f in files if not f.startswith('.')]
-                for file in files:
-                    if file.endswith('.py'):
-                        file_path = os.path.join(root, file)
-                        try:
-                            with open(file_path, 'r', encoding='utf-8') as f:
-                                content = f.read()
-                            relative_path = os.path.relpath(file_path, src_dir)
-                            openThalis_sourcecode += f"\n\n# File: {relative_path}\n{content}"
-                        except Exception as e:
-                            print(f"Error reading {file_path}: {e}")
+            openThalis_sourcecode = get_awareness_snapshot().digest()
             
             awareness_prompt = "### The following codebase is a copy of your source code, by being aware of it you will be able to act with awareness and know how you are built and work so you can maximize your performance:\n//Beginning of codebase//\n'''\n" + openThalis_sourcecode + "\n'''\n//End of codebase//"
         
+        elif awareness_mode == "relevant":
+            # The excerpts depend on the query, so they travel with the messages (eidoConversation)
+            awareness_prompt = "### Parts of your own source code that are relevant to the current request are pulled into the conversation automatically, use them to know how you are built and work."
+
         else:
             awareness_prompt = "ERROR: Awareness mode is not configured to True or False, please check your disk structure and try again."
 
@@ -182,37 +167,58 @@ class eidoSystem():
     ########################################################
 
     async def set_modelSystem(self, agent_name):
-        agent_prompt = await self.agent_system(agent_name)
-        
-        operator_prompt = await self.operator_details()
-        
-        eido_purpose_prompt = await self.eido_purpose()
-        eido_agents_prompt = await self.eido_agents(agent_name)
-        
-        awareness_prompt = await self.self_awareness()
+        tool_registry = get_tool_registry()
+        tool_registry.refresh()
 
-        tools_prompt = await self.load_tools()
-        
-        response_format_prompt = await self.response_format()
-        foot_notes_prompt = await self.foot_notes()
-        
-        assigned_system = f"""
-{agent_prompt}
+        awareness_version = None
+        if await fetch_awareness_mode(email=self.email) == "true":
+            awareness_snapshot = get_awareness_snapshot()
+            awareness_snapshot.refresh()
+            awareness_version = awareness_snapshot.version
 
-{operator_prompt}
+        cache_key = (self.email, agent_name, eido_settings_version(self.email), tool_registry.version, awareness_version)
 
-{eido_purpose_prompt}
+        with _prompt_cache_lock:
+            cached = _prompt_cache.get(cache_key)
+            if cached is not None:
+                _prompt_cache.move_to_end(cache_key)
 
-{eido_agents_prompt}
+        if cached is not None:
+            assigned_system, self.function_map = cached
+            return assigned_system
 
-{awareness_prompt}
+        assigned_system = await self.build_modelSystem(agent_name)
 
-{tools_prompt}
+        with _prompt_cache_lock:
+            _prompt_cache[cache_key] = (assigned_system, getattr(self, 'function_map', {}))
+            while len(_prompt_cache) > PROMPT_CACHE_MAX_ENTRIES:
+                _prompt_cache.popitem(last=False)
 
-{response_format_prompt}
+        return assigned_system
 
-{foot_notes_prompt}
-        """
+    async def build_modelSystem(self, agent_name):
+        # Sections go from most to least static so the longest possible prefix
+        # is byte-identical across calls, users and agents, which is what
+        # provider-side prompt caching matches on.
+        response_format_prompt = await self.response_format()
+        foot_notes_prompt = await self.foot_notes()
+        tools_prompt = await self.load_tools()
+        awareness_prompt = await self.self_awareness()
+
+        operator_prompt = await self.operator_details()
+        eido_purpose_prompt = await self.eido_purpose()
+
+        eido_agents_prompt = await self.eido_agents(agent_name)
+        agent_prompt = await self.agent_system(agent_name)
+
+        assigned_system = systemPrompt([
+            # Shared by every session with the same tools and source code
+            [response_format_prompt, foot_notes_prompt, tools_prompt, awareness_prompt],
+            # Changes with the user's settings
+            [operator_prompt, eido_purpose_prompt],
+            # Changes with the speaking agent
+            [eido_agents_prompt, agent_prompt],
+        ])
 
         return assigned_system
 
@@ -1,12 +1,39 @@
-from typing import Optional
+import re
+import json
+from typing import List, Optional, Tuple
 from src.disk.services.settings import crud as settings_crud
 
 
+def parse_api_keys(value) -> List[str]:
+    """The keys of a key setting: one key, a JSON list, or keys separated by
+    commas, spaces or new lines."""
+    if isinstance(value, (list, tuple)):
+        candidates = value
+    else:
+        text = str(value or "").strip()
+        candidates = None
+        if text.startswith("["):
+            try:
+                candidates = json.loads(text)
+            except ValueError:
+                candidates = None
+        if not isinstance(candidates, list):
+            candidates = re.split(r"[\s,]+", text)
+    keys = []
+    for candidate in candidates:
+        key = str(candidate).strip()
+        if key and key not in keys:
+            keys.append(key)
+    return keys
+
+
 async def fetch_api_key_for_provider(provider: str, email: Optional[str] = None) -> str:
     """Return the API key for a given provider from the database only.
 
     Looks up the key in the user's Eido settings table. If no email is provided
-    or the key is not found, returns an empty string.
+    or the key is not found, returns an empty string. A setting holding
+    several keys (see parse_api_keys) is a pool: each call gets one of them,
+    chosen by health and remaining quota (provider_limits.apiKeyPool).
     """
 
     # Determine which key to look up
@@ -26,12 +53,37 @@ async def fetch_api_key_for_provider(provider: str, email: Optional[str] = None)
         try:
 
             general_settings = await settings_crud.get_settings_dict(email)
-            value = general_settings.get(key_name, "")
-            if value:
-                return value
+            api_keys = parse_api_keys(general_settings.get(key_name, ""))
+            if api_keys:
+                # Imported here: provider_limits reads the rate limits below
+                from src.eido.models.provider_limits import choose_api_key
+                return choose_api_key(provider.lower(), api_keys)
         except Exception:
             print(f"\n\n### Error fetching API key from database for {key_name}")
             return ""
 
     return ""
 
+
+
+async def fetch_rate_limits_for_provider(provider: str, email: Optional[str] = None) -> Tuple[int, int]:
+    """Requests and tokens per minute allowed for the provider's API key.
+
+    Read from the user's {PROVIDER}_RPM and {PROVIDER}_TPM settings (for
+    example OPENAI_RPM); 0 when unset, meaning no limit.
+    """
+    if not email:
+        return 0, 0
+    try:
+        general_settings = await settings_crud.get_settings_dict(email)
+    except Exception:
+        print(f"\n\n### Error fetching rate limits from database for {provider}")
+        return 0, 0
+
+    limits = []
+    for suffix in ("RPM", "TPM"):
+        try:
+            limits.append(max(0, int(general_settings.get(f"{provider.upper()}_{suffix}") or 0)))
+        except (TypeError, ValueError):
+            limits.append(0)
+    return limits[0], limits[1]
@@ -0,0 +1,151 @@
+import os
+import time
+import zlib
+import hashlib
+import threading
+from typing import Dict, List, NamedTuple, Optional
+
+from src.eido.utils.lexical_index import bm25Index
+from src.eido.utils.token_estimator import estimate_tokens
+
+
+AWARENESS_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../..'))
+# How long a validated snapshot is trusted before the source tree is stat'ed again.
+REVALIDATE_INTERVAL_SECONDS = 5.0
+
+# Relevance mode: how many files and tokens of source a single query may pull in.
+RELEVANT_MAX_FILES = 6
+RELEVANT_MAX_TOKENS = 8000
+
+
+class snapshotFile(NamedTuple):
+    mtime_ns: int
+    size: int
+    sha1: str
+    blob: bytes  # zlib-compressed utf-8 content
+
+
+class awarenessSnapshot:
+    """Process-wide digest of the engine's own source code.
+
+    The tree is read once; afterwards files are only re-read when their
+    mtime or size changes and only re-indexed when their hash changes. File
+    contents and the assembled digest are kept zlib-compressed, and `version`
+    moves whenever the digest would change so callers can key caches on it.
+    """
+
+    def __init__(self, root: str = AWARENESS_ROOT):
+        self.root = root
+        self.version = 0
+
+        self._files: Dict[str, snapshotFile] = {}
+        self._index = bm25Index()
+        self._digest_blob: Optional[bytes] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    ########################################################
+
+    def _walk(self):
+        for root, dirs, files in os.walk(self.root):
+            # Exclude directories that start with '.' or are '__pycache__'
+            dirs[:] = [d for d in dirs if not d.startswith('.') and d != '__pycache__']
+            for file in files:
+                if file.startswith('.') or not file.endswith('.py'):
+                    continue
+                file_path = os.path.join(root, file)
+                try:
+                    stat = os.stat(file_path)
+                except OSError as e:
+                    print(f"Error reading {file_path}: {e}")
+                    continue
+                yield os.path.relpath(file_path, self.root), file_path, stat
+
+    def _refresh_locked(self):
+        seen = set()
+        changed = False
+
+        for relative_path, file_path, stat in self._walk():
+            seen.add(relative_path)
+            current = self._files.get(relative_path)
+            if current and current.mtime_ns == stat.st_mtime_ns and current.size == stat.st_size:
+                continue
+
+            try:
+                with open(file_path, 'rb') as f:
+                    raw = f.read()
+                content = raw.decode('utf-8')
+            except (OSError, UnicodeDecodeError) as e:
+                print(f"Error reading {file_path}: {e}")
+                continue
+
+            sha1 = hashlib.sha1(raw).hexdigest()
+            if current and current.sha1 == sha1:
+                # Touched but not modified: keep the stored blob and index entry
+                self._files[relative_path] = current._replace(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+                continue
+
+            self._files[relative_path] = snapshotFile(stat.st_mtime_ns, stat.st_size, sha1, zlib.compress(raw))
+            self._index.add(relative_path, f"{relative_path}\n{content}")
+            changed = True
+
+        for relative_path in [p for p in self._files if p not in seen]:
+            del self._files[relative_path]
+            self._index.remove(relative_path)
+            changed = True
+
+        if changed or not self.version:
+            self._digest_blob = None
+            self.version += 1
+
+    def refresh(self, force: bool = False):
+        with self._lock:
+            now = time.monotonic()
+            if not force and self.version and now - self._checked_at < REVALIDATE_INTERVAL_SECONDS:
+                return
+            self._checked_at = now
+            self._refresh_locked()
+
+    ########################################################
+
+    def _content(self, relative_path: str) -> str:
+        return zlib.decompress(self._files[relative_path].blob).decode('utf-8')
+
+    def digest(self) -> str:
+        """The whole codebase as '# File: <path>' sections, in path order."""
+        self.refresh()
+        with self._lock:
+            if self._digest_blob is None:
+                sections = [f"\n\n# File: {p}\n{self._content(p)}" for p in sorted(self._files)]
+                self._digest_blob = zlib.compress("".join(sections).encode('utf-8'))
+            blob = self._digest_blob
+        return zlib.decompress(blob).decode('utf-8')
+
+    def relevant(self, query: str, max_files: int = RELEVANT_MAX_FILES, max_tokens: int = RELEVANT_MAX_TOKENS) -> str:
+        """Only the files ranked most relevant to query, within max_tokens.
+
+        The last file that does not fit is cut, and files beyond it are dropped.
+        """
+        self.refresh()
+        with self._lock:
+            ranked = self._index.search(query, k=max_files)
+            sections: List[str] = []
+            remaining = max_tokens
+            for relative_path, _ in ranked:
+                content = self._content(relative_path)
+                tokens = estimate_tokens(content)
+                if tokens > remaining:
+                    if remaining > 0:
+                        # estimate_tokens is ~4 characters per token for code
+                        sections.append(f"\n\n# File: {relative_path} (truncated)\n{content[:remaining * 4]}")
+                    break
+                sections.append(f"\n\n# File: {relative_path}\n{content}")
+                remaining -= tokens
+        return "".join(sections)
+
+
+_SNAPSHOT = awarenessSnapshot()
+
+
+def get_awareness_snapshot() -> awarenessSnapshot:
+    return _SNAPSHOT
@@ -1,4 +1,5 @@
-from typing import Optional, Dict, Any
+from contextvars import ContextVar
+from typing import Optional, Dict, Any, Tuple
 
 from src.disk.services.eido import crud as eido_crud
 from src.disk.services.settings import crud as settings_crud
@@ -13,6 +14,7 @@ EIDO_KEY_MAP: Dict[str, str] = {
     "model_name": "MODEL_NAME",
     "model_max_tokens": "MODEL_MAX_TOKENS",
     "model_temperature": "MODEL_TEMPERATURE",
+    "model_context_size": "MODEL_CONTEXT_SIZE",
     # Agents
     "default_agent": "DEFAULT_AGENT",
     # Modes
@@ -20,16 +22,38 @@ EIDO_KEY_MAP: Dict[str, str] = {
     "awareness_mode": "AWARENESS_MODE",
     "tools_mode": "TOOLS_MODE",
     "local_mode": "LOCAL_MODE",
+    # Local context
+    "local_context_tokens": "LOCAL_CONTEXT_TOKENS",
+    # Response cache
+    "response_cache_agents": "RESPONSE_CACHE_AGENTS",
+    "response_cache_ttl": "RESPONSE_CACHE_TTL",
+    # Hedging
+    "hedge_provider": "HEDGE_PROVIDER",
+    "hedge_model": "HEDGE_MODEL",
+    "hedge_percentile": "HEDGE_PERCENTILE",
 }
 
+# email -> (settings version, settings dict). A prompt build calls a dozen
+# fetch_* helpers; they all share one read until the settings are written again.
+_eido_settings_cache: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+
 async def _get_eido_settings_dict(email: Optional[str]) -> Dict[str, Any]:
     if not email:
         return {}
+    version = eido_crud.get_eido_settings_version(email)
+    cached = _eido_settings_cache.get(email)
+    if cached and cached[0] == version:
+        return cached[1]
     try:
-        return await eido_crud.get_eido_settings_dict(email)
+        settings = await eido_crud.get_eido_settings_dict(email)
     except Exception as e:
         print(f"Error fetching eido settings for {email}: {e}")
         return {}
+    _eido_settings_cache[email] = (version, settings)
+    return settings
+
+def eido_settings_version(email: Optional[str] = None) -> int:
+    return eido_crud.get_eido_settings_version(email) if email else 0
 
 async def fetch_eido_value(key: str, email: Optional[str] = None) -> str:
     mapped_key = EIDO_KEY_MAP.get(key)
@@ -60,7 +84,14 @@ async def fetch_eido_purpose(email: Optional[str] = None) -> str:
 async def fetch_provider_name(email: Optional[str] = None) -> str:
     return await fetch_eido_value("provider_name", email=email)
 
+# Model a hedged request to the fallback provider runs with (provider_hedging),
+# in place of MODEL_NAME for everything awaited in that request's context.
+model_override: ContextVar[Optional[str]] = ContextVar("model_override", default=None)
+
 async def fetch_model_name(email: Optional[str] = None) -> str:
+    override = model_override.get()
+    if override:
+        return override
     return await fetch_eido_value("model_name", email=email)
 
 async def fetch_model_max_tokens(email: Optional[str] = None) -> str:
@@ -69,6 +100,43 @@ async def fetch_model_max_tokens(email: Optional[str] = None) -> str:
 async def fetch_model_temperature(email: Optional[str] = None) -> str:
     return await fetch_eido_value("model_temperature", email=email)
 
+# Context windows (in tokens) by model name prefix, longest prefix wins.
+# MODEL_CONTEXT_SIZE in the eido settings overrides this table.
+MODEL_CONTEXT_SIZES: Dict[str, int] = {
+    "claude": 200000,
+    "gpt-4.1": 1000000,
+    "gpt-4o": 128000,
+    "gpt-4": 128000,
+    "gpt-5": 400000,
+    "o1": 200000,
+    "o3": 200000,
+    "o4": 200000,
+    "grok": 128000,
+    "grok-4": 256000,
+    "llama3": 8192,
+    "llama3.1": 128000,
+    "llama3.2": 128000,
+    "qwen": 32768,
+    "mistral": 32768,
+    "gemma": 8192,
+    "deepseek": 64000,
+}
+DEFAULT_MODEL_CONTEXT_SIZE = 8192
+
+async def fetch_model_context_size(email: Optional[str] = None) -> int:
+    configured = await fetch_eido_value("model_context_size", email=email)
+    try:
+        if configured and int(configured) > 0:
+            return int(configured)
+    except (TypeError, ValueError):
+        pass
+
+    model_name = str(await fetch_model_name(email=email)).lower()
+    matches = [prefix for prefix in MODEL_CONTEXT_SIZES if model_name.startswith(prefix)]
+    if not matches:
+        return DEFAULT_MODEL_CONTEXT_SIZE
+    return MODEL_CONTEXT_SIZES[max(matches, key=len)]
+
 ########################################################################
 
 async def fetch_default_agent(email: Optional[str] = None) -> str:
@@ -89,6 +157,57 @@ async def fetch_tools_mode(email: Optional[str] = None) -> str:
 async def fetch_local_mode(email: Optional[str] = None) -> str:
     return await fetch_eido_value("local_mode", email=email)
 
+# Token budget of local file contents pulled into one step; larger workspaces
+# are searched and only the most relevant chunks are sent.
+DEFAULT_LOCAL_CONTEXT_TOKENS = 8000
+
+async def fetch_local_context_tokens(email: Optional[str] = None) -> int:
+    configured = await fetch_eido_value("local_context_tokens", email=email)
+    try:
+        if configured and int(configured) > 0:
+            return int(configured)
+    except (TypeError, ValueError):
+        pass
+    return DEFAULT_LOCAL_CONTEXT_TOKENS
+
+########################################################################
+
+async def fetch_response_cache_agents(email: Optional[str] = None) -> str:
+    return await fetch_eido_value("response_cache_agents", email=email)
+
+# Seconds a cached reply is served; a daily task keeps hitting its entry.
+DEFAULT_RESPONSE_CACHE_TTL = 7 * 24 * 3600
+
+async def fetch_response_cache_ttl(email: Optional[str] = None) -> int:
+    configured = await fetch_eido_value("response_cache_ttl", email=email)
+    try:
+        if configured and int(configured) > 0:
+            return int(configured)
+    except (TypeError, ValueError):
+        pass
+    return DEFAULT_RESPONSE_CACHE_TTL
+
+########################################################################
+
+async def fetch_hedge_provider(email: Optional[str] = None) -> str:
+    return await fetch_eido_value("hedge_provider", email=email)
+
+async def fetch_hedge_model(email: Optional[str] = None) -> str:
+    return await fetch_eido_value("hedge_model", email=email)
+
+# Percentile of the primary's observed time to first token after which the
+# fallback provider is asked as well.
+DEFAULT_HEDGE_PERCENTILE = 95
+
+async def fetch_hedge_percentile(email: Optional[str] = None) -> float:
+    configured = await fetch_eido_value("hedge_percentile", email=email)
+    try:
+        if configured and 0 < float(configured) < 100:
+            return float(configured)
+    except (TypeError, ValueError):
+        pass
+    return DEFAULT_HEDGE_PERCENTILE
+
 
 ########################################################################
 ########################################################################
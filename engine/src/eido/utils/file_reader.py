@@ -0,0 +1,144 @@
+import os
+import mmap
+import codecs
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+
+# Files above this size are mapped instead of read into a bytes object.
+MMAP_THRESHOLD_BYTES = 1024 * 1024
+# Larger files are not loaded at all.
+MAX_FILE_BYTES = 2 * 1024 * 1024
+# How much of the start of a file is looked at to tell text from binary.
+SNIFF_BYTES = 8192
+# Share of control characters in the sniffed bytes above which a file is binary.
+MAX_CONTROL_RATIO = 0.3
+DECISION_CACHE_SIZE = 100000
+
+# windows-1252 before latin-1 as before; latin-1 accepts any byte sequence,
+# which is why binaries are sniffed out first.
+FALLBACK_ENCODINGS = ['utf-8', 'cp1252', 'latin-1']
+BOMS = [
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+# Control bytes that do not occur in text (backspace, tab, newlines, form feed and escape do)
+_CONTROL_BYTES = bytes(b for b in range(0x20) if b not in (0x08, 0x09, 0x0a, 0x0c, 0x0d, 0x1b))
+
+
+class fileRead(NamedTuple):
+    # "text", "binary", "too_large", "undecodable" or "error"
+    status: str
+    size: int
+    mtime_ns: int
+    sha1: Optional[str] = None
+    encoding: Optional[str] = None
+    content: Optional[str] = None
+
+
+def sniff_encoding(head) -> Optional[str]:
+    """Encoding named by a BOM, 'binary' for binary content, else None."""
+    for bom, encoding in BOMS:
+        if head[:len(bom)] == bom:
+            return encoding
+    if b'\x00' in head:
+        return 'binary'
+    if head:
+        control = len(head) - len(head.translate(None, _CONTROL_BYTES))
+        if control / len(head) > MAX_CONTROL_RATIO:
+            return 'binary'
+    return None
+
+
+def decode_buffer(buffer, encoding: Optional[str] = None):
+    """(content, encoding) decoded from one buffer, or (None, None)."""
+    for candidate in ([encoding] if encoding else FALLBACK_ENCODINGS):
+        try:
+            return str(buffer, candidate), candidate
+        except (UnicodeDecodeError, LookupError):
+            continue
+    return None, None
+
+
+def _classify(buffer, size: int, mtime_ns: int, known: Optional[fileRead] = None) -> fileRead:
+    if known is not None:
+        # Same file as a cached decision: decode straight with its encoding
+        content, encoding = decode_buffer(buffer, known.encoding)
+        if content is not None:
+            return known._replace(content=content)
+
+    head = bytes(buffer[:SNIFF_BYTES])
+    sha1 = hashlib.sha1(buffer).hexdigest()
+    sniffed = sniff_encoding(head)
+    if sniffed == 'binary':
+        return fileRead('binary', size, mtime_ns, sha1)
+    content, encoding = decode_buffer(buffer, sniffed)
+    if content is None:
+        return fileRead('undecodable', size, mtime_ns, sha1)
+    return fileRead('text', size, mtime_ns, sha1, encoding, content)
+
+
+class fileReader:
+    """Reads each file once: one buffer (mmap above MMAP_THRESHOLD_BYTES) is
+    hashed, sniffed for binary content and decoded.
+
+    The decision (status, hash, encoding; not the content) is cached per
+    (path, mtime, size), so unchanged binaries and oversized files are never
+    opened again and unchanged text files skip sniffing and detection.
+    """
+
+    def __init__(self, max_file_bytes: int = MAX_FILE_BYTES, cache_size: int = DECISION_CACHE_SIZE):
+        self.max_file_bytes = max_file_bytes
+        self.cache_size = cache_size
+        self._decisions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def read(self, path: str, stat: Optional[os.stat_result] = None) -> fileRead:
+        try:
+            stat = stat or os.stat(path)
+        except OSError:
+            return fileRead('error', 0, 0)
+
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._decisions.get(key)
+            if cached is not None:
+                self._decisions.move_to_end(key)
+        if cached is not None and cached.status != 'text':
+            return cached
+
+        result = self._read(path, stat, cached)
+
+        if result.status != 'error':
+            with self._lock:
+                self._decisions[key] = result._replace(content=None)
+                while len(self._decisions) > self.cache_size:
+                    self._decisions.popitem(last=False)
+        return result
+
+    def _read(self, path: str, stat: os.stat_result, known: Optional[fileRead]) -> fileRead:
+        size, mtime_ns = stat.st_size, stat.st_mtime_ns
+        if size > self.max_file_bytes:
+            return fileRead('too_large', size, mtime_ns)
+
+        try:
+            with open(path, 'rb') as f:
+                if size < MMAP_THRESHOLD_BYTES:
+                    return _classify(f.read(), size, mtime_ns, known)
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    return _classify(mapped, size, mtime_ns, known)
+        except (OSError, ValueError) as e:
+            print(f"### Local: Error reading {path}: {e}. File skipped.")
+            return fileRead('error', size, mtime_ns)
+
+
+_READER = fileReader()
+
+
+def get_file_reader() -> fileReader:
+    return _READER
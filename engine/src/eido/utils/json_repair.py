@@ -0,0 +1,222 @@
+import re
+import ast
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# Keys of the eido response format, used to pick the right object when a reply
+# contains more than one candidate.
+RESPONSE_FORMAT_KEYS = ("response", "agents", "functions_list", "next_step")
+
+MAX_CANDIDATES = 16
+
+_THINK_BLOCK = re.compile(r"<think>.*?</think>", re.DOTALL | re.IGNORECASE)
+
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+def strip_think_blocks(text: str) -> str:
+    """Drop reasoning blocks, including an unopened one ending in </think>.
+
+    Markdown fences and prose around the object need no stripping: the scanner
+    starts at an opening brace and stops at its matching close, so fences that
+    live inside string values are left untouched.
+    """
+    if not text:
+        return ""
+    text = _THINK_BLOCK.sub("", text)
+    lowered = text.lower()
+    if "</think>" in lowered:
+        text = text[lowered.rindex("</think>") + len("</think>"):]
+    return text.strip()
+
+
+########################################################
+
+class _scanState:
+    """Single-pass JSON scanner state.
+
+    Tracks string/escape state and the open container stack, removes trailing
+    commas as it goes and remembers the last point where the output was a valid
+    prefix (a value just completed or a container just opened), so a truncated
+    reply can be closed from there.
+    """
+
+    def __init__(self):
+        self.out: List[str] = []
+        self.stack: List[str] = []
+        self.expect_key: List[bool] = []
+        self.in_string = False
+        self.string_is_key = False
+        self.escape = False
+        self.in_bare = False
+        self.safe_len = 0
+        self.safe_stack: Tuple[str, ...] = ()
+
+    def mark_safe(self):
+        self.safe_len = len(self.out)
+        self.safe_stack = tuple(self.stack)
+
+    def value_done(self):
+        if self.stack and self.stack[-1] == "{":
+            self.expect_key[-1] = False
+        self.mark_safe()
+
+    def drop_trailing_comma(self):
+        i = len(self.out) - 1
+        while i >= 0 and self.out[i].isspace():
+            i -= 1
+        if i >= 0 and self.out[i] == ",":
+            del self.out[i]
+
+
+def _scan(fragment: str) -> Tuple[_scanState, bool]:
+    """Scan from an opening brace until the matching close; returns (state, complete)."""
+    st = _scanState()
+
+    for ch in fragment:
+        if st.in_string:
+            if st.escape:
+                st.escape = False
+                st.out.append(ch)
+            elif ch == "\\":
+                st.escape = True
+                st.out.append(ch)
+            elif ch == '"':
+                st.in_string = False
+                st.out.append(ch)
+                if not st.string_is_key:
+                    st.value_done()
+            elif ch == "\n":
+                st.out.append("\\n")
+            elif ch == "\r":
+                st.out.append("\\r")
+            elif ch == "\t":
+                st.out.append("\\t")
+            else:
+                st.out.append(ch)
+            continue
+
+        if st.in_bare and (ch in ",}]:" or ch.isspace()):
+            st.in_bare = False
+            st.value_done()
+
+        if ch == '"':
+            st.in_string = True
+            st.string_is_key = bool(st.stack) and st.stack[-1] == "{" and st.expect_key[-1]
+            st.out.append(ch)
+        elif ch in "{[":
+            st.stack.append(ch)
+            st.expect_key.append(ch == "{")
+            st.out.append(ch)
+            st.mark_safe()
+        elif ch in "}]":
+            if not st.stack:
+                break
+            st.drop_trailing_comma()
+            st.stack.pop()
+            st.expect_key.pop()
+            st.out.append(ch)
+            st.value_done()
+            if not st.stack:
+                return st, True
+        elif ch == ",":
+            if st.stack and st.stack[-1] == "{":
+                st.expect_key[-1] = True
+            st.out.append(ch)
+        elif ch == ":":
+            st.out.append(ch)
+        elif ch.isspace():
+            st.out.append(ch)
+        else:
+            st.in_bare = True
+            st.out.append(ch)
+
+    return st, False
+
+
+def _close_truncated(st: _scanState) -> List[str]:
+    """Candidate completions for a reply that ended before its closing brace."""
+    candidates = []
+
+    out = list(st.out)
+    if st.in_string:
+        if st.escape:
+            out.pop()
+        out.append('"')
+    tail = "".join(out).rstrip()
+    if tail.endswith(","):
+        tail = tail[:-1]
+    elif tail.endswith(":"):
+        tail += " null"
+    candidates.append(tail + "".join(_CLOSERS[c] for c in reversed(st.stack)))
+
+    safe = "".join(st.out[:st.safe_len]).rstrip()
+    if safe.endswith(","):
+        safe = safe[:-1]
+    candidates.append(safe + "".join(_CLOSERS[c] for c in reversed(st.safe_stack)))
+
+    return candidates
+
+
+def _loads(candidate: str) -> Optional[Any]:
+    try:
+        return json.loads(candidate, strict=False)
+    except (json.JSONDecodeError, ValueError):
+        pass
+    try:
+        # Python-style dict replies ('single quotes', True/None)
+        return ast.literal_eval(candidate)
+    except Exception:
+        return None
+
+
+def repair_json_object(fragment: str) -> Optional[Dict[str, Any]]:
+    """Parse an object starting at fragment[0] == '{', repairing what it can."""
+    st, complete = _scan(fragment)
+    candidates = ["".join(st.out)] if complete else _close_truncated(st)
+
+    for candidate in candidates:
+        parsed = _loads(candidate)
+        if isinstance(parsed, dict):
+            return parsed
+    return None
+
+
+def _score(parsed: Dict[str, Any]) -> int:
+    return sum(1 for key in RESPONSE_FORMAT_KEYS if key in parsed)
+
+
+def parse_model_json(text: str) -> Optional[Dict[str, Any]]:
+    """Extract the eido response object from a raw model reply.
+
+    Strips prose, </think> blocks and fences, closes truncated strings and
+    brackets and accepts trailing commas. Returns None when nothing usable is found.
+    """
+    if not text:
+        return None
+
+    stripped = text.strip()
+    if stripped.startswith("{") and stripped.endswith("}"):
+        parsed = _loads(stripped)
+        if isinstance(parsed, dict):
+            return parsed
+
+    cleaned = strip_think_blocks(text)
+
+    best: Optional[Dict[str, Any]] = None
+    best_score = -1
+    start = cleaned.find("{")
+    candidates_seen = 0
+    while start != -1 and candidates_seen < MAX_CANDIDATES:
+        candidates_seen += 1
+        parsed = repair_json_object(cleaned[start:])
+        if parsed is not None:
+            score = _score(parsed)
+            if score == len(RESPONSE_FORMAT_KEYS):
+                return parsed
+            if score > best_score:
+                best, best_score = parsed, score
+        start = cleaned.find("{", start + 1)
+
+    return best if best_score > 0 else None
@@ -0,0 +1,102 @@
+import re
+import math
+import heapq
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+
+WORD_RE = re.compile(r"[A-Za-z0-9_]+")
+CAMEL_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+MIN_TOKEN_LENGTH = 2
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased terms for code and prose.
+
+    Identifiers are kept whole and also split on underscores and camelCase, so
+    "set_modelSystem" matches queries for "model system" as well as the name.
+    """
+    tokens = []
+    for word in WORD_RE.findall(text or ""):
+        lowered = word.lower()
+        if len(lowered) >= MIN_TOKEN_LENGTH:
+            tokens.append(lowered)
+        parts = [p for chunk in word.split("_") for p in CAMEL_RE.findall(chunk)]
+        if len(parts) > 1:
+            tokens.extend(p.lower() for p in parts if len(p) >= MIN_TOKEN_LENGTH)
+    return tokens
+
+
+class bm25Index:
+    """In-memory Okapi BM25 index with incremental add/remove.
+
+    Postings are kept per term so a search only touches documents that share a
+    term with the query, and replacing one document does not rebuild the rest.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._doc_terms: Dict[str, Counter] = {}
+        self._doc_lengths: Dict[str, int] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._doc_lengths)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._doc_lengths
+
+    ########################################################
+
+    def add(self, doc_id: str, text: str):
+        if doc_id in self._doc_lengths:
+            self.remove(doc_id)
+
+        terms = Counter(tokenize(text))
+        for term, tf in terms.items():
+            self._postings.setdefault(term, {})[doc_id] = tf
+
+        length = sum(terms.values())
+        self._doc_terms[doc_id] = terms
+        self._doc_lengths[doc_id] = length
+        self._total_length += length
+
+    def remove(self, doc_id: str):
+        terms = self._doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_length -= self._doc_lengths.pop(doc_id, 0)
+
+    ########################################################
+
+    def search(self, query: str, k: int = 10, doc_ids: Iterable[str] = None) -> List[Tuple[str, float]]:
+        """Top k (doc_id, score) pairs for query, best first; ties break on doc_id."""
+        doc_count = len(self._doc_lengths)
+        if not doc_count:
+            return []
+
+        allowed = set(doc_ids) if doc_ids is not None else None
+        average_length = self._total_length / doc_count or 1.0
+        scores: Dict[str, float] = {}
+
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            df = len(postings)
+            idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+            for doc_id, tf in postings.items():
+                if allowed is not None and doc_id not in allowed:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[doc_id] / average_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return heapq.nsmallest(k, scores.items(), key=lambda item: (-item[1], item[0]))
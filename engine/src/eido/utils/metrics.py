@@ -0,0 +1,24 @@
+import threading
+from typing import Any, Callable, Dict
+
+
+# name -> function returning that component's counters, for GET /api/metrics
+_metric_sources: Dict[str, Callable[[], Dict[str, Any]]] = {}
+_metric_sources_lock = threading.Lock()
+
+
+def register_metrics(name: str, source: Callable[[], Dict[str, Any]]):
+    with _metric_sources_lock:
+        _metric_sources[name] = source
+
+
+def collect_metrics() -> Dict[str, Any]:
+    with _metric_sources_lock:
+        sources = dict(_metric_sources)
+    metrics = {}
+    for name, source in sources.items():
+        try:
+            metrics[name] = source()
+        except Exception as e:
+            metrics[name] = {"error": str(e)}
+    return metrics
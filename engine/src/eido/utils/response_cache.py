@@ -0,0 +1,140 @@
+import hashlib
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Optional
+
+from src.disk.services.response_cache import crud as response_cache_crud
+from src.eido.models.provider_cassette import get_replay_cassette
+from src.eido.utils.eido_config import (
+    fetch_model_max_tokens,
+    fetch_model_name,
+    fetch_model_temperature,
+    fetch_provider_name,
+    fetch_response_cache_agents,
+    fetch_response_cache_ttl,
+)
+from src.eido.utils.metrics import register_metrics
+
+
+# Bounds of the response_cache table; past either the least recently used
+# entries are evicted.
+MAX_ENTRIES = 2000
+MAX_BYTES = 64 * 1024 * 1024
+
+
+def _sha1(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def messages_hash(chat_messages) -> str:
+    digest = hashlib.sha1()
+    for message in chat_messages:
+        digest.update(f"{message.get('role')}\x00{message.get('content')}\x00".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class responseCache:
+    """Opt-in exact-match cache of model replies, in front of eido's
+    get_model_response.
+
+    A request is cached when its agent is listed in the RESPONSE_CACHE_AGENTS
+    setting (comma separated, or "*"), or when it runs a task whose
+    response_cache flag is set; a task flag set to false turns it off for
+    that task. The key is the user, provider, model, temperature, max tokens
+    and hashes of the system prompt and of the messages, so any change to
+    either is a miss. Entries live in the response_cache table for
+    RESPONSE_CACHE_TTL seconds, within MAX_ENTRIES and MAX_BYTES.
+
+    With a replay cassette active (CASSETTE_REPLAY) the cache is off, so
+    every call reaches the cassette.
+    """
+
+    def __init__(self):
+        self._counts = Counter()
+        self._agent_counts: Dict[str, Counter] = {}
+        # conversation id -> task flag; task conversations are new per run
+        self._task_flags: "OrderedDict[str, Optional[bool]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def enabled(self, email: str, agent_name: str, conversation_id: str) -> bool:
+        if get_replay_cassette() is not None:
+            return False
+        with self._lock:
+            known = conversation_id in self._task_flags
+            task_flag = self._task_flags.get(conversation_id)
+        if not known:
+            task_flag = await response_cache_crud.get_task_cache_flag(conversation_id)
+            with self._lock:
+                self._task_flags[conversation_id] = task_flag
+                while len(self._task_flags) > 256:
+                    self._task_flags.popitem(last=False)
+        if task_flag is not None:
+            return task_flag
+
+        agents = str(await fetch_response_cache_agents(email) or "")
+        listed = {name.strip().lower() for name in agents.split(",") if name.strip()}
+        return "*" in listed or str(agent_name).lower() in listed
+
+    async def request_key(self, email: str, system_prompt, chat_messages) -> str:
+        parts = [
+            email,
+            await fetch_provider_name(email),
+            await fetch_model_name(email=email),
+            await fetch_model_temperature(email=email),
+            await fetch_model_max_tokens(email=email),
+            _sha1(str(system_prompt or "")),
+            messages_hash(chat_messages),
+        ]
+        return _sha1("\x00".join(str(part) for part in parts))
+
+    async def get(self, key: str, agent_name: str) -> Optional[str]:
+        response = await response_cache_crud.get_cached_response(key)
+        self._count(agent_name, "hits" if response is not None else "misses")
+        return response
+
+    async def put(self, key: str, email: str, agent_name: str, response: str):
+        removed = await response_cache_crud.store_cached_response(
+            {
+                "key": key,
+                "email": email,
+                "agent": agent_name,
+                "provider": await fetch_provider_name(email),
+                "model": await fetch_model_name(email=email),
+                "response": response,
+            },
+            ttl_seconds=await fetch_response_cache_ttl(email),
+            max_entries=MAX_ENTRIES,
+            max_bytes=MAX_BYTES,
+        )
+        self._count(agent_name, "stores")
+        with self._lock:
+            self._counts["evictions"] += removed
+
+    def _count(self, agent_name: str, event: str):
+        with self._lock:
+            self._counts[event] += 1
+            self._agent_counts.setdefault(agent_name, Counter())[event] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        def summary(counts: Counter) -> Dict[str, Any]:
+            lookups = counts["hits"] + counts["misses"]
+            return {
+                "hits": counts["hits"],
+                "misses": counts["misses"],
+                "stores": counts["stores"],
+                "hit_rate": round(counts["hits"] / lookups, 4) if lookups else 0.0,
+            }
+
+        with self._lock:
+            stats = summary(self._counts)
+            stats["evictions"] = self._counts["evictions"]
+            stats["agents"] = {agent: summary(counts) for agent, counts in self._agent_counts.items()}
+        return stats
+
+
+_RESPONSE_CACHE = responseCache()
+register_metrics("response_cache", _RESPONSE_CACHE.stats)
+
+
+def get_response_cache() -> responseCache:
+    return _RESPONSE_CACHE
@@ -0,0 +1,200 @@
+import uuid
+from typing import Optional
+
+
+_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+_THINK_END = "</think>"
+
+
+class responseFieldExtractor:
+    """Decodes one top-level string field of a JSON object while the object
+    is still being received.
+
+    feed() takes raw model output in arbitrary chunks (an escape or a \\uXXXX
+    sequence may be split across them) and returns the part of the field's
+    value decoded so far that it has not returned before. Text before the
+    object, such as a markdown fence, is skipped; a </think> block end starts
+    the scan over and bumps `restarts`, since what was returned before it was
+    reasoning.
+    """
+
+    def __init__(self, field: str = "response"):
+        self.field = field
+        self.restarts = 0
+        self._reset()
+
+    def _reset(self):
+        self._state = "scan"  # scan, value (after the field's colon), emit, done
+        self._depth = 0
+        self._in_string = False
+        self._escape: Optional[str] = None  # "" after a backslash, "u..." while reading hex digits
+        self._high_surrogate: Optional[int] = None
+        self._string = []
+        self._key: Optional[str] = None
+        self._recent = ""
+
+    def _string_char(self, ch: str):
+        """(decoded text, string closed) for one character inside a string."""
+        if self._escape is None:
+            if ch == '\\':
+                self._escape = ""
+                return "", False
+            if ch == '"':
+                return "", True
+            return ch, False
+
+        if self._escape == "":
+            if ch == 'u':
+                self._escape = "u"
+                return "", False
+            self._escape = None
+            return _ESCAPES.get(ch, ch), False
+
+        self._escape += ch
+        if len(self._escape) < 5:
+            return "", False
+        try:
+            code = int(self._escape[1:], 16)
+        except ValueError:
+            self._escape = None
+            return "", False
+        self._escape = None
+        if 0xD800 <= code < 0xDC00:
+            self._high_surrogate = code
+            return "", False
+        if 0xDC00 <= code < 0xE000:
+            if self._high_surrogate is None:
+                return "", False
+            code = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+        self._high_surrogate = None
+        return chr(code), False
+
+    def feed(self, chunk: str) -> str:
+        decoded = []
+        for ch in chunk:
+            self._recent = (self._recent + ch)[-len(_THINK_END):]
+            if self._recent.lower() == _THINK_END:
+                # Anything so far was reasoning; the answer starts after it
+                self._reset()
+                self.restarts += 1
+                decoded = []
+                continue
+            if self._state == "done":
+                continue
+
+            if self._state == "emit":
+                text, closed = self._string_char(ch)
+                if closed:
+                    self._state = "done"
+                else:
+                    decoded.append(text)
+                continue
+
+            if self._state == "value":
+                if ch.isspace():
+                    continue
+                # Only a string value is streamed
+                self._state = "emit" if ch == '"' else "done"
+                continue
+
+            if self._in_string:
+                text, closed = self._string_char(ch)
+                if closed:
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._key = "".join(self._string)
+                elif self._depth == 1:
+                    self._string.append(text)
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string = []
+            elif ch in "{[":
+                self._depth += 1
+                self._key = None
+            elif ch in "}]":
+                self._depth -= 1
+                self._key = None
+            elif ch == ':':
+                if self._depth == 1 and self._key == self.field:
+                    self._state = "value"
+                self._key = None
+            elif not ch.isspace():
+                self._key = None
+        return "".join(decoded)
+
+
+class responseStream:
+    """Pushes the "response" text of a reply to the user's sockets while the
+    model is still generating it.
+
+    Deltas go out as "response_delta" messages under one stream_id, prefixed
+    like the persisted message. The final "response" message carries the same
+    stream_id so clients swap the streamed text for the stored message; a
+    stream that never becomes a stored message is closed with
+    "response_stream_end" so clients drop it.
+    """
+
+    def __init__(self, email: str, conversation_id: str, agent_name: str):
+        self.email = email
+        self.conversation_id = conversation_id
+        self.agent_name = agent_name
+        self.stream_id: Optional[str] = None
+        self.enabled = True
+        self._extractor = responseFieldExtractor()
+
+    async def _send(self, message: dict):
+        try:
+            from src.api.server.server import thalisServer
+            server = thalisServer.get_instance()
+        except RuntimeError:
+            # No server in this process (benchmarks, replays): nobody to stream to
+            self.enabled = False
+            return
+        try:
+            await server.ws_manager.send_to_user(self.email, message)
+        except Exception as e:
+            print(f"\n\n[ERROR]: Error sending WebSocket stream update: {e}")
+
+    async def feed(self, text: str):
+        if not self.enabled:
+            return
+        restarts = self._extractor.restarts
+        delta = self._extractor.feed(text)
+        if self._extractor.restarts != restarts:
+            await self.discard()
+        if self.stream_id is None:
+            delta = delta.lstrip()
+            if not delta:
+                return
+            self.stream_id = uuid.uuid4().hex
+            delta = f"[{self.agent_name}]: {delta}"
+        elif not delta:
+            return
+
+        await self._send({
+            "type": "response_delta",
+            "stream_id": self.stream_id,
+            "content": delta,
+            "conversation_id": self.conversation_id
+        })
+
+    def take(self) -> Optional[str]:
+        """The open stream's id, handed to the message that completes it."""
+        stream_id, self.stream_id = self.stream_id, None
+        return stream_id
+
+    async def discard(self):
+        stream_id = self.take()
+        if stream_id is not None:
+            await self._send({
+                "type": "response_stream_end",
+                "stream_id": stream_id,
+                "conversation_id": self.conversation_id
+            })
+
+    async def restart(self):
+        """Drop whatever a failed attempt streamed before the next one starts."""
+        await self.discard()
+        self._extractor = responseFieldExtractor()
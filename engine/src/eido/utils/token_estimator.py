@@ -0,0 +1,23 @@
+from typing import Optional
+
+
+# Fixed cost of the role/separator tokens every chat message carries.
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """Fast offline token estimate, no tokenizer download needed.
+
+    ASCII text averages about four characters per token for the providers we
+    support; other scripts (CJK, emoji, accents) are closer to one token per
+    character, so they are counted separately.
+    """
+    if not text:
+        return 0
+    total_chars = len(text)
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    return (ascii_chars + 3) // 4 + (total_chars - ascii_chars)
+
+
+def estimate_message_tokens(content: Optional[str]) -> int:
+    return estimate_tokens(content) + MESSAGE_OVERHEAD_TOKENS
@@ -0,0 +1,115 @@
+import os
+import time
+import inspect
+import threading
+import importlib.util
+from typing import Callable, Dict, List, Tuple
+
+
+TOOLS_DIR = 'src/eido/tools'
+# How long a validated registry is trusted before the tool files are stat'ed again.
+REVALIDATE_INTERVAL_SECONDS = 2.0
+
+
+class toolRegistry:
+    """Process-wide cache of the tool modules in TOOLS_DIR.
+
+    Holds the loaded callables, their rendered signatures and the final tools
+    prompt. Files are revalidated by mtime at most every REVALIDATE_INTERVAL_SECONDS
+    and only changed files are re-executed, so a lookup is normally a dict read.
+    """
+
+    def __init__(self, tools_dir: str = TOOLS_DIR):
+        self.tools_dir = tools_dir
+        self.version = 0
+        self.function_map: Dict[str, Callable] = {}
+        self.tools_prompt = ""
+
+        self._modules: Dict[str, Tuple[int, Dict[str, Callable], List[str]]] = {}
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    ########################################################
+
+    def _scan(self) -> Dict[str, int]:
+        mtimes = {}
+        try:
+            with os.scandir(self.tools_dir) as entries:
+                for entry in entries:
+                    if entry.name.endswith('.py') and not entry.name.startswith('__') and entry.is_file():
+                        mtimes[entry.name] = entry.stat().st_mtime_ns
+        except OSError as e:
+            print(f"load_tools: Error listing tools directory {self.tools_dir}: {e}")
+        return mtimes
+
+    def _load_module(self, filename: str) -> Tuple[Dict[str, Callable], List[str]]:
+        module_name = f"src.eido.tools.{filename[:-3]}"
+        module_path = os.path.join(self.tools_dir, filename)
+
+        functions: Dict[str, Callable] = {}
+        descriptions: List[str] = []
+        try:
+            spec = importlib.util.spec_from_file_location(module_name, module_path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+
+            for func_name in dir(module):
+                if not func_name.startswith("__"):
+                    func_obj = getattr(module, func_name)
+                    if callable(func_obj):
+                        functions[func_name] = func_obj
+                        sig = inspect.signature(func_obj)
+                        descriptions.append(f"def {func_name}{sig}:")
+                        if func_obj.__doc__:
+                            descriptions.append(f"    \"{func_obj.__doc__}\"")
+        except Exception as e:
+            error = f"load_tools: Error loading tool {filename}: {e}"
+            print(error)
+
+        return functions, descriptions
+
+    def _rebuild(self, mtimes: Dict[str, int]):
+        modules = {}
+        for filename in sorted(mtimes):
+            cached = self._modules.get(filename)
+            if cached and cached[0] == mtimes[filename]:
+                modules[filename] = cached
+            else:
+                functions, descriptions = self._load_module(filename)
+                modules[filename] = (mtimes[filename], functions, descriptions)
+
+        function_map = {}
+        function_descriptions = []
+        for filename in sorted(modules):
+            _, functions, descriptions = modules[filename]
+            function_map.update(functions)
+            function_descriptions.extend(descriptions)
+
+        function_descriptions_str = "\n".join(function_descriptions)
+        self._modules = modules
+        self.function_map = function_map
+        self.tools_prompt = f"""### These are the tools (aka functions) available to YOU to use whenever needed:\n//Beginning of functions//\n'''\n{function_descriptions_str}\n'''\n//End of functions//"""
+        self.version += 1
+
+    def refresh(self, force: bool = False):
+        with self._lock:
+            now = time.monotonic()
+            if not force and self.version and now - self._checked_at < REVALIDATE_INTERVAL_SECONDS:
+                return
+            self._checked_at = now
+
+            mtimes = self._scan()
+            current = {filename: cached[0] for filename, cached in self._modules.items()}
+            if force or not self.version or mtimes != current:
+                self._rebuild(mtimes)
+
+    def get(self) -> Tuple[Dict[str, Callable], str]:
+        self.refresh()
+        return self.function_map, self.tools_prompt
+
+
+_REGISTRY = toolRegistry()
+
+
+def get_tool_registry() -> toolRegistry:
+    return _REGISTRY
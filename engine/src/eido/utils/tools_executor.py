@@ -0,0 +1,67 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+
+# Sync tools run here so a slow os.walk, subprocess or pip install never blocks
+# the event loop of the super that summoned them. Shared by every super thread.
+TOOLS_MAX_WORKERS = 8
+TOOLS_EXECUTOR = ThreadPoolExecutor(max_workers=TOOLS_MAX_WORKERS, thread_name_prefix="EidoTool")
+
+DEFAULT_TOOL_TIMEOUT = 60
+TOOL_TIMEOUTS: Dict[str, float] = {
+    "install_py_library": 300,
+    "run_shell_command": 120,
+    "run_code": 120,
+    "search_file": 60,
+    "search_directory": 60,
+    "search_files_by_extension": 60,
+    "search_for_files_containing_specific_text": 90,
+    "internet_perplexity_search": 90,
+}
+
+MAX_TOOL_OUTPUT_CHARS = 20000
+
+
+def get_tool_timeout(function_name: str) -> float:
+    return TOOL_TIMEOUTS.get(function_name, DEFAULT_TOOL_TIMEOUT)
+
+
+def cap_tool_output(output: Any, max_chars: int = MAX_TOOL_OUTPUT_CHARS) -> str:
+    """Stringify a tool result and cut it at max_chars, recording where it was cut."""
+    output_str = str(output)
+    total_chars = len(output_str)
+    if total_chars <= max_chars:
+        return output_str
+
+    return (
+        output_str[:max_chars]
+        + f"\n[TRUNCATED]: Output truncated at character {max_chars} of {total_chars}."
+    )
+
+
+async def execute_tool(func: Callable, function_name: str, args: list, kwargs: dict, timeout: Optional[float] = None) -> str:
+    """Run a tool with a deadline and return its capped output as a string.
+
+    Coroutine tools are awaited on the current loop, sync tools are offloaded to
+    TOOLS_EXECUTOR. A sync tool that misses its deadline keeps its worker until it
+    returns on its own (threads cannot be killed), but the caller is released.
+    """
+    if timeout is None:
+        timeout = get_tool_timeout(function_name)
+
+    try:
+        if asyncio.iscoroutinefunction(func):
+            result = await asyncio.wait_for(func(*args, **kwargs), timeout=timeout)
+        else:
+            loop = asyncio.get_running_loop()
+            call = functools.partial(func, *args, **kwargs)
+            result = await asyncio.wait_for(loop.run_in_executor(TOOLS_EXECUTOR, call), timeout=timeout)
+    except asyncio.TimeoutError:
+        print(f"\n\n[TOOL]: {function_name} timed out after {timeout} seconds")
+        result = {"Success": False, "Error": f"Function {function_name} timed out after {timeout} seconds."}
+    except Exception as e:
+        result = {"Success": False, "Error": str(e)}
+
+    return cap_tool_output(result)
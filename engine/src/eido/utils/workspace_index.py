@@ -0,0 +1,322 @@
+import os
+import asyncio
+import threading
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from src.disk.services.workspace import crud as workspace_crud
+from src.eido.utils.file_reader import MAX_FILE_BYTES, fileRead, get_file_reader
+from src.eido.utils.workspace_scanner import scan_workspace
+
+
+EXCLUDED_ITEMS = {"target", "node_modules", "venv"}
+EXCLUDED_STARTS_WITH = {".", "#"}
+ALLOWED_EXTENSIONS = {
+    # Basic text files
+    '.txt', '.text', '.log',
+
+    # Programming languages
+    '.py', '.js', '.ts', '.jsx', '.tsx', '.java', '.cpp', '.c', '.cc', '.cxx', '.h', '.hpp', '.hxx',
+    '.cs', '.php', '.rb', '.go', '.rs', '.swift', '.kt', '.scala', '.pl', '.r', '.m', '.mm', '.f', '.f90',
+    '.pas', '.dpr', '.vb', '.vbs', '.asm', '.s', '.lua', '.dart', '.elm', '.ex', '.exs', '.clj', '.cljs',
+    '.hs', '.ml', '.mli', '.fs', '.fsx', '.jl', '.nim', '.cr', '.zig', '.v', '.vv',
+
+    # Web technologies
+    '.html', '.htm', '.xhtml', '.css', '.scss', '.sass', '.less', '.svg', '.vue', '.svelte',
+
+    # Configuration files
+    '.json', '.yaml', '.yml', '.toml', '.ini', '.cfg', '.conf', '.config', '.properties', '.env',
+    '.gitignore', '.gitattributes', '.editorconfig', '.dockerignore',
+
+    # Shell scripts
+    '.sh', '.bash', '.zsh', '.fish', '.bat', '.cmd', '.ps1', '.psm1',
+
+    # Documentation
+    '.md', '.markdown', '.mdown', '.mkd', '.rst', '.tex', '.latex', '.adoc', '.asciidoc', '.wiki',
+    '.org', '.textile',
+
+    # Data formats
+    '.csv', '.tsv', '.xml', '.sql', '.graphql', '.gql',
+
+    # Build and project files
+    '.makefile', '.dockerfile', '.containerfile', '.gradle', '.sbt', '.pom', '.proj', '.csproj',
+    '.vcxproj', '.xcodeproj', '.pbxproj',
+
+    # Others
+    '.patch', '.diff', '.LICENSE', '.CHANGELOG', '.CONTRIBUTING', '.README', '.TODO',
+    '.gitmodules', '.htaccess', '.robots'
+}
+# Decoded content kept for one workspace; files past it are listed but not loaded.
+MAX_TOTAL_CONTENT_BYTES = 64 * 1024 * 1024
+OVER_TOTAL_CAP = 'over_total_cap'
+
+try:
+    # Optional: with watchdog installed, an unchanged workspace costs no scan at all
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+
+def filter_paths(dirs, files, excluded_items=EXCLUDED_ITEMS, excluded_starts_with=EXCLUDED_STARTS_WITH, allowed_extensions=ALLOWED_EXTENSIONS):
+    if excluded_starts_with is None:
+        excluded_starts_with = []
+    dirs[:] = [
+        d for d in dirs
+        if not any(d.startswith(prefix) for prefix in excluded_starts_with)
+        and d not in excluded_items
+    ]
+
+    # Filter files based on criteria
+    filtered_files = []
+    for f in files:
+        # Skip files that start with any prefix in excluded_starts_with or are in excluded items
+        if any(f.startswith(prefix) for prefix in excluded_starts_with) or f in excluded_items:
+            continue
+
+        # If allowed_extensions is a function (for backward compatibility)
+        if callable(allowed_extensions):
+            if allowed_extensions(f):
+                filtered_files.append(f)
+        # If allowed_extensions is a set of extensions
+        elif allowed_extensions is None or os.path.splitext(f)[1].lower() in allowed_extensions:
+            filtered_files.append(f)
+
+    return filtered_files
+
+
+def is_indexed_path(relative_path: str) -> bool:
+    """Whether a path relative to the root passes the same filters as the walk."""
+    parts = relative_path.split(os.sep)
+    for d in parts[:-1]:
+        if d in EXCLUDED_ITEMS or any(d.startswith(prefix) for prefix in EXCLUDED_STARTS_WITH):
+            return False
+    return bool(filter_paths([], [parts[-1]]))
+
+
+class workspaceEntry(NamedTuple):
+    size: int
+    mtime_ns: int
+    sha1: Optional[str]
+    status: str  # fileRead status, or OVER_TOTAL_CAP
+    encoding: Optional[str]
+    content: Optional[str]
+
+
+def _content_bytes(entry: Optional[workspaceEntry]) -> int:
+    return entry.size if entry is not None and entry.content is not None else 0
+
+
+class _watchHandler(FileSystemEventHandler):
+    def __init__(self, index):
+        self.index = index
+
+    def on_any_event(self, event):
+        self.index._mark_dirty(event)
+
+
+class workspaceIndex:
+    """Persistent, incrementally refreshed copy of the text files under a root.
+
+    Entries (size, mtime, sha1, read status, encoding, decoded content) are
+    read with the single-pass fileReader and stored in the
+    workspace_files table, so a restart only re-reads files whose stat
+    changed. Each refresh is a stat diff of the tree; with watchdog
+    installed, a watcher records changed paths instead and refresh only looks
+    at those. `version` moves whenever any entry changes.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.version = 0
+        self.entries: Dict[str, workspaceEntry] = {}
+
+        self._loaded = False
+        self._loaded_bytes = 0
+        self._lock = threading.Lock()
+        self._scan_lock = threading.Lock()
+        self._observer = None
+        self._dirty: Set[str] = set()
+        self._full_scan_needed = True
+
+    ########################################################
+
+    def _start_watcher(self):
+        if Observer is None or self._observer is not None:
+            return
+        try:
+            observer = Observer()
+            observer.schedule(_watchHandler(self), self.root, recursive=True)
+            observer.daemon = True
+            observer.start()
+            self._observer = observer
+        except Exception as e:
+            print(f"### Local: File watcher unavailable for {self.root}, using stat scans: {e}")
+
+    def _mark_dirty(self, event):
+        with self._lock:
+            if event.is_directory and event.event_type != "modified":
+                # Created, moved or deleted folders change a whole subtree
+                self._full_scan_needed = True
+                return
+            for path in (getattr(event, "src_path", None), getattr(event, "dest_path", None)):
+                if path:
+                    self._dirty.add(os.path.relpath(os.fsdecode(path), self.root))
+
+    ########################################################
+
+    def _stale(self, relative_path: str, stat) -> bool:
+        current = self.entries.get(relative_path)
+        return not (current and current.mtime_ns == stat.st_mtime_ns and current.size == stat.st_size)
+
+    def _read_file(self, relative_path: str, stat) -> fileRead:
+        return get_file_reader().read(os.path.join(self.root, relative_path), stat)
+
+    def _read(self, relative_path: str, stat, current: Optional[workspaceEntry], result: Optional[fileRead] = None) -> Optional[workspaceEntry]:
+        file_path = os.path.join(self.root, relative_path)
+        if result is None:
+            result = self._read_file(relative_path, stat)
+        if result.status == 'error':
+            return None
+
+        if current and current.status == result.status and current.sha1 and current.sha1 == result.sha1:
+            return current._replace(size=result.size, mtime_ns=result.mtime_ns)
+
+        if result.status == 'binary':
+            print(f"### Local: {file_path} looks binary. File skipped.")
+        elif result.status == 'too_large':
+            print(f"### Local: {file_path} is larger than {MAX_FILE_BYTES} bytes. File skipped.")
+        elif result.status == 'undecodable':
+            print(f"### Local: Could not decode {file_path} with any supported encoding. File skipped.")
+        return workspaceEntry(result.size, result.mtime_ns, result.sha1, result.status, result.encoding, result.content)
+
+    def _update(self, relative_path: str, stat, changes: Dict[str, Optional[workspaceEntry]], retry: bool = False, result: Optional[fileRead] = None):
+        current = changes.get(relative_path, self.entries.get(relative_path))
+        if stat is None:
+            if current is not None:
+                changes[relative_path] = None
+                self._loaded_bytes -= _content_bytes(current)
+            return
+        if not retry and current and current.mtime_ns == stat.st_mtime_ns and current.size == stat.st_size:
+            return
+        entry = self._read(relative_path, stat, current, result if not retry else None)
+        if entry is None:
+            return
+
+        loaded_bytes = self._loaded_bytes - _content_bytes(current) + _content_bytes(entry)
+        if entry.content is not None and loaded_bytes > MAX_TOTAL_CONTENT_BYTES:
+            entry = entry._replace(status=OVER_TOTAL_CAP, encoding=None, content=None)
+            loaded_bytes = self._loaded_bytes - _content_bytes(current)
+        self._loaded_bytes = loaded_bytes
+
+        if entry != current:
+            changes[relative_path] = entry
+
+    def _scan(self) -> Dict[str, Optional[workspaceEntry]]:
+        """Apply what changed on disk since the last scan and return the
+        changed entries (None for removed files)."""
+        # One scan at a time: each one diffs against the entries the previous one left
+        with self._scan_lock:
+            changes = self._diff()
+            if changes:
+                with self._lock:
+                    for relative_path, entry in changes.items():
+                        if entry is None:
+                            self.entries.pop(relative_path, None)
+                        else:
+                            self.entries[relative_path] = entry
+                    self.version += 1
+        return changes
+
+    def _diff(self) -> Dict[str, Optional[workspaceEntry]]:
+        with self._lock:
+            if self._observer is not None and not self._full_scan_needed:
+                dirty, self._dirty = self._dirty, set()
+                full_scan = False
+            else:
+                dirty = set()
+                self._dirty.clear()
+                self._full_scan_needed = False
+                full_scan = True
+
+        changes: Dict[str, Optional[workspaceEntry]] = {}
+        if full_scan:
+            found = {}
+            # Reads move to the pools only if they turn out to wait on the
+            # disk. Results come back in path order, so which files fall past
+            # the total cap is deterministic
+            for relative_path, stat, result in scan_workspace(self.root, filter_paths, self._stale, self._read_file):
+                found[relative_path] = stat
+                self._update(relative_path, stat, changes, result=result)
+            for relative_path in list(self.entries):
+                if relative_path not in found:
+                    self._update(relative_path, None, changes)
+            # Files left out by the total cap get another chance once there is room
+            for relative_path in sorted(found):
+                if self._loaded_bytes >= MAX_TOTAL_CONTENT_BYTES:
+                    break
+                entry = changes.get(relative_path, self.entries.get(relative_path))
+                if entry is not None and entry.status == OVER_TOTAL_CAP:
+                    self._update(relative_path, found[relative_path], changes, retry=True)
+        else:
+            for relative_path in dirty:
+                if not is_indexed_path(relative_path):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(self.root, relative_path))
+                except OSError:
+                    stat = None
+                self._update(relative_path, stat, changes)
+
+        return changes
+
+    ########################################################
+
+    async def _load(self):
+        rows = await workspace_crud.get_workspace_files(self.root)
+        with self._lock:
+            if self._loaded:
+                return
+            for row in rows:
+                status = row['status'] or ('text' if row['content'] is not None else 'undecodable')
+                entry = workspaceEntry(
+                    row['size'], row['mtime_ns'], row['sha1'], status, row['encoding'], row['content']
+                )
+                self.entries[row['path']] = entry
+                self._loaded_bytes += _content_bytes(entry)
+            self._loaded = True
+        self._start_watcher()
+
+    async def refresh(self) -> int:
+        """Bring the index up to date with the disk; returns the number of changed files."""
+        if not self._loaded:
+            await self._load()
+
+        changes = await asyncio.to_thread(self._scan)
+        if not changes:
+            return 0
+
+        upserts = [
+            {'path': path, **entry._asdict()}
+            for path, entry in changes.items() if entry is not None
+        ]
+        deleted_paths = [path for path, entry in changes.items() if entry is None]
+        await workspace_crud.apply_workspace_changes(self.root, upserts, deleted_paths)
+        return len(changes)
+
+    def files(self) -> List[Tuple[str, workspaceEntry]]:
+        """(relative path, entry) pairs in path order."""
+        with self._lock:
+            return sorted(self.entries.items())
+
+
+_INDEXES: Dict[str, workspaceIndex] = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def get_workspace_index(root: str) -> workspaceIndex:
+    root = os.path.abspath(root)
+    with _INDEXES_LOCK:
+        if root not in _INDEXES:
+            _INDEXES[root] = workspaceIndex(root)
+        return _INDEXES[root]
@@ -0,0 +1,119 @@
+import threading
+from typing import Dict, List, NamedTuple, Tuple
+
+from src.eido.utils.lexical_index import bm25Index
+from src.eido.utils.token_estimator import estimate_tokens
+from src.eido.utils.workspace_index import workspaceIndex
+
+
+CHUNK_LINES = 60
+# Most chunks pulled into one turn, whatever the budget.
+MAX_CHUNKS = 24
+# Chunks scoring below this share of the best one only matched common terms.
+MIN_RELATIVE_SCORE = 0.1
+
+
+class workspaceChunk(NamedTuple):
+    path: str
+    start_line: int  # 1-based, inclusive
+    end_line: int
+    text: str
+
+
+def chunk_text(path: str, content: str, chunk_lines: int = CHUNK_LINES) -> List[workspaceChunk]:
+    lines = content.splitlines(keepends=True)
+    return [
+        workspaceChunk(path, start + 1, min(start + chunk_lines, len(lines)), "".join(lines[start:start + chunk_lines]))
+        for start in range(0, len(lines), chunk_lines)
+    ]
+
+
+class workspaceRetriever:
+    """BM25 index over line chunks of a workspaceIndex.
+
+    Kept in step with the workspace index by file hash, so only changed
+    files are re-chunked and re-indexed between turns.
+    """
+
+    def __init__(self, workspace_index: workspaceIndex):
+        self.workspace_index = workspace_index
+        self._index = bm25Index()
+        self._chunks: Dict[str, workspaceChunk] = {}
+        self._file_chunks: Dict[str, Tuple[str, List[str]]] = {}  # path -> (sha1, chunk ids)
+        self._file_tokens: Dict[str, int] = {}
+        self.total_tokens = 0
+        self._synced_version = -1
+        self._lock = threading.Lock()
+
+    ########################################################
+
+    def _drop_file(self, path: str):
+        self.total_tokens -= self._file_tokens.pop(path, 0)
+        _, chunk_ids = self._file_chunks.pop(path, (None, []))
+        for chunk_id in chunk_ids:
+            self._index.remove(chunk_id)
+            self._chunks.pop(chunk_id, None)
+
+    def sync(self):
+        with self._lock:
+            if self._synced_version == self.workspace_index.version:
+                return
+            files = self.workspace_index.files()
+            present = set()
+            for path, entry in files:
+                present.add(path)
+                current = self._file_chunks.get(path)
+                if current and current[0] == entry.sha1:
+                    continue
+                self._drop_file(path)
+                if entry.content is None:
+                    continue
+                chunk_ids = []
+                for chunk in chunk_text(path, entry.content):
+                    chunk_id = f"{path}:{chunk.start_line}"
+                    self._chunks[chunk_id] = chunk
+                    # The path is indexed with the text so file names match too
+                    self._index.add(chunk_id, f"{path}\n{chunk.text}")
+                    chunk_ids.append(chunk_id)
+                self._file_chunks[path] = (entry.sha1, chunk_ids)
+                self._file_tokens[path] = estimate_tokens(entry.content)
+                self.total_tokens += self._file_tokens[path]
+            for path in [p for p in self._file_chunks if p not in present]:
+                self._drop_file(path)
+            self._synced_version = self.workspace_index.version
+
+    def fits(self, max_tokens: int) -> bool:
+        """Whether every readable file together fits in max_tokens."""
+        self.sync()
+        return self.total_tokens <= max_tokens
+
+    def search(self, query: str, max_tokens: int, max_chunks: int = MAX_CHUNKS) -> List[workspaceChunk]:
+        """Best chunks for query that fit in max_tokens, in path and line order."""
+        self.sync()
+        with self._lock:
+            ranked = self._index.search(query, k=max_chunks)
+            selected = []
+            remaining = max_tokens
+            for chunk_id, score in ranked:
+                if score < ranked[0][1] * MIN_RELATIVE_SCORE:
+                    break
+                chunk = self._chunks[chunk_id]
+                tokens = estimate_tokens(chunk.text)
+                if tokens > remaining:
+                    continue
+                selected.append(chunk)
+                remaining -= tokens
+        return sorted(selected, key=lambda c: (c.path, c.start_line))
+
+
+_RETRIEVERS: Dict[str, workspaceRetriever] = {}
+_RETRIEVERS_LOCK = threading.Lock()
+
+
+def get_workspace_retriever(workspace_index: workspaceIndex) -> workspaceRetriever:
+    with _RETRIEVERS_LOCK:
+        retriever = _RETRIEVERS.get(workspace_index.root)
+        if retriever is None or retriever.workspace_index is not workspace_index:
+            retriever = workspaceRetriever(workspace_index)
+            _RETRIEVERS[workspace_index.root] = retriever
+        return retriever
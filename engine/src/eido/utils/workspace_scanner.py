@@ -0,0 +1,177 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, Optional, Tuple
+
+
+# Directory listings are cheap and unblock more work, so they get their own
+# small pool instead of queueing behind file reads.
+LIST_WORKERS = 4
+READ_WORKERS = 16
+READ_BATCH_FILES = 32
+# The walk starts on the calling thread and times its reads in windows of
+# IO_WAIT_SAMPLE_READS. When IO_WAIT_WINDOWS windows in a row spent at least
+# IO_WAIT_SHARE of their time waiting (wall time not spent on the CPU), the
+# storage is slow enough for the pools to overlap the waits. From the page
+# cache the reads are CPU-bound and handing them to the pools only adds
+# overhead; a single slow window there is a preemption or a GC pause.
+IO_WAIT_SAMPLE_READS = 64
+IO_WAIT_SHARE = 0.5
+IO_WAIT_WINDOWS = 3
+
+# Shared by every scan; threads are started on first use and kept
+LIST_EXECUTOR = ThreadPoolExecutor(max_workers=LIST_WORKERS, thread_name_prefix="WorkspaceList")
+READ_EXECUTOR = ThreadPoolExecutor(max_workers=READ_WORKERS, thread_name_prefix="WorkspaceRead")
+
+# Marks a file that needs a read the pools have not been given
+_READ_INLINE = object()
+
+
+def _list_dir(directory: str, relative_dir: str, filter_entries) -> list:
+    """[sort key, relative path, stat or None, folder path or None, pending]
+    for each kept entry of one folder, in path order."""
+    subdirs, files, by_name = [], [], {}
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                by_name[entry.name] = entry
+                try:
+                    # Like os.walk: symlinked folders are not followed
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.name)
+                    elif entry.is_dir():
+                        continue
+                    else:
+                        files.append(entry.name)
+                except OSError:
+                    files.append(entry.name)
+    except OSError:
+        # os.walk skips folders it cannot list
+        return []
+
+    files = filter_entries(subdirs, files)
+    children = []
+    for file in files:
+        try:
+            stat = by_name[file].stat()
+        except OSError as e:
+            print(f"### Local: Error reading {os.path.join(directory, file)}: {e}. File skipped.")
+            continue
+        children.append([file, os.path.join(relative_dir, file) if relative_dir else file, stat, None, None])
+    for d in subdirs:
+        # A folder sorts as "name/" so that walking children in this order
+        # gives the same order as sorting the full relative paths
+        relative_path = os.path.join(relative_dir, d) if relative_dir else d
+        children.append([d + os.sep, relative_path, None, os.path.join(directory, d), None])
+    children.sort(key=lambda child: child[0])
+    return children
+
+
+class _workspaceScan:
+    def __init__(self, filter_entries, needs_read, read, parallel):
+        self.filter_entries = filter_entries
+        self.needs_read = needs_read
+        self.read = read
+        self.parallel = bool(parallel)
+        self.measuring = parallel is None
+        self.closed = False
+        self._window_reads = 0
+        self._window_wall = 0.0
+        self._window_cpu = 0.0
+        self._waiting_windows = 0
+
+    def read_inline(self, relative_path: str, stat: os.stat_result):
+        if not self.measuring:
+            return self.read(relative_path, stat)
+        wall, cpu = time.perf_counter(), time.thread_time()
+        result = self.read(relative_path, stat)
+        self._window_wall += time.perf_counter() - wall
+        self._window_cpu += time.thread_time() - cpu
+        self._window_reads += 1
+        if self._window_reads >= IO_WAIT_SAMPLE_READS:
+            waited = self._window_wall - self._window_cpu
+            if self._window_wall > 0 and waited / self._window_wall >= IO_WAIT_SHARE:
+                self._waiting_windows += 1
+            else:
+                self._waiting_windows = 0
+            if self._waiting_windows >= IO_WAIT_WINDOWS:
+                # Folders listed from now on queue their work on the pools
+                self.parallel = True
+                self.measuring = False
+            self._window_reads, self._window_wall, self._window_cpu = 0, 0.0, 0.0
+        return result
+
+    def list_dir(self, directory: str, relative_dir: str) -> list:
+        if self.closed:
+            return []
+        children = _list_dir(directory, relative_dir, self.filter_entries)
+        stale = []
+        for child in children:
+            _, relative_path, stat, _, _ = child
+            if stat is not None and self.needs_read(relative_path, stat):
+                child[4] = _READ_INLINE
+                stale.append(child)
+        if not self.parallel:
+            return children
+
+        # Queue the subfolders and reads now, ahead of the walk reaching them
+        for child in children:
+            if child[3] is not None:
+                child[4] = LIST_EXECUTOR.submit(self.list_dir, child[3], child[1])
+        # Batched so that per-task overhead stays small next to the reads
+        for start in range(0, len(stale), READ_BATCH_FILES):
+            batch = stale[start:start + READ_BATCH_FILES]
+            future = READ_EXECUTOR.submit(self.read_batch, [(child[1], child[2]) for child in batch])
+            for position, child in enumerate(batch):
+                child[4] = (future, position)
+        return children
+
+    def read_batch(self, batch: list) -> list:
+        if self.closed:
+            return [None] * len(batch)
+        return [self.read(relative_path, stat) for relative_path, stat in batch]
+
+    def walk(self, root: str) -> Iterator[Tuple[str, os.stat_result, Optional[object]]]:
+        try:
+            stack = [iter(self.list_dir(root, ""))]
+            while stack:
+                child = next(stack[-1], None)
+                if child is None:
+                    stack.pop()
+                    continue
+                _, relative_path, stat, folder, pending = child
+                if folder is not None:
+                    children = pending.result() if pending is not None else self.list_dir(folder, relative_path)
+                    stack.append(iter(children))
+                elif pending is None:
+                    yield relative_path, stat, None
+                elif pending is _READ_INLINE:
+                    yield relative_path, stat, self.read_inline(relative_path, stat)
+                else:
+                    future, position = pending
+                    yield relative_path, stat, future.result()[position]
+        finally:
+            # Queued listings and reads of an abandoned walk return at once
+            self.closed = True
+
+
+def scan_workspace(
+    root: str,
+    filter_entries: Callable[[list, list], list],
+    needs_read: Callable[[str, os.stat_result], bool],
+    read: Callable[[str, os.stat_result], object],
+    parallel: Optional[bool] = None,
+) -> Iterator[Tuple[str, os.stat_result, Optional[object]]]:
+    """Walk root and yield (relative path, stat, read result or None) for
+    each file, in path order, as the walk gets there.
+
+    Folders are pruned with filter_entries(dirs, files), the same filter
+    os.walk callers apply, and read(path, stat) runs for the files where
+    needs_read(path, stat) is true. The walk runs on the calling thread
+    until its reads show I/O wait (see IO_WAIT_SHARE); from then on every
+    folder it lists queues its subfolders and reads on the shared list and
+    read pools, so listing and reading overlap ahead of the walk while
+    results still come out one at a time, in order. parallel=True uses the
+    pools from the start, parallel=False never.
+    """
+    return _workspaceScan(filter_entries, needs_read, read, parallel).walk(root)
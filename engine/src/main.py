@@ -8,6 +8,7 @@ from multiprocessing import Process, Event
 from urllib.parse import urlparse
 from src.api.coms.commands import commands
 from src.api.server.server import thalisServer
+from src.eido.utils.tool_registry import get_tool_registry
 
 class main:
     def __init__(self, server_address, email):
@@ -23,6 +24,7 @@ class main:
 
     async def run_async(self):
         await commands(self.email).initialize()
+        get_tool_registry().refresh(force=True)
         # AUTO START GENERAL MOAT FOR SUPERS
         await commands(self.email).create_thread("src/engine/moat/moat.py", "MOAT")
         
@@ -1,6 +1,7 @@
 import asyncio
 import threading
 from src.eido.eido import eido
+from src.eido.payload.eidoMemory import eidoMemory
 
 
 class superChat():
@@ -31,6 +32,9 @@ class superChat():
             
             # Run eido processing
             await eido_instance.run()
+
+            # The turn is delivered; fold older turns into the rolling summary
+            await eidoMemory(self.email, self.conversation_id).refresh()
             
             return True
         except Exception as e:
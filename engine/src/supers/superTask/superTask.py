@@ -140,7 +140,6 @@ class superTask():
         await thalisAPI(self.email).process(task_prompt, conversation_id)
 
     async def create_conversation(self):
-        conversation_title_prefix = "hidden_chat_task_"
         conversation_id = str(uuid.uuid4())
         try:
             async with AsyncSessionLocal() as session:
@@ -148,7 +147,7 @@ class superTask():
                 conv = Conversation(
                     id=conversation_id,
                     user_id=user.id,
-                    title=f"{conversation_title_prefix}{self.task_id}"
+                    title=chats_crud.task_conversation_title(self.task_id)
                 )
                 session.add(conv)
                 await session.commit()
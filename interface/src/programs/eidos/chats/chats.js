@@ -1,5 +1,5 @@
 import { initializeWebSocket, closeWebSocket } from '/src/programs/eidos/chats/js/websocket.js';
-import { appendMessage, setCurrentConversationId, getCurrentConversationId, updateMessageWithId } from '/src/programs/eidos/chats/components/conversation/conversation.js';
+import { appendMessage, setCurrentConversationId, getCurrentConversationId, updateMessageWithId, appendStreamDelta, removeStreamedMessage } from '/src/programs/eidos/chats/components/conversation/conversation.js';
 import { loadConversations, loadConversation, startNewChat, updateConversationTitle, forkConversation, deleteConversation } from '/src/programs/eidos/chats/components/left_bar/left_bar.js';
 import { showError, setupMessageInput } from '/src/programs/eidos/chats/js/utils.js';
 import { openConfirmModal, openPromptModal } from '/src/programs/eidos/chats/js/modals.js';
@@ -211,6 +211,20 @@ function initializeApp(chatsContainer, instanceId) {
                         return;
                     }
                     
+                    if (message.type === 'response_delta' || message.type === 'response_stream_end') {
+                        // Partial reply while the model is still generating it
+                        const currentConvId = getCurrentConversationId(instanceId);
+                        if (message.conversation_id && currentConvId && message.conversation_id !== currentConvId) {
+                            return;
+                        }
+                        if (message.type === 'response_delta') {
+                            appendStreamDelta(chatsContainer, message.stream_id, message.content);
+                        } else {
+                            removeStreamedMessage(chatsContainer, message.stream_id);
+                        }
+                        return;
+                    }
+
                     if (message.type === 'response') {
                         // Only handle messages for our conversation or new conversations we're creating
                         const currentConvId = getCurrentConversationId(instanceId);
@@ -230,6 +244,11 @@ function initializeApp(chatsContainer, instanceId) {
                             if (headerEl) headerEl.style.display = 'flex';
                         }
                         
+                        // The stored message replaces the streamed one
+                        if (message.stream_id) {
+                            removeStreamedMessage(chatsContainer, message.stream_id);
+                        }
+
                         // Update the user's message with its ID if provided
                         if (message.user_message_id) {
                             updateMessageWithId(chatsContainer, message.user_message_id);
@@ -1,4 +1,4 @@
 // Main conversation module - imports and re-exports from smaller modules
 export { setCurrentConversationId, getCurrentConversationId } from './js/conversationState.js';
 export { updateMessageContent, deleteMessage, sendMessage } from './js/messageApi.js';
-export { appendMessage, startEditing, attachMessageActions, updateMessageWithId } from './js/messageUI.js';
\ No newline at end of file
+export { appendMessage, startEditing, attachMessageActions, updateMessageWithId, appendStreamDelta, removeStreamedMessage } from './js/messageUI.js';
\ No newline at end of file
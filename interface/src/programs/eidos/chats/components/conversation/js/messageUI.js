@@ -29,6 +29,26 @@ export function appendMessage(root, role, content, messageId = null) {
     return messageDiv;
 }
 
+// Streamed replies grow in place until the stored message replaces them
+export function appendStreamDelta(root, streamId, delta) {
+    const messagesContainer = root.querySelector('.messages-container');
+    let messageDiv = messagesContainer.querySelector(`.message[data-stream-id="${streamId}"]`);
+    if (!messageDiv) {
+        messageDiv = appendMessage(root, 'assistant', '');
+        messageDiv.dataset.streamId = streamId;
+    }
+    const contentDiv = messageDiv.querySelector('.message-content');
+    contentDiv.textContent += delta;
+    messagesContainer.scrollTop = messagesContainer.scrollHeight;
+}
+
+export function removeStreamedMessage(root, streamId) {
+    const messageDiv = root.querySelector(`.messages-container .message[data-stream-id="${streamId}"]`);
+    if (messageDiv) {
+        messageDiv.remove();
+    }
+}
+
 export function updateMessageWithId(root, messageId) {
     const messages = root.querySelectorAll('.message');
     const lastMessage = messages[messages.length - 1];
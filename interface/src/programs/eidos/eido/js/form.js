@@ -10,6 +10,12 @@ function clearStaticInputs(keyMapping, getElementById) {
   });
 }
 
+// AWARENESS_MODE is "true", "false" or "relevant"; older values like "1" mean "true"
+function normalizeAwarenessMode(value) {
+  if (value === 'relevant') return 'relevant';
+  return value === 'true' || value === '1' || value === true ? 'true' : 'false';
+}
+
 export function populateForm({ keyMapping, getElementById, dynamicAgentItemClass, appendAgentItem, clearModifiedState }, settings) {
   clearStaticInputs(keyMapping, getElementById);
 
@@ -27,6 +33,12 @@ export function populateForm({ keyMapping, getElementById, dynamicAgentItemClass
     }
   });
 
+  // Awareness mode has three values, so it is a select instead of a checkbox
+  const awarenessSelect = getElementById('awarenessMode');
+  if (awarenessSelect) {
+    awarenessSelect.value = normalizeAwarenessMode(settings?.[keyMapping['awarenessMode']]);
+  }
+
   // Handle custom provider name population
   const providerSelect = getElementById('providerName');
   const customProviderInput = getElementById('customProviderName');
@@ -78,6 +90,11 @@ export function getFormData({ keyMapping, getElementById, dynamicAgentItemClass
     }
   });
 
+  const awarenessSelect = getElementById('awarenessMode');
+  if (awarenessSelect) {
+    settings[keyMapping['awarenessMode']] = normalizeAwarenessMode(awarenessSelect.value);
+  }
+
   // Handle custom provider name when "other" is selected
   const providerSelect = getElementById('providerName');
   const customProviderInput = getElementById('customProviderName');
@@ -303,6 +303,10 @@ export class AltarTerminal {
                 this.handleClearChatSignal(data);
             } else if (data.type === 'response') {
                 this.handleResponseMessage(data);
+            } else if (data.type === 'response_delta') {
+                this.handleResponseDelta(data);
+            } else if (data.type === 'response_stream_end') {
+                this.removeStreamedMessage(data.stream_id);
             }
         };
 
@@ -544,9 +548,37 @@ export class AltarTerminal {
             this.conversationId = messageData.conversation_id;
         }
         
+        // The stored message replaces the streamed one
+        if (messageData.stream_id) {
+            this.removeStreamedMessage(messageData.stream_id);
+        }
+
         // Display the assistant's response content if provided
         if (messageData.content) {
             this.addMessageToChat(messageData.content, 'altar');
         }
     }
+
+    handleResponseDelta(messageData) {
+        if (messageData.conversation_id && messageData.conversation_id !== this.conversationId) {
+            return;
+        }
+
+        // Partial reply while the model is still generating it
+        let messageDiv = this.chatContainer.querySelector(`[data-stream-id="${messageData.stream_id}"]`);
+        if (!messageDiv) {
+            this.addMessageToChat('', 'altar');
+            messageDiv = this.chatContainer.lastElementChild;
+            messageDiv.dataset.streamId = messageData.stream_id;
+        }
+        messageDiv.textContent += messageData.content;
+        this.scrollToBottom();
+    }
+
+    removeStreamedMessage(streamId) {
+        const messageDiv = this.chatContainer.querySelector(`[data-stream-id="${streamId}"]`);
+        if (messageDiv) {
+            messageDiv.remove();
+        }
+    }
 } 
\ No newline at end of file
@@ -454,12 +454,13 @@ class UserSelection {
         }
 
         const agentsMode = document.getElementById('instance-agents-mode')?.checked;
-        const awarenessMode = document.getElementById('instance-awareness-mode')?.checked;
+        const awarenessMode = document.getElementById('instance-awareness-mode')?.value;
         const toolsMode = document.getElementById('instance-tools-mode')?.checked;
         const localMode = document.getElementById('instance-local-mode')?.checked;
 
         eidoData['AGENTS_MODE'] = Boolean(agentsMode).toString();
-        eidoData['AWARENESS_MODE'] = Boolean(awarenessMode).toString();
+        // "true", "false" or "relevant"
+        eidoData['AWARENESS_MODE'] = awarenessMode || 'false';
         eidoData['TOOLS_MODE'] = Boolean(toolsMode).toString();
         eidoData['LOCAL_MODE'] = Boolean(localMode).toString();
 